@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+P2P Lending Voice AI Assistant - JSON Codec Benchmark
+
+Times encoding and decoding of realistic frames with the standard library and
+with each fast JSON library that is installed (orjson, ujson), and prints the
+per-frame cost and the speedup over the standard library. modules/json_codec.py
+uses the fastest installed library, so this shows what it saves on each path.
+
+Frames measured:
+
+- backend_chunk: a streamed response_chunk frame from the Lambda
+- backend_final: a final response frame with a full answer
+- bedrock_delta: a Bedrock content_block_delta chunk, parsed by the Lambda
+- tts_audio: an ElevenLabs TTS frame carrying ~250 ms of base64 PCM audio
+- api_response: an /api/text response body
+
+    python bench_json.py
+    python bench_json.py --number 2000 --repeat 7
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+
+# Add the project root to the Python path to allow for module imports
+sys.path.append('.')
+
+from modules import json_codec
+
+logger = logging.getLogger(__name__)
+
+ANSWER = ("P2P lending platforms in India are regulated by the RBI as NBFC-P2P. A lender's total "
+          "exposure across all platforms is capped at Rs 50 lakh, and at Rs 50,000 to a single borrower. "
+          "Funds move through escrow accounts, and the platform cannot guarantee returns. ") * 4
+
+
+def sample_frames():
+    """Builds the benchmark frames, keyed by name."""
+    rng = random.Random(7)
+    # 16 kHz, 16-bit mono PCM: 250 ms is 8000 bytes; ElevenLabs frames are often several times that
+    pcm = bytes(rng.getrandbits(8) for _ in range(32000))
+    return {
+        "backend_chunk": {"response_chunk": "regulated by the RBI as ", "seq": 12,
+                          "session_id": "Zx9Qa1bC2dE3fG4h", "request_id": "7f3c2a9e1b0d4c5e"},
+        "backend_final": {"response": ANSWER, "session_id": "Zx9Qa1bC2dE3fG4h", "request_id": "7f3c2a9e1b0d4c5e"},
+        "bedrock_delta": {"type": "content_block_delta", "index": 0,
+                          "delta": {"type": "text_delta", "text": "exposure across all "}},
+        "tts_audio": {"audio": base64.b64encode(pcm).decode("ascii"), "isFinal": None,
+                      "normalizedAlignment": {"chars": list("Funds move through escrow."),
+                                              "charStartTimesMs": list(range(0, 520, 20)),
+                                              "charsDurationMs": [20] * 26}},
+        "api_response": {"response": ANSWER, "audio_url": "/static/audio/5dcbcaf8-d83c-4155-bc86-44c9b85e230b.wav",
+                         "session_id": "Zx9Qa1bC2dE3fG4h", "source": "nlp"},
+    }
+
+
+def codecs():
+    """Returns (name, dumps, loads) for the standard library and each installed fast library."""
+    found = [("json", lambda obj: json.dumps(obj, separators=(",", ":")), json.loads)]
+    try:
+        import orjson
+        found.append(("orjson", orjson.dumps, orjson.loads))
+    except ImportError:
+        pass
+    try:
+        import ujson
+        found.append(("ujson", ujson.dumps, ujson.loads))
+    except ImportError:
+        pass
+    return found
+
+
+def best_time(func, arg, number: int, repeat: int) -> float:
+    """Returns the best mean seconds per call over repeat runs of number calls."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func(arg)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def run(number: int, repeat: int):
+    frames = sample_frames()
+    available = codecs()
+    results = []
+    for frame_name, frame in frames.items():
+        encoded = json.dumps(frame, separators=(",", ":"))
+        baseline = None
+        for codec_name, dumps, loads in available:
+            # Decode what arrives on the wire: bytes for the websocket and Bedrock paths
+            wire = encoded.encode("utf-8")
+            encode_s = best_time(dumps, frame, number, repeat)
+            decode_s = best_time(loads, wire, number, repeat)
+            if baseline is None:
+                baseline = (encode_s, decode_s)
+            results.append({
+                "frame": frame_name, "bytes": len(wire), "codec": codec_name,
+                "encode_us": encode_s * 1e6, "decode_us": decode_s * 1e6,
+                "encode_speedup": baseline[0] / encode_s, "decode_speedup": baseline[1] / decode_s,
+            })
+    return results
+
+
+def print_results(results):
+    print(f"json_codec backend: {json_codec.BACKEND}")
+    print(f"{'frame':<14} {'bytes':>7} {'codec':<7} {'encode us':>10} {'x':>6} {'decode us':>10} {'x':>6}")
+    for row in results:
+        print(f"{row['frame']:<14} {row['bytes']:>7} {row['codec']:<7} {row['encode_us']:>10.2f} "
+              f"{row['encode_speedup']:>5.1f}x {row['decode_us']:>10.2f} {row['decode_speedup']:>5.1f}x")
+    if len({row["codec"] for row in results}) == 1:
+        print("No fast JSON library installed; install orjson to compare.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON encoding and decoding of realistic frames")
+    parser.add_argument("--number", type=int, default=1000, help="Calls per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing runs per measurement; the best is kept")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    print_results(run(args.number, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+P2P Lending Voice AI Assistant - FAQ Index Builder
+
+Offline build step that compiles the canonical question/answer pairs (by default
+submission.csv) into the versioned FAQ lookup index loaded by server.py at startup,
+and prerenders the TTS audio for every answer so FAQ hits are served instantly.
+"""
+
+import os
+import sys
+import csv
+import json
+import asyncio
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+
+# Add the project root to the Python path to allow for module imports
+sys.path.append('.')
+
+from modules.faq_index import INDEX_FORMAT_VERSION, normalize_question
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def read_pairs(source_paths, missing=None):
+    """
+    Reads question/answer pairs from CSV files with 'Questions' and 'Responses' columns.
+
+    Questions without an answer are skipped, or appended to ``missing`` if a list is given.
+    """
+    pairs = {}
+    skipped = 0
+    for source_path in source_paths:
+        with open(source_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if "Questions" not in (reader.fieldnames or []):
+                logger.error(f"{source_path} has no 'Questions' column, skipping")
+                continue
+            for row in reader:
+                question = (row.get("Questions") or "").strip()
+                answer = (row.get("Responses") or "").strip()
+                if not question or not answer or answer.startswith("[Processing"):
+                    if question and missing is not None:
+                        missing.append(question)
+                    else:
+                        skipped += 1
+                    continue
+                # Later sources override earlier ones for the same normalized question
+                pairs[normalize_question(question)] = (question, answer)
+    if skipped:
+        logger.warning(f"Skipped {skipped} questions without an answer")
+    return pairs
+
+
+def build_entries(pairs):
+    """Builds the index entries and a content hash used as the index version."""
+    entries = []
+    digest = hashlib.sha256()
+    for normalized, (question, answer) in sorted(pairs.items()):
+        entry_id = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+        entries.append({
+            "id": entry_id,
+            "question": question,
+            "normalized": normalized,
+            "answer": answer
+        })
+        digest.update(normalized.encode('utf-8'))
+        digest.update(answer.encode('utf-8'))
+    return entries, digest.hexdigest()[:16]
+
+
+async def answer_missing(questions, concurrency):
+    """Answers the questions through the NLP backend; returns {normalized: (question, answer)}."""
+    from modules.nlp_pipeline import NLPPipeline, NLPConfig
+
+    pipeline = NLPPipeline(config=NLPConfig.from_yaml())
+    answered = {}
+    try:
+        batch = pipeline.process_batch(questions, concurrency=concurrency, ordered=False)
+        async for result in batch:
+            # Only complete answers go into the index; failed items are logged by the batch
+            if result.ok:
+                answered[normalize_question(result.question)] = (result.question, result.response["response"].strip())
+        logger.info(f"Answered {len(answered)}/{len(questions)} missing questions: {batch.stats.to_dict()}")
+    finally:
+        await pipeline.close()
+    return answered
+
+
+async def prerender_audio(entries, audio_dir, force=False):
+    """Prerenders TTS audio for every entry and records its URL on the entry."""
+    from modules.tts_module import TTSModule, TTSConfig
+
+    tts_module = TTSModule(config=TTSConfig.from_yaml())
+    os.makedirs(audio_dir, exist_ok=True)
+
+    for entry in entries:
+        audio_path = os.path.join(audio_dir, f"faq_{entry['id']}.wav")
+        if force or not os.path.exists(audio_path):
+            audio_path = await tts_module.text_to_speech_file(entry["answer"], audio_path)
+        if audio_path and os.path.exists(audio_path):
+            entry["audio_url"] = "/" + os.path.relpath(audio_path).replace(os.sep, "/")
+        else:
+            logger.warning(f"No audio prerendered for {entry['question']!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FAQ fast-path index and prerendered audio.")
+    parser.add_argument("--sources", nargs="+", default=["submission.csv"],
+                        help="CSV files with 'Questions' and 'Responses' columns.")
+    parser.add_argument("--output", default="data/faq_index.json", help="Path of the index artifact to write.")
+    parser.add_argument("--audio-dir", default="static/audio", help="Directory for prerendered answer audio.")
+    parser.add_argument("--no-audio", action="store_true", help="Skip prerendering TTS audio.")
+    parser.add_argument("--force-audio", action="store_true", help="Re-render audio even if it already exists.")
+    parser.add_argument("--fill-missing", action="store_true",
+                        help="Answer questions without a response through the NLP backend before building.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel backend requests for --fill-missing.")
+    args = parser.parse_args()
+
+    missing = [] if args.fill_missing else None
+    pairs = read_pairs(args.sources, missing)
+    if missing:
+        answered = asyncio.run(answer_missing(missing, args.concurrency))
+        # Answers from the sources win over freshly generated ones
+        pairs = {**answered, **pairs}
+    if not pairs:
+        logger.error("No question/answer pairs found, nothing to build.")
+        sys.exit(1)
+
+    entries, version = build_entries(pairs)
+
+    if not args.no_audio:
+        asyncio.run(prerender_audio(entries, args.audio_dir, force=args.force_audio))
+
+    artifact = {
+        "format_version": INDEX_FORMAT_VERSION,
+        "version": version,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "sources": args.sources,
+        "entries": entries
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False, indent=1)
+
+    logger.info(f"Wrote FAQ index {version} with {len(entries)} entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
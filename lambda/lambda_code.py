@@ -1,20 +1,225 @@
+import time
+
+# Measured from the start of the module so the cold start log covers the imports
+_INIT_STARTED = time.perf_counter()
+
 import json
+import base64
 import boto3
 import os
 import re
-import time
 import random
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from botocore.config import Config
+
+try:
+    import msgpack  # Optional; bundle it in the deployment package or a layer to enable binary frames
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson  # Optional; faster parsing of the Bedrock stream and encoding of frames
+except ImportError:
+    orjson = None
 
 # Environment variables (configure in Lambda settings)
 MODEL_ID = os.environ.get('MODEL_ID')  # e.g., anthropic.claude-3-haiku-20240307-v1:0
 KNOWLEDGE_BASE_ID = os.environ.get('KNOWLEDGE_BASE_ID')
 REGION = os.environ.get('AWS_REGION', 'us-west-2')
 
-# AWS clients
-bedrock_runtime = boto3.client('bedrock-runtime', region_name=REGION)
-bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', region_name=REGION)
+# Streaming of websocket answers: deltas are merged into one post per sentence
+# or per STREAM_FLUSH_MS, whichever comes first, to limit post_to_connection calls
+STREAM_RESPONSES = os.environ.get('STREAM_RESPONSES', 'true').lower() != 'false'
+STREAM_FLUSH_SECONDS = int(os.environ.get('STREAM_FLUSH_MS', '50')) / 1000
+STREAM_MAX_CHUNK_CHARS = int(os.environ.get('STREAM_MAX_CHUNK_CHARS', '400'))
+SENTENCE_END = re.compile(r'[.!?:;\n]["\')\]]*\s*$')
+
+# Knowledge base retrieval cache. Bump KB_VERSION after each ingestion so cached
+# contexts from the previous version are no longer used.
+KB_VERSION = os.environ.get('KB_VERSION', '1')
+KB_CACHE_MAX_ENTRIES = int(os.environ.get('KB_CACHE_MAX_ENTRIES', '256'))  # 0 disables the cache
+KB_CACHE_TTL_SECONDS = float(os.environ.get('KB_CACHE_TTL_SECONDS', '900'))
+KB_CACHE_DIR = os.environ.get('KB_CACHE_DIR', '')  # e.g. /tmp/kb_cache to add a disk tier
+KB_CACHE_MAX_DISK_ENTRIES = int(os.environ.get('KB_CACHE_MAX_DISK_ENTRIES', '2000'))
+
+# Local short-circuit classifier. Messages that are only small talk, or clearly
+# about something other than P2P lending, get a templated answer without a KB
+# retrieval or a Bedrock call. Anything uncertain goes to the model.
+SMALL_TALK_PHRASES = {
+    "greeting": ["hi", "hii", "hello", "hey", "hola", "yo", "namaste", "namaskar", "good morning",
+                 "good afternoon", "good evening", "how are you", "how r u", "whats up", "sup",
+                 "नमस्ते", "नमस्कार"],
+    "thanks": ["thanks", "thank you", "thankyou", "thx", "ty", "dhanyavad", "dhanyawad", "shukriya",
+               "धन्यवाद", "शुक्रिया"],
+    # Bare reactions like "great" aren't thanks; they only win when no other intent matches
+    "acknowledgement": ["great", "awesome", "perfect", "cool", "got it", "that helps", "helpful", "nice",
+                        "understood", "makes sense"],
+    "goodbye": ["bye", "goodbye", "good bye", "see you", "see ya", "good night", "take care", "alvida",
+                "thats all", "nothing else", "अलविदा"],
+}
+# Words that may surround small talk without changing its meaning
+FILLER_WORDS = {"there", "so", "much", "very", "a", "lot", "ok", "okay", "again", "bot", "assistant",
+                "ji", "sir", "madam", "friend", "dear", "all", "and", "you", "too", "for", "the", "help",
+                "bhai", "im", "i", "am", "fine", "doing", "well", "it", "is", "that", "oh", "hmm", "haan",
+                "now", "today", "your", "its", "was", "really", "जी"}
+# Question and function words, left out when judging what a message is about
+STOPWORDS = {"what", "whats", "who", "whos", "where", "when", "why", "how", "which", "is", "are", "was",
+             "were", "do", "does", "did", "can", "could", "should", "would", "will", "i", "me", "my", "we",
+             "a", "an", "the", "in", "of", "to", "on", "at", "with", "about", "this", "any", "some", "tell",
+             "give", "kya", "hai", "ka", "ki", "ke", "mein", "क्या", "है", "का", "की", "के", "में", "कैसा",
+             "कैसे", "आज"}
+DOMAIN_KEYWORDS = {
+    "p2p", "peer", "lend", "lending", "lender", "lenders", "borrow", "borrower", "borrowers", "borrowing",
+    "loan", "loans", "invest", "investing", "investment", "investor", "investors", "returns", "return",
+    "interest", "rate", "rates", "rbi", "nbfc", "escrow", "emi", "emis", "credit", "cibil", "score",
+    "kyc", "risk", "risks", "default", "defaults", "defaulter", "npa", "fee", "fees", "charges",
+    "withdraw", "withdrawal", "repay", "repayment", "repayments", "principal", "tenure", "platform",
+    "platforms", "lendenclub", "faircent", "money", "portfolio", "diversify", "diversification",
+    "tax", "tds", "income", "yield", "limit", "lakh", "rupees", "account", "register", "registration",
+    "regulation", "regulations", "regulated", "guarantee", "collateral", "liquidity", "secure", "safe",
+    "app", "website", "dashboard", "login", "signup", "otp", "upi", "bank", "support", "agent",
+    "ऋण", "लोन", "निवेश", "ब्याज", "उधार", "पैसा", "पैसे", "रिटर्न",
+}
+OFF_TOPIC_KEYWORDS = {
+    # Only words that can't be part of an account or app question ("phone number", "referral code")
+    "cricket", "football", "soccer", "ipl", "movie", "movies", "film", "films",
+    "actor", "actress", "song", "songs", "music", "lyrics", "singer", "weather", "rain", "temperature",
+    "recipe", "recipes", "cook", "cooking", "food", "restaurant", "biryani", "pizza", "fashion", "dress",
+    "clothes", "shoes", "bottle", "bottles", "gaming",
+    "politics", "election", "minister", "president", "celebrity", "joke", "jokes", "poem",
+    "horoscope", "astrology", "flight", "flights", "hotel", "holiday", "vacation", "girlfriend",
+    "boyfriend", "dating", "homework", "programming", "netflix",
+    "anime", "gym", "workout", "diet", "medicine", "doctor", "fever", "क्रिकेट", "फिल्म", "गाना", "मौसम",
+}
+CLASSIFIER_ENABLED = os.environ.get('CLASSIFIER_ENABLED', 'true').lower() != 'false'
+# Share of a message's words that must be small talk or filler, and the longest message considered
+CLASSIFIER_SMALL_TALK_MIN_COVERAGE = float(os.environ.get('CLASSIFIER_SMALL_TALK_MIN_COVERAGE', '0.8'))
+CLASSIFIER_SMALL_TALK_MAX_WORDS = int(os.environ.get('CLASSIFIER_SMALL_TALK_MAX_WORDS', '8'))
+# Off-topic keywords needed, and their minimum share of the content words, with no domain keyword present
+CLASSIFIER_OUT_OF_SCOPE_MIN_HITS = int(os.environ.get('CLASSIFIER_OUT_OF_SCOPE_MIN_HITS', '1'))
+CLASSIFIER_OUT_OF_SCOPE_MIN_SHARE = float(os.environ.get('CLASSIFIER_OUT_OF_SCOPE_MIN_SHARE', '0.25'))
+# Release gate on the corpus: short-circuits must all be right, and few may be missed
+CLASSIFIER_MIN_PRECISION = 1.0
+CLASSIFIER_MIN_RECALL = 0.95
+CLASSIFIER_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'classifier_corpus.jsonl')
+
+LABEL_ANSWER = "answer"  # Not short-circuited: retrieve and generate as usual
+TEMPLATE_ANSWERS = {
+    "greeting": {
+        "en": "Hi! I'm your P2P lending assistant. Ask me anything about investing or borrowing through peer-to-peer platforms.",
+        "hi": "नमस्ते! मैं आपका P2P लेंडिंग सहायक हूँ। पीयर-टू-पीयर प्लेटफ़ॉर्म पर निवेश या उधार के बारे में कुछ भी पूछिए।",
+    },
+    "thanks": {
+        "en": "You're welcome! Would you like to know more about P2P lending?",
+        "hi": "आपका स्वागत है! क्या आप P2P लेंडिंग के बारे में और जानना चाहेंगे?",
+    },
+    "acknowledgement": {
+        "en": "Glad that helps! Is there anything else you'd like to know about P2P lending?",
+        "hi": "खुशी हुई कि यह मददगार रहा! क्या आप P2P लेंडिंग के बारे में कुछ और जानना चाहेंगे?",
+    },
+    "goodbye": {
+        "en": "Thanks for chatting! Come back anytime you have questions about P2P lending.",
+        "hi": "बात करने के लिए धन्यवाद! P2P लेंडिंग से जुड़े किसी भी सवाल के लिए फिर आइए।",
+    },
+    "out_of_scope": {
+        # The refusal the system prompt asks the model for
+        "en": "I specialize in Peer-to-Peer lending. If you have questions about investing, borrowing, or how P2P platforms work, I'd be happy to help!",
+        "hi": "मैं पीयर-टू-पीयर लेंडिंग में विशेषज्ञ हूँ। निवेश, उधार या P2P प्लेटफ़ॉर्म कैसे काम करते हैं, इसके बारे में सवाल हों तो ज़रूर पूछिए!",
+    },
+}
+DEVANAGARI = re.compile(r'[\u0900-\u097F]')
+
+# Limits on the conversation context accepted from clients
+MAX_HISTORY_MESSAGES = 12
+MAX_MESSAGE_CHARS = 2000
+MAX_SUMMARY_CHARS = 2000
+
+# Short keys for msgpack frames; the client expands them back to the long names
+FRAME_KEYS = {
+    "response": "r",
+    "response_chunk": "c",
+    "error": "e",
+    "session_id": "s",
+    "request_id": "i",
+    "seq": "q",
+}
+
+def json_loads(data):
+    """Parses JSON text or UTF-8 bytes, with orjson when it is bundled."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def json_dumps_bytes(data):
+    """Serializes compact JSON as UTF-8 bytes, with orjson when it is bundled."""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+
+
+# Client settings: keep-alive connections reused across warm invocations, a pool
+# large enough for concurrent posts, and adaptive retries that back off on throttling
+AWS_CONNECT_TIMEOUT = float(os.environ.get('AWS_CONNECT_TIMEOUT', '2'))
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '10'))
+# The model stream can pause between tokens; posts to a connection should be quick
+BEDROCK_READ_TIMEOUT = float(os.environ.get('BEDROCK_READ_TIMEOUT', '60'))
+MANAGEMENT_READ_TIMEOUT = float(os.environ.get('MANAGEMENT_READ_TIMEOUT', '5'))
+# Optional https://{api-id}.execute-api.{region}.amazonaws.com/{stage}; creates its client during init
+WEBSOCKET_CALLBACK_URL = os.environ.get('WEBSOCKET_CALLBACK_URL', '')
+
+
+def client_config(read_timeout, max_attempts):
+    """Builds the botocore settings shared by the AWS clients."""
+    return Config(
+        region_name=REGION,
+        connect_timeout=AWS_CONNECT_TIMEOUT,
+        read_timeout=read_timeout,
+        max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        retries={"mode": "adaptive", "max_attempts": max_attempts}
+    )
+
+
+# AWS clients, created once per execution environment and reused while it stays warm.
+# Bedrock throttling is also retried with backoff in stream_answer, so few attempts here.
+bedrock_runtime = boto3.client('bedrock-runtime', config=client_config(BEDROCK_READ_TIMEOUT, 2))
+bedrock_agent_runtime = boto3.client('bedrock-agent-runtime', config=client_config(BEDROCK_READ_TIMEOUT, 3))
+MANAGEMENT_CONFIG = client_config(MANAGEMENT_READ_TIMEOUT, 3)
+
+# API Gateway management clients by callback endpoint
+_management_clients = {}
+
+
+def get_management_client(endpoint_url):
+    """
+    Returns the cached API Gateway management client for an endpoint, creating it on first use.
+    """
+    client = _management_clients.get(endpoint_url)
+    if client is None:
+        started = time.perf_counter()
+        client = boto3.client("apigatewaymanagementapi", endpoint_url=endpoint_url, config=MANAGEMENT_CONFIG)
+        _management_clients[endpoint_url] = client
+        print(f"Created management client for {endpoint_url} in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return client
+
+
+if WEBSOCKET_CALLBACK_URL:
+    get_management_client(WEBSOCKET_CALLBACK_URL)
+
+# Set on the first invocation of an execution environment
+_cold_start = True
 
 def lambda_handler(event, context):
+    global _cold_start
+    if _cold_start:
+        _cold_start = False
+        print(f"Cold start: init took {INIT_SECONDS * 1000:.0f} ms")
+
+    # REST (API Gateway REST or HTTP API) requests carry an HTTP method instead of a connection
+    if 'httpMethod' in event or 'http' in event.get('requestContext', {}):
+        return handle_http_request(event)
+
     route_key = event.get('requestContext', {}).get('routeKey')
     connection_id = event.get('requestContext', {}).get('connectionId')
 
@@ -34,65 +239,361 @@ def lambda_handler(event, context):
 
 
 def handle_message(event, connection_id):
+    request_id = None
+    encoding = "json"
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = json_loads(event.get('body') or '{}')
         user_query = body.get('text', '').strip()
-
-        # Step 1: Retrieve KB context
-        kb_context = retrieve_kb_context(user_query)
-
-        # Step 2: Call Claude Haiku with streaming and exponential backoff for throttling
-        response_stream = None
-        max_retries = 5
-        base_delay = 1  # seconds
-        for attempt in range(max_retries):
-            try:
-                response_stream = bedrock_runtime.invoke_model_with_response_stream(
-                    modelId=MODEL_ID,
-                    body=json.dumps({
-                        "anthropic_version": "bedrock-2023-05-31",
-                        "messages": [{"role": "user", "content": user_query}],
-                        "system": build_system_prompt(kb_context),
-                        "max_tokens": 800,
-                        "temperature": 0.6
-                    }),
-                    contentType="application/json",
-                    accept="application/json"
-                )
-                break
-            except bedrock_runtime.exceptions.ThrottlingException as e:
-                if attempt < max_retries - 1:
-                    delay = (base_delay * 2**attempt) + random.uniform(0, 1)
-                    print(f"ThrottlingException caught. Retrying in {delay:.2f} seconds... (Attempt {attempt + 1}/{max_retries})")
-                    time.sleep(delay)
-                else:
-                    print("Max retries reached for ThrottlingException. Failing.")
-                    raise e
-        if not response_stream:
-            raise Exception("Failed to get a response from Bedrock after multiple retries.")
-
-        # Step 3: Accumulate the full response and send it as a single message
-        full_response = ""
-        for event_chunk in response_stream['body']:
-            chunk_json = json.loads(event_chunk['chunk']['bytes'].decode())
-            if chunk_json.get("type") == "content_block_delta":
-                chunk = chunk_json['delta'].get('text', '')
-                full_response += chunk
-        # Send the full response as a single message
-        post_to_client(event, connection_id, {
-            "response": full_response.strip(),
+        # Clients multiplexing requests over one connection tag each with an id we echo back
+        request_id = body.get('request_id')
+        # Clients that can decode msgpack ask for it; everyone else keeps getting JSON
+        if body.get('accept_encoding') == "msgpack" and msgpack is not None:
+            encoding = "msgpack"
+        # Optional conversation context: recent turns verbatim plus a summary of older ones
+        history = body.get('history') or []
+        summary = (body.get('summary') or '').strip()[:MAX_SUMMARY_CHARS]
+
+        # Small talk and out-of-scope messages are answered from a template
+        full_response = short_circuit_answer(user_query)
+        if full_response is None:
+            if STREAM_RESPONSES:
+                full_response = stream_to_client(event, connection_id, user_query, history, summary,
+                                                 request_id, encoding)
+                if full_response is None:
+                    # The client went away; nobody is left to send the final frame to
+                    return {'statusCode': 200, 'body': 'Client disconnected'}
+            else:
+                full_response = answer_query(user_query, history, summary)
+        # Finish with the full response, which the client uses as the authoritative text
+        outcome = post_to_client(event, connection_id, {
+            "response": full_response,
             "session_id": connection_id
-        })
+        }, request_id, encoding, retries=2)
+        if outcome == SEND_FAILED:
+            # A smaller error frame may still get through, so the client stops waiting
+            post_to_client(event, connection_id, {"error": "Query failed: the response could not be delivered"},
+                           request_id, encoding)
 
     except Exception as e:
         error_msg = f"Query failed: {str(e)}"
         print(error_msg)
-        post_to_client(event, connection_id, {"error": error_msg})
+        post_to_client(event, connection_id, {"error": error_msg}, request_id, encoding)
 
     return {'statusCode': 200, 'body': 'Handled'}
 
 
+def handle_http_request(event):
+    """
+    Answers a question sent as a REST POST and returns the answer in the response body.
+    The body is the same JSON as a websocket sendMessage; the answer is the same
+    frame a websocket client receives, as JSON.
+    """
+    method = event.get('httpMethod') or event.get('requestContext', {}).get('http', {}).get('method')
+    if method != 'POST':
+        return http_response(405, {"error": f"Method {method} not allowed"})
+    try:
+        raw_body = event.get('body') or '{}'
+        if event.get('isBase64Encoded'):
+            raw_body = base64.b64decode(raw_body).decode('utf-8')
+        body = json_loads(raw_body)
+    except (ValueError, UnicodeDecodeError):
+        return http_response(400, {"error": "Request body must be JSON"})
+    if not isinstance(body, dict):
+        return http_response(400, {"error": "Request body must be a JSON object"})
+
+    user_query = (body.get('text') or '').strip()
+    if not user_query:
+        return http_response(400, {"error": "No text provided"})
+    session_id = body.get('session_id') or event.get('requestContext', {}).get('requestId')
+    data = {"session_id": session_id}
+    if body.get('request_id') is not None:
+        data["request_id"] = body['request_id']
+
+    try:
+        data["response"] = short_circuit_answer(user_query) or answer_query(
+            user_query,
+            body.get('history') or [],
+            (body.get('summary') or '').strip()[:MAX_SUMMARY_CHARS]
+        )
+        return http_response(200, data)
+    except Exception as e:
+        error_msg = f"Query failed: {str(e)}"
+        print(error_msg)
+        data["error"] = error_msg
+        return http_response(500, data)
+
+
+def http_response(status_code, data):
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json_dumps_bytes(data).decode('utf-8')
+    }
+
+
+def answer_query(user_query, history, summary):
+    """
+    Answers a question from the knowledge base and returns the full response text.
+    """
+    return "".join(stream_answer(user_query, history, summary)).strip()
+
+
+def stream_answer(user_query, history, summary):
+    """
+    Answers a question from the knowledge base, yielding the text deltas as Bedrock generates them.
+    """
+    # Step 1: Retrieve KB context
+    kb_context = retrieve_kb_context(user_query)
+
+    # Step 2: Call Claude Haiku with streaming and exponential backoff for throttling
+    response_stream = None
+    max_retries = 5
+    base_delay = 1  # seconds
+    for attempt in range(max_retries):
+        try:
+            response_stream = bedrock_runtime.invoke_model_with_response_stream(
+                modelId=MODEL_ID,
+                body=json_dumps_bytes({
+                    "anthropic_version": "bedrock-2023-05-31",
+                    "messages": build_messages(history, user_query),
+                    "system": build_system_prompt(kb_context, summary),
+                    "max_tokens": 800,
+                    "temperature": 0.6
+                }),
+                contentType="application/json",
+                accept="application/json"
+            )
+            break
+        except bedrock_runtime.exceptions.ThrottlingException as e:
+            if attempt < max_retries - 1:
+                delay = (base_delay * 2**attempt) + random.uniform(0, 1)
+                print(f"ThrottlingException caught. Retrying in {delay:.2f} seconds... (Attempt {attempt + 1}/{max_retries})")
+                time.sleep(delay)
+            else:
+                print("Max retries reached for ThrottlingException. Failing.")
+                raise e
+    if not response_stream:
+        raise Exception("Failed to get a response from Bedrock after multiple retries.")
+
+    # Step 3: Pass on the text deltas
+    for event_chunk in response_stream['body']:
+        chunk_json = json_loads(event_chunk['chunk']['bytes'])
+        if chunk_json.get("type") == "content_block_delta":
+            chunk = chunk_json['delta'].get('text', '')
+            if chunk:
+                yield chunk
+
+
+def coalesce_deltas(deltas, flush_seconds=STREAM_FLUSH_SECONDS, max_chars=STREAM_MAX_CHUNK_CHARS, clock=time.monotonic):
+    """
+    Merges text deltas into larger pieces to send as response_chunk frames.
+
+    Buffered text is released when it ends a sentence, when flush_seconds have
+    passed since the previous piece was released, or when it reaches max_chars.
+    The Lambda has no timer, so the time check runs as each delta arrives; the
+    first delta after the retrieval and model latency is released at once.
+    """
+    buffer = []
+    buffered_chars = 0
+    last_flush = clock()
+    for delta in deltas:
+        buffer.append(delta)
+        buffered_chars += len(delta)
+        now = clock()
+        if (now - last_flush >= flush_seconds or buffered_chars >= max_chars
+                or SENTENCE_END.search(delta)):
+            yield "".join(buffer)
+            buffer = []
+            buffered_chars = 0
+            last_flush = now
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_to_client(event, connection_id, user_query, history, summary, request_id=None, encoding="json"):
+    """
+    Streams an answer to the websocket client as numbered response_chunk frames.
+
+    A chunk that can't be sent for a transient reason is skipped; the final
+    response frame sent by handle_message has the full text.
+
+    Returns:
+        The full response text, or None if the client disconnected mid-stream.
+    """
+    started = time.monotonic()
+    parts = []
+    seq = 0
+    for piece in coalesce_deltas(stream_answer(user_query, history, summary)):
+        if not parts:
+            # Leading whitespace would only delay the first audible word
+            piece = piece.lstrip()
+            if not piece:
+                continue
+            print(f"First chunk after {time.monotonic() - started:.2f}s")
+        parts.append(piece)
+        outcome = post_to_client(event, connection_id, {
+            "response_chunk": piece,
+            "seq": seq,
+            "session_id": connection_id
+        }, request_id, encoding)
+        if outcome == SEND_GONE:
+            # Stop reading the model stream so no more tokens are generated for nobody
+            print(f"Stopping stream after {seq} chunks: client disconnected")
+            return None
+        if outcome == SEND_FAILED:
+            # The chunk is lost; clients take the text from the final response frame, which has all of it
+            print(f"Chunk {seq} could not be sent, continuing")
+        seq += 1
+    print(f"Streamed {seq} chunks in {time.monotonic() - started:.2f}s")
+    return "".join(parts).strip()
+
+
+def normalize_query(text):
+    """
+    Normalizes a query for cache lookups: case, quotes, punctuation and spacing
+    are ignored, so "What's P2P lending?" and "whats p2p lending" share an entry.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = text.replace("\u2019", "").replace("'", "")
+    # Punctuation and symbols only; combining marks of Indic scripts are kept
+    text = "".join(" " if unicodedata.category(char)[0] in "PS" else char for char in text)
+    return " ".join(text.split())
+
+
+class RetrievalCache:
+    """
+    LRU cache of knowledge base contexts with a TTL.
+
+    Entries live in memory for as long as the execution environment stays warm.
+    With a directory set, they are also written there (e.g. under /tmp), which
+    keeps entries after the memory tier evicts them. Keys include the knowledge
+    base id and KB_VERSION, so a new version never reads old contexts.
+    """
+
+    def __init__(self, max_entries, ttl_seconds, directory='', max_disk_entries=2000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self._entries = OrderedDict()  # key -> (expires_at, context)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as e:
+                print(f"KB cache directory unavailable, memory only: {e}")
+                self.directory = ''
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def key(self, normalized_query):
+        raw = f"{KNOWLEDGE_BASE_ID}|{KB_VERSION}|{normalized_query}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Returns (context, tier) for a live entry, or (None, None).
+        """
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], "memory"
+            del self._entries[key]
+        if self.directory:
+            path = os.path.join(self.directory, f"{key}.json")
+            try:
+                with open(path, 'rb') as f:
+                    stored = json_loads(f.read())
+                if stored["expires_at"] > now:
+                    self._remember(key, stored["expires_at"], stored["context"])
+                    self.disk_hits += 1
+                    return stored["context"], "disk"
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"Ignoring unreadable KB cache file {path}: {e}")
+        self.misses += 1
+        return None, None
+
+    def put(self, key, context):
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, expires_at, context)
+        if self.directory:
+            path = os.path.join(self.directory, f"{key}.json")
+            try:
+                temp_path = f"{path}.{os.getpid()}.tmp"
+                with open(temp_path, 'wb') as f:
+                    f.write(json_dumps_bytes({"expires_at": expires_at, "context": context}))
+                os.replace(temp_path, path)
+                self._prune_disk()
+            except OSError as e:
+                print(f"KB cache write failed: {e}")
+
+    def _remember(self, key, expires_at, context):
+        self._entries[key] = (expires_at, context)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self):
+        names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        if len(names) <= self.max_disk_entries:
+            return
+        paths = sorted((os.path.join(self.directory, name) for name in names), key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+kb_cache = RetrievalCache(KB_CACHE_MAX_ENTRIES, KB_CACHE_TTL_SECONDS, KB_CACHE_DIR, KB_CACHE_MAX_DISK_ENTRIES)
+
+
+def log_kb_cache(outcome, normalized_query, tier=None, retrieve_ms=None):
+    """Prints one JSON line per lookup, for CloudWatch Logs Insights queries on cache hits."""
+    record = {"kb_cache": outcome, "query": normalized_query[:200], "kb_version": KB_VERSION,
+              "hits": kb_cache.hits, "disk_hits": kb_cache.disk_hits, "misses": kb_cache.misses}
+    if tier:
+        record["tier"] = tier
+    if retrieve_ms is not None:
+        record["retrieve_ms"] = round(retrieve_ms, 1)
+    print(json_dumps_bytes(record).decode('utf-8'))
+
+
 def retrieve_kb_context(user_query):
+    """
+    Returns the knowledge base context for a query, from the cache when it is a repeat.
+    """
+    normalized = normalize_query(user_query)
+    if not kb_cache.enabled or not normalized:
+        return fetch_kb_context(user_query)
+
+    key = kb_cache.key(normalized)
+    context, tier = kb_cache.get(key)
+    if context is not None:
+        log_kb_cache("hit", normalized, tier=tier)
+        return context
+
+    started = time.perf_counter()
+    context = fetch_kb_context(user_query)
+    retrieve_ms = (time.perf_counter() - started) * 1000
+    # An empty context may be a transient problem; don't pin it for the TTL
+    if context:
+        kb_cache.put(key, context)
+    log_kb_cache("miss", normalized, retrieve_ms=retrieve_ms)
+    return context
+
+
+def fetch_kb_context(user_query):
     response = bedrock_agent_runtime.retrieve(
         retrievalQuery={"text": user_query},
         knowledgeBaseId=KNOWLEDGE_BASE_ID
@@ -114,7 +615,180 @@ def retrieve_kb_context(user_query):
 
 
 
-def build_system_prompt(kb_context):
+def _phrase_coverage(words, phrases):
+    """
+    Returns the indexes of words covered by any of the phrases, and the phrases found.
+    """
+    covered = set()
+    found = []
+    for phrase in phrases:
+        phrase_words = phrase.split()
+        size = len(phrase_words)
+        for start in range(len(words) - size + 1):
+            if words[start:start + size] == phrase_words:
+                covered.update(range(start, start + size))
+                if phrase not in found:
+                    found.append(phrase)
+    return covered, found
+
+
+def classify_query(user_query):
+    """
+    Decides whether a message can be answered from a template.
+
+    Small talk: at most CLASSIFIER_SMALL_TALK_MAX_WORDS words, of which at least
+    CLASSIFIER_SMALL_TALK_MIN_COVERAGE are small-talk phrases or filler, and no
+    domain keyword. The intent whose phrases cover the most words wins; a bare
+    acknowledgement ("great", "got it") only when no other intent matched.
+
+    Out of scope: no domain keyword, at least CLASSIFIER_OUT_OF_SCOPE_MIN_HITS
+    off-topic keywords, making up at least CLASSIFIER_OUT_OF_SCOPE_MIN_SHARE of
+    the words that aren't filler or stopwords.
+
+    Returns:
+        (label, trace): the label is LABEL_ANSWER, an intent in
+        SMALL_TALK_PHRASES or "out_of_scope"; the trace records the scores and
+        thresholds behind the decision.
+    """
+    words = normalize_query(user_query).split()
+    domain_hits = [word for word in words if word in DOMAIN_KEYWORDS]
+    trace = {"query": " ".join(words)[:200], "words": len(words), "domain_hits": domain_hits}
+    if not words:
+        return LABEL_ANSWER, {**trace, "reason": "empty"}
+    if domain_hits:
+        return LABEL_ANSWER, {**trace, "reason": "domain keyword"}
+
+    # Small talk
+    filler = {index for index, word in enumerate(words) if word in FILLER_WORDS}
+    best_intent, best_covered, intent_scores = None, set(), {}
+    all_covered = set(filler)
+    for intent, phrases in SMALL_TALK_PHRASES.items():
+        covered, found = _phrase_coverage(words, phrases)
+        if found:
+            intent_scores[intent] = found
+        all_covered |= covered
+        if not covered or (intent == "acknowledgement" and best_intent is not None):
+            continue
+        if len(covered) > len(best_covered):
+            best_intent, best_covered = intent, covered
+    coverage = len(all_covered) / len(words)
+    trace.update(small_talk=intent_scores, small_talk_coverage=round(coverage, 2),
+                 min_coverage=CLASSIFIER_SMALL_TALK_MIN_COVERAGE)
+    if (best_intent and len(words) <= CLASSIFIER_SMALL_TALK_MAX_WORDS
+            and coverage >= CLASSIFIER_SMALL_TALK_MIN_COVERAGE):
+        return best_intent, {**trace, "reason": "small talk"}
+
+    # Out of scope; multi-word keywords are matched as phrases
+    _, off_topic_hits = _phrase_coverage(words, OFF_TOPIC_KEYWORDS)
+    content_words = [word for word in words if word not in FILLER_WORDS and word not in STOPWORDS] or words
+    share = len(off_topic_hits) / len(content_words)
+    trace.update(off_topic_hits=off_topic_hits, off_topic_share=round(share, 2),
+                 min_hits=CLASSIFIER_OUT_OF_SCOPE_MIN_HITS, min_share=CLASSIFIER_OUT_OF_SCOPE_MIN_SHARE)
+    if len(off_topic_hits) >= CLASSIFIER_OUT_OF_SCOPE_MIN_HITS and share >= CLASSIFIER_OUT_OF_SCOPE_MIN_SHARE:
+        return "out_of_scope", {**trace, "reason": "off-topic keywords"}
+    return LABEL_ANSWER, {**trace, "reason": "below thresholds"}
+
+
+def short_circuit_answer(user_query):
+    """
+    Returns a templated answer for small talk and out-of-scope messages, or None
+    if the message needs the knowledge base and the model. Logs the decision trace.
+    """
+    if not CLASSIFIER_ENABLED:
+        return None
+    started = time.perf_counter()
+    label, trace = classify_query(user_query)
+    trace["classifier"] = label
+    trace["classify_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    print(json_dumps_bytes(trace).decode('utf-8'))
+    if label == LABEL_ANSWER:
+        return None
+    language = "hi" if DEVANAGARI.search(user_query) else "en"
+    return TEMPLATE_ANSWERS[label][language]
+
+
+def evaluate_classifier(corpus_path=CLASSIFIER_CORPUS_PATH):
+    """
+    Runs the classifier over a JSONL corpus of {"text", "label"} records.
+
+    The figure to watch is false short-circuits: real questions answered from a
+    template. Missed small talk only costs a normal model call. Precision is the
+    share of short-circuits that got the right template, and recall the share of
+    small talk and out-of-scope records that got it; both must stay at or above
+    CLASSIFIER_MIN_PRECISION and CLASSIFIER_MIN_RECALL.
+
+    Returns:
+        A dict with the accuracy, precision and recall, the false
+        short-circuits, the missed short-circuits and the other mislabelled records.
+    """
+    records = []
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                records.append(json_loads(line))
+    false_short_circuits, missed, mislabelled = [], [], []
+    correct = correct_short_circuits = short_circuits = expected_short_circuits = 0
+    for record in records:
+        label, _ = classify_query(record["text"])
+        short_circuits += label != LABEL_ANSWER
+        expected_short_circuits += record["label"] != LABEL_ANSWER
+        if label == record["label"]:
+            correct += 1
+            correct_short_circuits += label != LABEL_ANSWER
+        elif record["label"] == LABEL_ANSWER:
+            false_short_circuits.append({"text": record["text"], "predicted": label})
+        elif label == LABEL_ANSWER:
+            missed.append({"text": record["text"], "expected": record["label"]})
+        else:
+            mislabelled.append({"text": record["text"], "expected": record["label"], "predicted": label})
+    return {
+        "records": len(records),
+        "accuracy": round(correct / len(records), 3) if records else 0.0,
+        "precision": round(correct_short_circuits / short_circuits, 3) if short_circuits else 1.0,
+        "recall": round(correct_short_circuits / expected_short_circuits, 3) if expected_short_circuits else 1.0,
+        "false_short_circuits": false_short_circuits,
+        "missed_short_circuits": missed,
+        "mislabelled": mislabelled,
+    }
+
+
+def build_messages(history, user_query):
+    """
+    Builds the Bedrock messages from the client's recent turns and the new question.
+    The Messages API needs alternating roles starting with the user, so malformed
+    entries are dropped and consecutive messages of the same role are merged.
+    """
+    messages = []
+    for message in history[-MAX_HISTORY_MESSAGES:] if isinstance(history, list) else []:
+        if not isinstance(message, dict):
+            continue
+        role = message.get('role')
+        content = message.get('content')
+        if role not in ('user', 'assistant') or not isinstance(content, str) or not content.strip():
+            continue
+        content = content.strip()[:MAX_MESSAGE_CHARS]
+        if not messages and role != 'user':
+            continue
+        if messages and messages[-1]['role'] == role:
+            messages[-1]['content'] += "\n" + content
+        else:
+            messages.append({"role": role, "content": content})
+
+    if messages and messages[-1]['role'] == 'user':
+        messages[-1]['content'] += "\n" + user_query
+    else:
+        messages.append({"role": "user", "content": user_query})
+    return messages
+
+
+def build_system_prompt(kb_context, summary=""):
+    conversation_summary = ""
+    if summary:
+        conversation_summary = f"""
+
+🗒️ **Earlier in this conversation** (summary, use it to resolve follow-up questions):
+
+{summary}"""
     return f"""
 You are a smart, emotionally aware, human-like voice assistant built to educate and onboard users into Peer-to-Peer (P2P) lending platforms.
 
@@ -141,25 +815,72 @@ You act like a friendly, confident sales associate — guiding users through the
 
 📚 **Knowledge Base Content** (use this as your source of truth):
 
-{kb_context}
+{kb_context}{conversation_summary}
 """.strip()
 
 
 
 
-def post_to_client(event, connection_id, data):
+def encode_frame(data, encoding="json"):
+    """
+    Serializes a frame for the client: msgpack with short keys if negotiated, compact JSON otherwise.
+    """
+    if encoding == "msgpack":
+        return msgpack.packb({FRAME_KEYS.get(key, key): value for key, value in data.items()}, use_bin_type=True)
+    return json_dumps_bytes(data)
+
+
+# Outcomes of post_to_client
+SEND_OK = "sent"
+SEND_GONE = "gone"  # The client disconnected; nothing more can reach it
+SEND_FAILED = "failed"  # Throttling, limits or a timeout; the connection may still be there
+
+
+def post_to_client(event, connection_id, data, request_id=None, encoding="json", retries=1):
     """
     Sends a message to the connected WebSocket client.
+    Echoes the client's request_id, if any, so it can route the frame.
+    Failures other than a closed connection are retried up to `retries` times.
+
+    Returns:
+        SEND_OK, SEND_GONE if the connection no longer exists, or SEND_FAILED.
     """
+    if request_id is not None:
+        data["request_id"] = request_id
     try:
         domain = event['requestContext']['domainName']
         stage = event['requestContext']['stage']
         endpoint_url = f"https://{domain}/{stage}"
-
-        gw = boto3.client("apigatewaymanagementapi", endpoint_url=endpoint_url)
-        gw.post_to_connection(
-            ConnectionId=connection_id,
-            Data=json.dumps(data).encode('utf-8')
-        )
+        frame = encode_frame(data, encoding)
     except Exception as e:
         print(f"WebSocket send failed: {e}")
+        return SEND_FAILED
+
+    for attempt in range(retries + 1):
+        try:
+            get_management_client(endpoint_url).post_to_connection(ConnectionId=connection_id, Data=frame)
+            return SEND_OK
+        except Exception as e:
+            error_code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if error_code == 'GoneException':
+                print(f"WebSocket connection {connection_id} is gone")
+                return SEND_GONE
+            print(f"WebSocket send failed (attempt {attempt + 1}/{retries + 1}): {error_code or e}")
+            if attempt < retries:
+                time.sleep(0.05 * (attempt + 1))
+    return SEND_FAILED
+
+
+# Module initialization ends here; everything above runs once per cold start
+INIT_SECONDS = time.perf_counter() - _INIT_STARTED
+
+
+# Example usage: check the short-circuit classifier against its corpus before deploying
+if __name__ == "__main__":
+    import sys
+
+    report = evaluate_classifier(sys.argv[1] if len(sys.argv) > 1 else CLASSIFIER_CORPUS_PATH)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    # Real questions answered from a template are the failure that matters
+    sys.exit(1 if report["false_short_circuits"] or report["precision"] < CLASSIFIER_MIN_PRECISION
+             or report["recall"] < CLASSIFIER_MIN_RECALL else 0)
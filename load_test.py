@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+P2P Lending Voice AI Assistant - Load Test
+
+Drives the web server's endpoints with concurrent simulated users and reports
+throughput, latency percentiles, error rates and audio-ready latency per
+endpoint, as a table and as a JSON file for capacity planning and regression
+gates.
+
+Two load models are supported:
+
+- closed loop (--concurrency N): N users each send a request, wait for the
+  answer (and its audio), and immediately send the next one.
+- open loop (--rate R): requests arrive at R per second regardless of how fast
+  the server answers, so queueing shows up in the latencies.
+
+With --launch, the NLP backend and ElevenLabs TTS and STT are replaced by the
+mocks in mock_backend.py and server.py is started against them, so the numbers
+measure this node rather than API Gateway, Bedrock and ElevenLabs, and need no
+keys. The mock TTS returns silent audio sized to the answer, so audio-ready
+latency still reflects the synthesis path; --real-speech keeps ElevenLabs.
+
+    python load_test.py --launch --concurrency 8 --duration 60 --endpoints text=3,sse=1
+    python load_test.py --base-url http://10.0.0.5:5000 --rate 5 --duration 120 --output results.json
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import signal
+import logging
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import requests
+
+# Add the project root to the Python path to allow for module imports
+sys.path.append('.')
+
+from modules.utils import percentile
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+ENDPOINTS = {
+    "text": "/api/text",
+    "speech": "/api/speech",
+    "text_stream": "/api/text_stream",
+    "sse": "/api/text_sse",
+}
+
+DEFAULT_QUESTIONS = [
+    "What is P2P lending?",
+    "What are the risks of P2P lending?",
+    "How is P2P lending regulated in India?",
+    "How much can I invest?",
+]
+
+
+@dataclass
+class Sample:
+    """The outcome of one request."""
+    endpoint: str
+    started: float
+    latency_ms: float
+    ok: bool
+    error: Optional[str] = None
+    first_event_ms: Optional[float] = None
+    audio_ready_ms: Optional[float] = None
+    audio_timeout: bool = False
+
+
+@dataclass
+class EndpointStats:
+    """Aggregated samples of one endpoint."""
+    samples: List[Sample] = field(default_factory=list)
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        def summary(values):
+            def rounded(value):
+                return round(value, 1) if value is not None else None
+            return {
+                "p50": rounded(percentile(values, 50)),
+                "p95": rounded(percentile(values, 95)),
+                "p99": rounded(percentile(values, 99)),
+                "max": rounded(max(values)) if values else None
+            }
+
+        total = len(self.samples)
+        errors = [sample for sample in self.samples if not sample.ok]
+        latencies = [sample.latency_ms for sample in self.samples if sample.ok]
+        first_events = [sample.first_event_ms for sample in self.samples if sample.ok and sample.first_event_ms is not None]
+        audio = [sample.audio_ready_ms for sample in self.samples if sample.audio_ready_ms is not None]
+        error_kinds: Dict[str, int] = {}
+        for sample in errors:
+            error_kinds[sample.error] = error_kinds.get(sample.error, 0) + 1
+        result = {
+            "requests": total,
+            "errors": len(errors),
+            "error_rate": round(len(errors) / total, 4) if total else 0.0,
+            "throughput_rps": round((total - len(errors)) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": summary(latencies),
+            "error_kinds": dict(sorted(error_kinds.items(), key=lambda item: -item[1])[:10])
+        }
+        if first_events:
+            result["first_event_ms"] = summary(first_events)
+        if audio or any(sample.audio_timeout for sample in self.samples):
+            result["audio_ready_ms"] = summary(audio)
+            result["audio_timeouts"] = sum(1 for sample in self.samples if sample.audio_timeout)
+        return result
+
+
+class LoadTester:
+    """Sends requests to the server and collects their samples."""
+
+    def __init__(self, base_url: str, questions: List[str], audio_path: str, timeout: float = 60.0,
+                 audio_timeout: float = 30.0, wait_for_audio: bool = True):
+        self.base_url = base_url.rstrip("/")
+        self.questions = questions
+        self.timeout = timeout
+        self.audio_timeout = audio_timeout
+        self.wait_for_audio = wait_for_audio
+        with open(audio_path, "rb") as f:
+            self.audio_bytes = f.read()
+        self.audio_name = os.path.basename(audio_path)
+        self.stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        # One keep-alive session per user thread, like one browser per user
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def run_one(self, endpoint: str) -> Sample:
+        """Sends one request to an endpoint and records its sample."""
+        started = time.perf_counter()
+        sample = Sample(endpoint=endpoint, started=time.time(), latency_ms=0.0, ok=True)
+        try:
+            getattr(self, f"_request_{endpoint}")(sample, started)
+        except requests.exceptions.RequestException as e:
+            sample.ok = False
+            sample.error = type(e).__name__
+        except Exception as e:
+            sample.ok = False
+            sample.error = f"{type(e).__name__}: {e}"[:120]
+        if not sample.latency_ms:
+            sample.latency_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.stats.setdefault(endpoint, EndpointStats()).samples.append(sample)
+        return sample
+
+    def _check(self, sample: Sample, response: requests.Response) -> Optional[Dict[str, Any]]:
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if response.status_code != 200 or (isinstance(data, dict) and "error" in data):
+            sample.ok = False
+            sample.error = f"HTTP {response.status_code}"
+        return data
+
+    def _wait_for_audio(self, sample: Sample, started: float, data: Optional[Dict[str, Any]]):
+        """Polls the returned audio URL until the file exists, measuring when audio became playable."""
+        audio_url = (data or {}).get("audio_url")
+        if not self.wait_for_audio or not sample.ok or not audio_url:
+            return
+        deadline = time.perf_counter() + self.audio_timeout
+        while time.perf_counter() < deadline:
+            response = self.session.head(f"{self.base_url}{audio_url}", timeout=self.timeout)
+            if response.status_code == 200:
+                sample.audio_ready_ms = (time.perf_counter() - started) * 1000
+                return
+            time.sleep(0.1)
+        sample.audio_timeout = True
+
+    def _request_text(self, sample: Sample, started: float):
+        response = self.session.post(f"{self.base_url}{ENDPOINTS['text']}",
+                                     json={"text": random.choice(self.questions)}, timeout=self.timeout)
+        sample.latency_ms = (time.perf_counter() - started) * 1000
+        self._wait_for_audio(sample, started, self._check(sample, response))
+
+    def _request_speech(self, sample: Sample, started: float):
+        files = {"audio": (self.audio_name, self.audio_bytes, "audio/wav")}
+        response = self.session.post(f"{self.base_url}{ENDPOINTS['speech']}", files=files,
+                                     data={"history": "[]"}, timeout=self.timeout)
+        sample.latency_ms = (time.perf_counter() - started) * 1000
+        self._wait_for_audio(sample, started, self._check(sample, response))
+
+    def _request_text_stream(self, sample: Sample, started: float):
+        response = self.session.post(f"{self.base_url}{ENDPOINTS['text_stream']}",
+                                     json={"text": random.choice(self.questions)}, timeout=self.timeout)
+        self._check(sample, response)
+
+    def _request_sse(self, sample: Sample, started: float):
+        with self.session.post(f"{self.base_url}{ENDPOINTS['sse']}", json={"text": random.choice(self.questions)},
+                               timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                sample.ok = False
+                sample.error = f"HTTP {response.status_code}"
+                return
+            event_type = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event:"):
+                    event_type = line[6:].strip()
+                    if sample.first_event_ms is None:
+                        sample.first_event_ms = (time.perf_counter() - started) * 1000
+                elif not line:
+                    if event_type == "error":
+                        sample.ok = False
+                        sample.error = "SSE error event"
+                    if event_type in ("final", "error"):
+                        break
+            else:
+                if event_type not in ("final", "error"):
+                    sample.ok = False
+                    sample.error = "SSE stream ended early"
+        sample.latency_ms = (time.perf_counter() - started) * 1000
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        endpoints = {name: endpoint_stats.to_dict(elapsed) for name, endpoint_stats in sorted(stats.items())}
+        total = sum(result["requests"] for result in endpoints.values())
+        errors = sum(result["errors"] for result in endpoints.values())
+        return {
+            "endpoints": endpoints,
+            "overall": {
+                "requests": total,
+                "errors": errors,
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "throughput_rps": round((total - errors) / elapsed, 2) if elapsed > 0 else 0.0
+            }
+        }
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parses an endpoint mix like 'text=3,sse=1' (or 'text,speech' for equal weights)."""
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'; choose from {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def load_questions(path: str) -> List[str]:
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            questions = [row["Questions"].strip() for row in csv.DictReader(f) if (row.get("Questions") or "").strip()]
+    except (FileNotFoundError, KeyError):
+        questions = []
+    return questions or DEFAULT_QUESTIONS
+
+
+def run_closed_loop(tester: LoadTester, mix: Dict[str, float], concurrency: int, duration: float):
+    """Runs `concurrency` users back to back for `duration` seconds."""
+    names, weights = list(mix), list(mix.values())
+    deadline = time.monotonic() + duration
+
+    def user():
+        while time.monotonic() < deadline:
+            tester.run_one(random.choices(names, weights)[0])
+
+    threads = [threading.Thread(target=user, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def run_open_loop(tester: LoadTester, mix: Dict[str, float], rate: float, duration: float,
+                  max_in_flight: int) -> int:
+    """Sends requests with Poisson arrivals at `rate` per second; returns the arrivals that found no free worker."""
+    names, weights = list(mix), list(mix.values())
+    slots = threading.BoundedSemaphore(max_in_flight)
+    skipped = 0
+
+    def send(endpoint):
+        try:
+            tester.run_one(endpoint)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        next_arrival = time.monotonic()
+        deadline = next_arrival + duration
+        while next_arrival < deadline:
+            time.sleep(max(next_arrival - time.monotonic(), 0))
+            if slots.acquire(blocking=False):
+                executor.submit(send, random.choices(names, weights)[0])
+            else:
+                # The load generator itself is saturated; count it instead of silently slowing down
+                skipped += 1
+            next_arrival += random.expovariate(rate)
+    return skipped
+
+
+def launch_stack(port: int, mock_args: Dict[str, Any], mock_speech: bool = True):
+    """
+    Starts the mock NLP backend, the mock ElevenLabs endpoints and server.py against them.
+
+    Returns:
+        (backend, speech, server_process); speech is None when mock_speech is False.
+    """
+    from mock_backend import MockBackend, MockBackendConfig, MockSpeech
+
+    # Per-connection logs of the in-process mock would drown the report
+    logging.getLogger("websockets").setLevel(logging.WARNING)
+    backend = MockBackend(MockBackendConfig(**mock_args)).start_in_background()
+    env = dict(os.environ, API_GATEWAY_URL=backend.url, API_GATEWAY_KEY="")
+    speech = None
+    if mock_speech:
+        speech = MockSpeech().start_in_background()
+        # server.py's load_dotenv() doesn't override these, so a .env with real keys is ignored
+        env.update(ELEVENLABS_API_URL=speech.api_url, ELEVENLABS_WS_URL=speech.ws_url, ELEVENLABS_API_KEY="mock")
+
+    def stop_mocks():
+        backend.stop_background()
+        if speech is not None:
+            speech.stop_background()
+
+    process = subprocess.Popen([sys.executable, "server.py", "--port", str(port)], env=env,
+                               cwd=os.path.dirname(os.path.abspath(__file__)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            stop_mocks()
+            raise RuntimeError(f"server.py exited with code {process.returncode}")
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                mocks = f"the mock backend at {backend.url}"
+                if speech is not None:
+                    mocks += f" and mock ElevenLabs at {speech.api_url} / {speech.ws_url}"
+                logger.info(f"Server started on {base_url} with {mocks}")
+                return backend, speech, process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    process.send_signal(signal.SIGINT)
+    stop_mocks()
+    raise RuntimeError("server.py did not become healthy within 60s")
+
+
+def print_table(report: Dict[str, Any]):
+    print(f"\n{'endpoint':<12} {'reqs':>6} {'err%':>6} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'audio p95':>10}")
+    for name, result in report["endpoints"].items():
+        latency = result["latency_ms"]
+        audio = result.get("audio_ready_ms", {}).get("p95")
+
+        def fmt(value):
+            return f"{value:.0f}" if value is not None else "-"
+
+        print(f"{name:<12} {result['requests']:>6} {result['error_rate'] * 100:>5.1f}% {result['throughput_rps']:>7.2f} "
+              f"{fmt(latency['p50']):>8} {fmt(latency['p95']):>8} {fmt(latency['p99']):>8} {fmt(audio):>10}")
+    overall = report["overall"]
+    print(f"{'overall':<12} {overall['requests']:>6} {overall['error_rate'] * 100:>5.1f}% {overall['throughput_rps']:>7.2f}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the web server's endpoints.")
+    parser.add_argument("--base-url", default="http://127.0.0.1:5000", help="Server to test (ignored with --launch).")
+    parser.add_argument("--endpoints", type=parse_mix, default=parse_mix("text"),
+                        help=f"Endpoint mix with optional weights, e.g. 'text=3,speech=1,sse=1'. Endpoints: {', '.join(ENDPOINTS)}.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, default=None, help="Closed loop: number of concurrent users (default 4).")
+    mode.add_argument("--rate", type=float, default=None, help="Open loop: request arrivals per second.")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Open loop: cap on concurrent requests.")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to generate load for.")
+    parser.add_argument("--warmup", type=float, default=0.0, help="Seconds of load before measuring (results discarded).")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds.")
+    parser.add_argument("--audio-timeout", type=float, default=30.0, help="Seconds to wait for generated audio.")
+    parser.add_argument("--no-audio-wait", action="store_true", help="Don't poll for generated audio.")
+    parser.add_argument("--questions", default="test.csv", help="CSV with a 'Questions' column to sample from.")
+    parser.add_argument("--audio", default="data/sample_audio.wav", help="Audio file uploaded to /api/speech.")
+    parser.add_argument("--output", default="load_test_results.json", help="Where to write the JSON report.")
+    parser.add_argument("--launch", action="store_true",
+                        help="Start the mock backend, mock ElevenLabs and server.py locally first.")
+    parser.add_argument("--real-speech", action="store_true", help="With --launch, call ElevenLabs instead of mocking it.")
+    parser.add_argument("--port", type=int, default=5055, help="Port for the launched server.")
+    parser.add_argument("--mock-first-token-delay", type=float, default=0.3, help="Mock backend first-token delay.")
+    parser.add_argument("--mock-tokens-per-second", type=float, default=50.0, help="Mock backend streaming rate.")
+    parser.add_argument("--mock-error-rate", type=float, default=0.0, help="Mock backend error-frame rate.")
+    parser.add_argument("--max-p95-ms", type=float, default=None, help="Exit with 1 if any endpoint's p95 exceeds this.")
+    parser.add_argument("--max-error-rate", type=float, default=None, help="Exit with 1 if the overall error rate exceeds this.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for question, endpoint and arrival sampling.")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    backend = speech = process = None
+    base_url = args.base_url
+    if args.launch:
+        backend, speech, process = launch_stack(args.port, {
+            "first_token_delay": args.mock_first_token_delay,
+            "tokens_per_second": args.mock_tokens_per_second,
+            "error_rate": args.mock_error_rate,
+            "seed": args.seed
+        }, mock_speech=not args.real_speech)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    load_mode = "open" if args.rate is not None else "closed"
+    concurrency = args.concurrency or 4
+    skipped = 0
+    try:
+        tester = LoadTester(base_url, load_questions(args.questions), args.audio, timeout=args.timeout,
+                            audio_timeout=args.audio_timeout, wait_for_audio=not args.no_audio_wait)
+
+        def generate(duration):
+            if load_mode == "open":
+                return run_open_loop(tester, args.endpoints, args.rate, duration, args.max_in_flight)
+            run_closed_loop(tester, args.endpoints, concurrency, duration)
+            return 0
+
+        if args.warmup > 0:
+            logger.info(f"Warming up for {args.warmup:.0f}s")
+            generate(args.warmup)
+            tester.stats.clear()
+
+        load = f"{args.rate} req/s" if load_mode == "open" else f"{concurrency} users"
+        logger.info(f"Running {load_mode}-loop load ({load}) against {base_url} for {args.duration:.0f}s: {args.endpoints}")
+        started = time.monotonic()
+        skipped = generate(args.duration)
+        elapsed = time.monotonic() - started
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if backend is not None:
+            backend.stop_background()
+        if speech is not None:
+            speech.stop_background()
+
+    report = tester.report(elapsed)
+    report["config"] = {
+        "base_url": base_url,
+        "mode": load_mode,
+        "concurrency": concurrency if load_mode == "closed" else None,
+        "rate": args.rate,
+        "duration_seconds": round(elapsed, 2),
+        "endpoints": args.endpoints,
+        "mock_backend": args.launch,
+        "mock_speech": speech is not None
+    }
+    report["overall"]["skipped_arrivals"] = skipped
+    report["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_table(report)
+    logger.info(f"Report written to {args.output}")
+
+    failed = False
+    if args.max_error_rate is not None and report["overall"]["error_rate"] > args.max_error_rate:
+        logger.error(f"Error rate {report['overall']['error_rate']:.2%} exceeds {args.max_error_rate:.2%}")
+        failed = True
+    if args.max_p95_ms is not None:
+        for name, result in report["endpoints"].items():
+            p95 = result["latency_ms"]["p95"]
+            if p95 is not None and p95 > args.max_p95_ms:
+                logger.error(f"{name} p95 {p95:.0f}ms exceeds {args.max_p95_ms:.0f}ms")
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
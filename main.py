@@ -202,8 +202,8 @@ async def live_demo(voice_mode=True):
             # Append user message to history
             conversation_history.append({"role": "user", "content": user_query})
 
-            # The pipeline now needs the full history
-            nlp_data = nlp_pipeline.process_input(
+            # The pipeline sends the recent turns and a rolling summary of older ones
+            nlp_data = await nlp_pipeline.process_input(
                 user_query, 
                 session_id=session_id,
                 history=conversation_history
@@ -212,8 +212,9 @@ async def live_demo(voice_mode=True):
             # Step 2: Generate the final response
             final_response = response_generator.get_final_answer(nlp_data)
 
-            # Append bot message to history
+            # Append bot message to history, dropping turns already folded into the session summary
             conversation_history.append({"role": "assistant", "content": final_response})
+            conversation_history = nlp_pipeline.context.compact(session_id, conversation_history)
             
             print(f"Bot: {final_response}")
             
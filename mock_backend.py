@@ -0,0 +1,560 @@
+#!/usr/bin/env python3
+"""
+P2P Lending Voice AI Assistant - Mock NLP Backend
+
+A local stand-in for the API Gateway websocket and lambda/lambda_code.py, for
+benchmarking and regression-testing the client side offline. It speaks the
+same protocol: it accepts sendMessage requests, echoes their request_id,
+streams the answer as response_chunk frames and finishes with a response
+frame (msgpack with short keys if the client asks for it, JSON otherwise).
+
+Answers come from submission.csv, and timing and failures are configurable:
+the delay before the first token, tokens per second, the share of requests
+answered with an error frame or cut off by dropping the connection, and the
+share of streamed chunks lost on the way.
+
+Run it from the command line and point the app at it:
+
+    python mock_backend.py --port 8765 --first-token-delay 0.5 --tokens-per-second 40
+    API_GATEWAY_URL=ws://127.0.0.1:8765 python server.py
+
+or use it from code, as an async context manager:
+
+    async with MockBackend(MockBackendConfig(error_rate=0.1)) as backend:
+        client = WebSocketClient(backend.url)
+
+or from pytest, by enabling this module as a plugin (``pytest_plugins = ["mock_backend"]``
+in a conftest.py) and requesting the ``mock_backend`` fixture. Override the
+``mock_backend_config`` fixture to change its settings.
+
+With --speech it also mocks ElevenLabs: a TTS websocket that answers with
+silent PCM audio sized to the text, and an STT endpoint that returns canned
+transcripts (see MockSpeech), so the speech routes run without a key:
+
+    python mock_backend.py --speech
+    ELEVENLABS_API_URL=http://127.0.0.1:8767 ELEVENLABS_WS_URL=ws://127.0.0.1:8766 python server.py
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import time
+import uuid
+import base64
+import random
+import asyncio
+import logging
+import argparse
+import threading
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import websockets
+import websockets.exceptions
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+# Add the project root to the Python path to allow for module imports
+sys.path.append('.')
+
+from modules import json_codec
+from modules.event_loop import BackgroundEventLoop
+from modules.faq_index import normalize_question
+from modules.websocket_client import FRAME_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Long frame keys to the short ones used in msgpack frames, as in the Lambda
+SHORT_KEYS = {long_key: short_key for short_key, long_key in FRAME_KEYS.items()}
+TOKEN = re.compile(r"\S+\s*")
+
+# The canned answers next to this script, so the mock works from any directory
+DEFAULT_ANSWERS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "submission.csv")
+
+# What the mock STT "hears", in turn
+DEFAULT_TRANSCRIPTS = [
+    "What is LenDenClub?",
+    "How does P2P lending work on LenDenClub?",
+    "Is LenDenClub registered with RBI?",
+]
+
+# The mock TTS returns 16 kHz, 16-bit mono PCM (output_format=pcm_16000) in 250 ms frames
+TTS_SAMPLE_RATE = 16000
+TTS_FRAME_SECONDS = 0.25
+
+DEFAULT_ANSWER = ("P2P lending connects lenders directly with borrowers through an online platform. "
+                  "Lenders earn interest on the loans they fund, and borrowers can get credit without a bank.")
+
+
+@dataclass
+class MockBackendConfig:
+    """Behaviour of the mock backend."""
+    host: str = "127.0.0.1"
+    port: int = 0  # 0 picks a free port; read it from MockBackend.url
+    first_token_delay: float = 0.3  # Seconds before the first frame, like KB retrieval plus Bedrock's time to first token
+    first_token_jitter: float = 0.0  # Up to this many seconds are added at random to the first-token delay
+    tokens_per_second: float = 50.0  # Streaming rate after the first token; 0 sends the answer at once
+    chunk_tokens: int = 1  # Tokens per response_chunk frame
+    stream: bool = True  # False sends only the final response frame
+    error_rate: float = 0.0  # Share of requests answered with an error frame
+    drop_rate: float = 0.0  # Share of requests cut off by closing the connection mid-answer
+    chunk_loss_rate: float = 0.0  # Share of response_chunk frames never sent, like a throttled post in the Lambda
+    answers_path: Optional[str] = DEFAULT_ANSWERS_PATH  # CSV with 'Questions' and 'Responses' columns
+    default_answer: str = DEFAULT_ANSWER  # Answer to questions that aren't in the CSV
+    seed: Optional[int] = None  # Seed for reproducible jitter and failure injection
+
+
+@dataclass
+class MockBackendStats:
+    """Counters of the traffic the mock backend has served."""
+    connections: int = 0
+    open_connections: int = 0
+    requests: int = 0
+    answered: int = 0
+    errors: int = 0
+    drops: int = 0
+    lost_chunks: int = 0
+    canned_hits: int = 0
+    frames_sent: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "connections": self.connections,
+            "open_connections": self.open_connections,
+            "requests": self.requests,
+            "answered": self.answered,
+            "errors": self.errors,
+            "drops": self.drops,
+            "lost_chunks": self.lost_chunks,
+            "canned_hits": self.canned_hits,
+            "frames_sent": self.frames_sent,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1)
+        }
+
+
+def load_answers(path: Optional[str]) -> Dict[str, str]:
+    """Reads the canned answers, keyed by normalized question."""
+    answers: Dict[str, str] = {}
+    if not path:
+        return answers
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                question = (row.get("Questions") or "").strip()
+                answer = (row.get("Responses") or "").strip()
+                if question and answer and not answer.startswith("[Processing"):
+                    answers[normalize_question(question)] = answer
+    except FileNotFoundError:
+        logger.warning(f"Answers file {path} not found, every question gets the default answer")
+    return answers
+
+
+class MockBackend:
+    """A local websocket server imitating the NLP backend."""
+
+    def __init__(self, config: Optional[MockBackendConfig] = None):
+        self.config = config or MockBackendConfig()
+        self.answers = load_answers(self.config.answers_path)
+        self.stats = MockBackendStats()
+        self._random = random.Random(self.config.seed)
+        self._server = None
+        self._port: Optional[int] = None
+        self._background: Optional[BackgroundEventLoop] = None
+
+    @property
+    def url(self) -> str:
+        """The ws:// URL to use as API_GATEWAY_URL."""
+        if self._port is None:
+            raise RuntimeError("Mock backend is not running")
+        return f"ws://{self.config.host}:{self._port}"
+
+    async def start(self) -> "MockBackend":
+        """Starts listening; returns once the port is bound."""
+        self._server = await websockets.serve(self._handle_connection, self.config.host, self.config.port)
+        self._port = self._server.sockets[0].getsockname()[1]
+        self.stats = MockBackendStats()
+        logger.info(f"Mock backend listening on {self.url} with {len(self.answers)} canned answers")
+        return self
+
+    async def stop(self):
+        """Closes the server and all connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            logger.info(f"Mock backend stopped: {self.stats.to_dict()}")
+
+    async def __aenter__(self) -> "MockBackend":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def start_in_background(self) -> "MockBackend":
+        """Starts the server on its own event loop thread, for synchronous callers and tests."""
+        self._background = BackgroundEventLoop(name="mock-backend").start()
+        self._background.run(self.start(), timeout=10)
+        return self
+
+    def stop_background(self):
+        """Stops a server started with start_in_background()."""
+        if self._background is not None:
+            self._background.run(self.stop(), timeout=10)
+            self._background.stop()
+            self._background = None
+
+    def answer_for(self, text: str) -> str:
+        """The canned answer to a question, or the default answer."""
+        answer = self.answers.get(normalize_question(text))
+        if answer is not None:
+            self.stats.canned_hits += 1
+            return answer
+        return self.config.default_answer
+
+    async def _handle_connection(self, websocket):
+        # Like the API Gateway connection id, which the Lambda returns as the session id
+        connection_id = uuid.uuid4().hex[:16]
+        self.stats.connections += 1
+        self.stats.open_connections += 1
+        tasks = set()
+        try:
+            async for message in websocket:
+                try:
+                    body = json_codec.loads(message)
+                except ValueError:
+                    logger.warning(f"Ignoring a malformed message on {connection_id}")
+                    continue
+                if body.get("action", "sendMessage") != "sendMessage":
+                    continue
+                # Requests on one connection are answered concurrently, like separate Lambda invocations
+                task = asyncio.ensure_future(self._answer(websocket, connection_id, body))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self.stats.open_connections -= 1
+            for task in tasks:
+                task.cancel()
+
+    async def _answer(self, websocket, connection_id: str, body: Dict[str, Any]):
+        config = self.config
+        self.stats.requests += 1
+        request_id = body.get("request_id")
+        encoding = "msgpack" if body.get("accept_encoding") == "msgpack" and msgpack is not None else "json"
+
+        async def send(data: Dict[str, Any]):
+            if request_id is not None:
+                data["request_id"] = request_id
+            await websocket.send(self._encode(data, encoding))
+            self.stats.frames_sent += 1
+
+        try:
+            await asyncio.sleep(config.first_token_delay + self._random.uniform(0, config.first_token_jitter))
+
+            roll = self._random.random()
+            if roll < config.error_rate:
+                self.stats.errors += 1
+                await send({"error": "Query failed: injected error"})
+                return
+            drop = roll < config.error_rate + config.drop_rate
+
+            answer = self.answer_for(body.get("text") or "")
+            tokens = TOKEN.findall(answer)
+            # Dropped requests are cut off halfway through the answer
+            limit = len(tokens) // 2 if drop else len(tokens)
+            if config.stream:
+                step = max(config.chunk_tokens, 1)
+                delay = step / config.tokens_per_second if config.tokens_per_second > 0 else 0
+                for seq, start in enumerate(range(0, limit, step)):
+                    if seq and delay:
+                        await asyncio.sleep(delay)
+                    if config.chunk_loss_rate and self._random.random() < config.chunk_loss_rate:
+                        # The seq number is used up, as when the Lambda fails to post a chunk
+                        self.stats.lost_chunks += 1
+                        continue
+                    await send({"response_chunk": "".join(tokens[start:min(start + step, limit)]), "seq": seq})
+            elif config.tokens_per_second > 0:
+                await asyncio.sleep(limit / config.tokens_per_second)
+
+            if drop:
+                self.stats.drops += 1
+                await websocket.close(code=1011, reason="injected drop")
+                return
+            await send({"response": answer.strip(), "session_id": connection_id})
+            self.stats.answered += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    @staticmethod
+    def _encode(data: Dict[str, Any], encoding: str):
+        if encoding == "msgpack":
+            return msgpack.packb({SHORT_KEYS.get(key, key): value for key, value in data.items()}, use_bin_type=True)
+        return json_codec.dumps(data)
+
+
+@dataclass
+class MockSpeechConfig:
+    """Behaviour of the mock ElevenLabs TTS and STT endpoints."""
+    host: str = "127.0.0.1"
+    tts_port: int = 0  # Websocket port of the TTS stream; 0 picks a free one
+    stt_port: int = 0  # HTTP port of the STT REST API; 0 picks a free one
+    tts_first_audio_delay: float = 0.25  # Seconds from the end of the text to the first audio frame
+    tts_seconds_per_char: float = 0.06  # Seconds of audio generated per character of text
+    tts_frame_delay: float = 0.02  # Seconds between audio frames
+    stt_delay: float = 0.4  # Seconds to transcribe an upload
+    transcripts: List[str] = field(default_factory=lambda: list(DEFAULT_TRANSCRIPTS))  # Returned in turn by STT
+
+
+@dataclass
+class MockSpeechStats:
+    """Counters of the traffic the mock speech endpoints have served."""
+    tts_sessions: int = 0
+    tts_audio_bytes: int = 0
+    stt_requests: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tts_sessions": self.tts_sessions,
+            "tts_audio_bytes": self.tts_audio_bytes,
+            "stt_requests": self.stt_requests,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1)
+        }
+
+
+class MockSpeech:
+    """
+    Local stand-ins for ElevenLabs TTS (websocket stream-input) and STT (REST).
+
+    TTS answers every session with silent 16 kHz PCM whose length follows the
+    text, and STT answers every upload with the next canned transcript, so
+    server.py can run its speech paths without an ElevenLabs key or network.
+    Point the app at it with ELEVENLABS_API_URL and ELEVENLABS_WS_URL.
+    """
+
+    def __init__(self, config: Optional[MockSpeechConfig] = None):
+        self.config = config or MockSpeechConfig()
+        self.stats = MockSpeechStats()
+        self._tts_server = None
+        self._tts_port: Optional[int] = None
+        self._stt_server: Optional[ThreadingHTTPServer] = None
+        self._stt_thread: Optional[threading.Thread] = None
+        self._transcript_index = 0
+        self._lock = threading.Lock()
+        self._background: Optional[BackgroundEventLoop] = None
+
+    @property
+    def ws_url(self) -> str:
+        """The ws:// URL to use as ELEVENLABS_WS_URL."""
+        if self._tts_port is None:
+            raise RuntimeError("Mock speech endpoints are not running")
+        return f"ws://{self.config.host}:{self._tts_port}"
+
+    @property
+    def api_url(self) -> str:
+        """The http:// URL to use as ELEVENLABS_API_URL."""
+        if self._stt_server is None:
+            raise RuntimeError("Mock speech endpoints are not running")
+        return f"http://{self.config.host}:{self._stt_server.server_address[1]}"
+
+    async def start(self) -> "MockSpeech":
+        """Starts both endpoints; returns once their ports are bound."""
+        self._tts_server = await websockets.serve(self._handle_tts, self.config.host, self.config.tts_port)
+        self._tts_port = self._tts_server.sockets[0].getsockname()[1]
+        self._stt_server = ThreadingHTTPServer((self.config.host, self.config.stt_port), self._stt_handler())
+        self._stt_server.daemon_threads = True
+        self._stt_thread = threading.Thread(target=self._stt_server.serve_forever, name="mock-stt", daemon=True)
+        self._stt_thread.start()
+        self.stats = MockSpeechStats()
+        logger.info(f"Mock speech listening: TTS on {self.ws_url}, STT on {self.api_url}")
+        return self
+
+    async def stop(self):
+        """Closes both endpoints."""
+        if self._tts_server is not None:
+            self._tts_server.close()
+            await self._tts_server.wait_closed()
+            self._tts_server = None
+        if self._stt_server is not None:
+            self._stt_server.shutdown()
+            self._stt_server.server_close()
+            self._stt_server = None
+            logger.info(f"Mock speech stopped: {self.stats.to_dict()}")
+
+    async def __aenter__(self) -> "MockSpeech":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def start_in_background(self) -> "MockSpeech":
+        """Starts the endpoints on their own event loop thread, for synchronous callers and tests."""
+        self._background = BackgroundEventLoop(name="mock-speech").start()
+        self._background.run(self.start(), timeout=10)
+        return self
+
+    def stop_background(self):
+        """Stops endpoints started with start_in_background()."""
+        if self._background is not None:
+            self._background.run(self.stop(), timeout=10)
+            self._background.stop()
+            self._background = None
+
+    def next_transcript(self) -> str:
+        """The canned transcript for the next STT request."""
+        with self._lock:
+            self.stats.stt_requests += 1
+            if not self.config.transcripts:
+                return ""
+            transcript = self.config.transcripts[self._transcript_index % len(self.config.transcripts)]
+            self._transcript_index += 1
+            return transcript
+
+    async def _handle_tts(self, websocket):
+        config = self.config
+        self.stats.tts_sessions += 1
+        text = []
+        try:
+            # The first message carries the key and voice settings; the empty text ends the input
+            async for message in websocket:
+                try:
+                    body = json_codec.loads(message)
+                except ValueError:
+                    continue
+                chunk = body.get("text")
+                if chunk == "":
+                    break
+                if chunk:
+                    text.append(chunk)
+
+            await asyncio.sleep(config.tts_first_audio_delay)
+            seconds = max(len("".join(text).strip()) * config.tts_seconds_per_char, TTS_FRAME_SECONDS)
+            remaining = int(seconds * TTS_SAMPLE_RATE) * 2
+            frame = bytes(int(TTS_FRAME_SECONDS * TTS_SAMPLE_RATE) * 2)
+            first = True
+            while remaining > 0:
+                if not first and config.tts_frame_delay:
+                    await asyncio.sleep(config.tts_frame_delay)
+                first = False
+                pcm = frame[:remaining]
+                await websocket.send(json_codec.dumps({"audio": base64.b64encode(pcm).decode("ascii"), "isFinal": None}))
+                self.stats.tts_audio_bytes += len(pcm)
+                remaining -= len(pcm)
+            await websocket.send(json_codec.dumps({"audio": None, "isFinal": True}))
+            await websocket.close()
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    def _stt_handler(self):
+        speech = self
+
+        class STTHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # The health probe's round trip
+                if self.path.startswith("/v1/models"):
+                    self._reply(200, [])
+                else:
+                    self._reply(404, {"detail": "not found"})
+
+            def do_POST(self):
+                # Drain the upload so the client sees a normal exchange
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if not self.path.startswith("/v1/speech-to-text"):
+                    self._reply(404, {"detail": "not found"})
+                    return
+                time.sleep(speech.config.stt_delay)
+                self._reply(200, {"text": speech.next_transcript(), "language_code": "en"})
+
+            def _reply(self, status: int, data: Any):
+                body = json_codec.dumps_bytes(data)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return STTHandler
+
+
+if pytest is not None:
+    @pytest.fixture
+    def mock_backend_config() -> MockBackendConfig:
+        """Settings of the mock_backend fixture; override this fixture to change them."""
+        return MockBackendConfig(first_token_delay=0.01, tokens_per_second=0, seed=0)
+
+    @pytest.fixture
+    def mock_backend(mock_backend_config):
+        """A running MockBackend on a free port, served from a background thread."""
+        backend = MockBackend(mock_backend_config).start_in_background()
+        try:
+            yield backend
+        finally:
+            backend.stop_background()
+
+
+async def serve(config: MockBackendConfig, speech_config: Optional[MockSpeechConfig] = None):
+    async with MockBackend(config) as backend:
+        print(f"Mock backend listening on {backend.url} (Ctrl+C to stop)")
+        print(f"Point the app at it with API_GATEWAY_URL={backend.url}")
+        if speech_config is None:
+            await asyncio.Future()
+        async with MockSpeech(speech_config) as speech:
+            print(f"Mock ElevenLabs listening; point the app at it with "
+                  f"ELEVENLABS_API_URL={speech.api_url} ELEVENLABS_WS_URL={speech.ws_url}")
+            await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local mock of the NLP websocket backend.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (0 picks a free one).")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the first frame.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra seconds added to the first-token delay.")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0,
+                        help="Streaming rate after the first token; 0 sends the answer at once.")
+    parser.add_argument("--chunk-tokens", type=int, default=1, help="Tokens per response_chunk frame.")
+    parser.add_argument("--no-stream", action="store_true", help="Send only the final response frame.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with an error frame.")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of requests cut off by dropping the connection.")
+    parser.add_argument("--chunk-loss-rate", type=float, default=0.0, help="Share of response_chunk frames never sent.")
+    parser.add_argument("--answers", default=DEFAULT_ANSWERS_PATH, help="CSV of canned answers ('Questions', 'Responses').")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible jitter and failures.")
+    parser.add_argument("--speech", action="store_true", help="Also mock ElevenLabs TTS and STT.")
+    parser.add_argument("--tts-port", type=int, default=8766, help="Port of the mock TTS websocket (with --speech).")
+    parser.add_argument("--stt-port", type=int, default=8767, help="Port of the mock STT REST API (with --speech).")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(serve(MockBackendConfig(
+            host=args.host,
+            port=args.port,
+            first_token_delay=args.first_token_delay,
+            first_token_jitter=args.jitter,
+            tokens_per_second=args.tokens_per_second,
+            chunk_tokens=args.chunk_tokens,
+            stream=not args.no_stream,
+            error_rate=args.error_rate,
+            drop_rate=args.drop_rate,
+            chunk_loss_rate=args.chunk_loss_rate,
+            answers_path=args.answers,
+            seed=args.seed
+        ), MockSpeechConfig(host=args.host, tts_port=args.tts_port, stt_port=args.stt_port) if args.speech else None))
+    except KeyboardInterrupt:
+        pass
@@ -1,6 +1,11 @@
 """
 API Client for connecting to AWS Lambda and API Gateway.
 This module provides a client to interact with the P2P Lending Voice AI Assistant backend.
+
+The NLP pipeline uses it as its HTTP transport, for network paths that don't
+allow websockets and for short-lived jobs that gain nothing from a persistent
+socket. Requests go through one keep-alive session with a connection pool, so
+only the first request to a host pays for the TCP and TLS handshake.
 """
 
 import json
@@ -9,66 +14,120 @@ import logging
 import os
 from typing import Dict, Any, Optional, List
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Configure logging (the application configures handlers; this module is imported by the pipeline)
 logger = logging.getLogger(__name__)
 
+# Responses worth retrying: throttling and gateway errors where the request didn't run.
+# 504 is left out: the gateway timed out while the backend was answering, so a retry
+# would run the question (and Bedrock) again and wait another full timeout.
+RETRY_STATUSES = (429, 502, 503)
+
 class APIClient:
     """A client for making requests to the NLP API Gateway."""
 
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(self, base_url: str, api_key: str, timeout: float = 30.0, pool_size: int = 8,
+                 max_retries: int = 2, retry_backoff: float = 0.5):
+        """
+        Args:
+            base_url: The HTTPS base URL of the REST API.
+            api_key: The API key, sent as x-api-key if set.
+            timeout: Default seconds to wait for a response.
+            pool_size: Keep-alive connections kept per host; size it like the expected concurrency.
+            max_retries: Retries after connection errors and 429/502/503 responses; read
+                timeouts and 504s are not retried, since the backend may have run the question.
+            retry_backoff: Base seconds of the exponential backoff between retries.
+        """
         if not base_url:
             raise ValueError("API base_url cannot be empty.")
-        self.base_url = base_url
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
         self.headers = {
-            "Content-Type": "application/json",
-            "x-api-key": api_key
+            "Content-Type": "application/json"
         }
+        if api_key:
+            self.headers["x-api-key"] = api_key
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            # A read timeout or a dropped response means the backend may have run the question
+            read=0,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            # POSTs are only repeated when they never reached the backend (see above)
+            allowed_methods=frozenset(["GET", "POST"]),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         logger.info(f"APIClient initialized for base URL: {self.base_url}")
 
-    def post(self, endpoint: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def post(self, endpoint: str, data: Dict[str, Any], timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """
         Sends a POST request to a specified endpoint.
 
         Args:
             endpoint: The API endpoint to send the request to (e.g., '/nlp').
             data: The JSON payload to send.
+            timeout: Seconds to wait for the response; defaults to the client's.
 
         Returns:
             The JSON response from the API, or None if an error occurs.
         """
-        url = f"{self.base_url}{endpoint}"
         try:
-            response = requests.post(url, json=data, headers=self.headers, timeout=30)
-            response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
-            return response.json()
+            return self.post_json(endpoint, data, timeout)
         except requests.exceptions.HTTPError as http_err:
-            logger.error(f"HTTP error occurred: {http_err} - Response: {response.text}")
+            logger.error(f"HTTP error occurred: {http_err} - Response: {http_err.response.text[:500]}")
         except requests.exceptions.RequestException as req_err:
             logger.error(f"A request error occurred: {req_err}")
         except Exception as e:
             logger.error(f"An unexpected error occurred in APIClient: {e}")
         return None
 
+    def post_json(self, endpoint: str, data: Dict[str, Any], timeout: Optional[float] = None) -> Any:
+        """
+        Like post(), but raises instead of returning None.
+
+        Raises:
+            requests.exceptions.RequestException: On connection errors, timeouts and
+                error responses (HTTPError, with the response attached).
+        """
+        url = f"{self.base_url}/{endpoint.lstrip('/')}"
+        response = self.session.post(url, json=data, timeout=timeout or self.timeout)
+        response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
+        return response.json()
+
+    def close(self):
+        """Closes the pooled connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
 # Example usage
 if __name__ == "__main__":
-    # Get API Gateway URL and key from environment variables
-    api_gateway_url = os.environ.get('API_GATEWAY_URL', '')
+    logging.basicConfig(level=logging.INFO)
+
+    # Get the REST API URL and key from environment variables
+    api_gateway_url = os.environ.get('API_GATEWAY_HTTP_URL', '')
     api_gateway_key = os.environ.get('API_GATEWAY_KEY', '')
-    
+
     if not api_gateway_url:
-        logger.error("API_GATEWAY_URL environment variable not set")
+        logger.error("API_GATEWAY_HTTP_URL environment variable not set")
         exit(1)
-        
-    api_client = APIClient(
-        base_url=api_gateway_url,
-        api_key=api_gateway_key
-    )
-    
-    # Test intent recognition
-    intent_result = api_client.post('/nlp', {'operation': 'recognize_intent', 'text': 'How do I invest in P2P lending?'})
-    print(f"Intent: {json.dumps(intent_result, indent=2)}")
-    
-    # Test knowledge base query
-    kb_result = api_client.post('/nlp', {'operation': 'query_knowledge_base', 'query': 'What are the regulations for P2P lending in India?', 'max_results': 3})
-    print(f"Knowledge Base Results: {json.dumps(kb_result, indent=2)}")
+
+    with APIClient(base_url=api_gateway_url, api_key=api_gateway_key) as api_client:
+        # Both questions reuse the same keep-alive connection
+        for question in ['How do I invest in P2P lending?', 'What are the regulations for P2P lending in India?']:
+            result = api_client.post('/nlp', {'text': question})
+            print(f"Response: {json.dumps(result, indent=2)}")
@@ -8,7 +8,9 @@ import yaml
 import requests
 from pathlib import Path
 
-from modules.eleven_ws import ElevenLabsWebSocketClient
+from modules.eleven_ws import ElevenLabsWebSocketClient, elevenlabs_api_url
+from modules.audio_decoder import mime_type_for_path
+from modules.payload_log import payload_recorder
 
 # Load environment variables
 load_dotenv()
@@ -17,10 +19,14 @@ logger = logging.getLogger(__name__)
 
 class ASRConfig:
     """Configuration for the ASR module, loaded from config.yaml."""
-    def __init__(self, model_id: str = "scribe_v1", languages: list = None): # ElevenLabs STT model
+    def __init__(self, model_id: str = "scribe_v1", languages: list = None, # ElevenLabs STT model
+                 upload_mode: str = "passthrough", decode_workers: int = 2, decode_queue: int = 8):
         self.model_id = model_id
         self.elevenlabs_api_key = os.getenv("ELEVENLABS_API_KEY", "")
         self.languages = languages or ["en", "hi"]  # Default to English and Hindi
+        self.upload_mode = upload_mode # "passthrough" forwards compressed uploads, "normalize" decodes to 16 kHz mono WAV
+        self.decode_workers = decode_workers
+        self.decode_queue = decode_queue
 
     @classmethod
     def from_yaml(cls, config_path: str = "config/config.yaml") -> "ASRConfig":
@@ -29,9 +35,13 @@ class ASRConfig:
             with open(config_path, "r") as f:
                 config = yaml.safe_load(f)
             asr_config = config.get("asr", {})
+            upload_config = asr_config.get("upload", {})
             return cls(
                 model_id=asr_config.get("model_id", "scribe_v1"),
-                languages=asr_config.get("languages", ["en", "hi"])
+                languages=asr_config.get("languages", ["en", "hi"]),
+                upload_mode=upload_config.get("mode", "passthrough"),
+                decode_workers=upload_config.get("decode_workers", 2),
+                decode_queue=upload_config.get("decode_queue", 8)
             )
         except FileNotFoundError:
             logger.warning(f"Config file not found at {config_path}, using defaults")
@@ -73,7 +83,7 @@ class ASRModule:
         try:
             # Use the REST API approach since it's working more reliably
             # ElevenLabs STT REST API endpoint
-            url = "https://api.elevenlabs.io/v1/speech-to-text"
+            url = f"{elevenlabs_api_url()}/v1/speech-to-text"
             
             headers = {
                 "xi-api-key": self.config.elevenlabs_api_key,
@@ -82,7 +92,7 @@ class ASRModule:
             
             # Include model_id in request body using multipart/form-data
             with open(file_path, "rb") as audio_file:
-                files = {"file": (Path(file_path).name, audio_file, "audio/wav")}
+                files = {"file": (Path(file_path).name, audio_file, mime_type_for_path(file_path))}
                 data = {
                     "model_id": self.config.model_id,
                     "language": "auto",  # Auto-detect language
@@ -93,7 +103,11 @@ class ASRModule:
             if response.status_code == 200:
                 result = response.json()
                 transcription = result.get("text", "")
-                logger.info(f"Received transcription: {transcription}")
+                payload_recorder.record("transcription", transcription)
+                if payload_recorder.should_log(logger):
+                    logger.info(f"Received transcription: {transcription}")
+                else:
+                    logger.info(f"Received transcription ({len(transcription)} chars)")
                 return transcription
             else:
                 logger.error(f"Error from ElevenLabs API: {response.status_code} - {response.text}")
@@ -0,0 +1,189 @@
+"""
+Audio Decoder for compressed browser uploads.
+
+Browsers' MediaRecorder produces Opus in a WebM or OGG container. This module
+detects the container of an uploaded file and, depending on the configured
+upload mode, either forwards the compressed file to STT as-is or decodes it to
+16 kHz mono WAV in a bounded worker pool so decoding never starves the server.
+"""
+
+import os
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Upload modes
+UPLOAD_MODE_PASSTHROUGH = "passthrough"  # Forward compressed audio to STT directly
+UPLOAD_MODE_NORMALIZE = "normalize"  # Decode to 16 kHz mono 16-bit WAV first
+
+TARGET_SAMPLE_RATE = 16000
+
+# File extension and STT mime type for every container we accept
+AUDIO_FORMATS = {
+    "wav": (".wav", "audio/wav"),
+    "webm": (".webm", "audio/webm"),
+    "ogg": (".ogg", "audio/ogg"),
+    "mp3": (".mp3", "audio/mpeg"),
+    "mp4": (".m4a", "audio/mp4"),
+}
+
+MIME_TYPE_FORMATS = {
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/webm": "webm",
+    "video/webm": "webm",
+    "audio/ogg": "ogg",
+    "audio/opus": "ogg",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+    "audio/mp4": "mp4",
+    "audio/x-m4a": "mp4",
+}
+
+
+def detect_audio_format(header: bytes, mimetype: Optional[str] = None, filename: Optional[str] = None) -> str:
+    """
+    Detects the container format of an uploaded audio file.
+
+    The magic bytes in the header take precedence, because browsers routinely
+    label WebM recordings as audio/wav. The mime type and the file extension are
+    used as fallbacks, and WAV is assumed if nothing matches.
+
+    Args:
+        header: The first bytes of the file (at least 12).
+        mimetype: The mime type declared by the client, if any.
+        filename: The file name declared by the client, if any.
+
+    Returns:
+        One of the keys of AUDIO_FORMATS.
+    """
+    if header.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm"
+    if header.startswith(b"OggS"):
+        return "ogg"
+    if header.startswith(b"RIFF") and header[8:12] == b"WAVE":
+        return "wav"
+    if header.startswith(b"ID3") or header[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "mp3"
+    if header[4:8] == b"ftyp":
+        return "mp4"
+
+    if mimetype:
+        detected = MIME_TYPE_FORMATS.get(mimetype.split(";")[0].strip().lower())
+        if detected:
+            return detected
+    if filename:
+        extension = os.path.splitext(filename)[1].lower()
+        for audio_format, (format_extension, _) in AUDIO_FORMATS.items():
+            if extension == format_extension or (audio_format == "ogg" and extension == ".opus"):
+                return audio_format
+    return "wav"
+
+
+def mime_type_for_path(file_path: str) -> str:
+    """Returns the mime type to declare to STT for a file, based on its extension."""
+    extension = os.path.splitext(file_path)[1].lower()
+    for format_extension, mime_type in AUDIO_FORMATS.values():
+        if extension == format_extension:
+            return mime_type
+    if extension == ".opus":
+        return "audio/ogg"
+    return "audio/wav"
+
+
+class DecoderBusyError(RuntimeError):
+    """Raised when the decode pool is saturated and the upload cannot be queued."""
+
+
+class AudioDecoder:
+    """
+    Prepares uploaded audio files for STT using a bounded decode pool.
+    """
+
+    def __init__(self, mode: str = UPLOAD_MODE_PASSTHROUGH, max_workers: int = 2,
+                 max_queued: int = 8, queue_timeout: float = 5.0):
+        if mode not in (UPLOAD_MODE_PASSTHROUGH, UPLOAD_MODE_NORMALIZE):
+            raise ValueError(f"Unsupported upload mode: {mode}")
+        self.mode = mode
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-decode")
+        # Bounds running plus waiting decodes so a burst of uploads cannot queue without limit
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        logger.info(f"AudioDecoder initialized in '{mode}' mode with {max_workers} workers")
+
+    def save_upload(self, file_storage) -> str:
+        """
+        Saves an uploaded file to a temporary path with the extension matching its real format.
+
+        Args:
+            file_storage: A werkzeug FileStorage from request.files.
+
+        Returns:
+            The path of the temporary file. The caller is responsible for removing it.
+        """
+        header = file_storage.stream.read(16)
+        file_storage.stream.seek(0)
+        audio_format = detect_audio_format(header, file_storage.mimetype, file_storage.filename)
+        suffix = AUDIO_FORMATS[audio_format][0]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            file_storage.save(temp_file)
+            return temp_file.name
+
+    def prepare_for_stt(self, file_path: str) -> str:
+        """
+        Returns the path of the file that should be sent to STT.
+
+        In passthrough mode this is the upload itself. In normalize mode the upload is
+        decoded to 16 kHz mono WAV on the decode pool and the path of the new temporary
+        file is returned; the caller must remove it as well as the original.
+
+        Raises:
+            DecoderBusyError: If the decode pool stays saturated for queue_timeout seconds.
+        """
+        if self.mode == UPLOAD_MODE_PASSTHROUGH:
+            return file_path
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise DecoderBusyError("Audio decode pool is saturated")
+        try:
+            future = self._executor.submit(self._decode_to_wav, file_path)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def _decode_to_wav(self, file_path: str) -> str:
+        """Decodes any supported container to 16 kHz mono 16-bit WAV."""
+        from pydub import AudioSegment
+
+        try:
+            segment = AudioSegment.from_file(file_path)
+        except Exception as e:
+            # pydub needs ffmpeg for compressed containers; audioread can use
+            # whatever backend is installed (GStreamer, Core Audio, ...)
+            logger.warning(f"pydub could not decode {file_path} ({e}), falling back to audioread")
+            segment = self._decode_with_audioread(file_path)
+
+        segment = segment.set_frame_rate(TARGET_SAMPLE_RATE).set_channels(1).set_sample_width(2)
+        output_path = os.path.splitext(file_path)[0] + ".16k.wav"
+        segment.export(output_path, format="wav")
+        return output_path
+
+    @staticmethod
+    def _decode_with_audioread(file_path: str):
+        import audioread
+        from pydub import AudioSegment
+
+        with audioread.audio_open(file_path) as source:
+            pcm = b"".join(source)
+            return AudioSegment(data=pcm, sample_width=2, frame_rate=source.samplerate, channels=source.channels)
+
+    def shutdown(self):
+        """Stops the decode pool after running jobs finish."""
+        self._executor.shutdown(wait=True)
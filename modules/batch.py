@@ -0,0 +1,195 @@
+"""
+Bulk question answering on top of the NLP pipeline.
+
+BatchRun answers a list of questions with a fixed number of workers, retries
+failed items with backoff and yields each result together with its original
+index as soon as it is available (or in input order). All batches of one
+pipeline share a global in-flight limit, so bulk jobs leave pooled backend
+connections free for interactive requests.
+"""
+
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from modules.utils import percentile
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchResult:
+    """The outcome of one question of a batch."""
+    index: int
+    question: str
+    response: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+    error: Optional[str] = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class BatchStats:
+    """Aggregate progress and throughput of a batch."""
+    total: int = 0
+    completed: int = 0
+    failed: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: Optional[float] = None
+    latencies_ms: List[float] = field(default_factory=list)
+
+    @property
+    def elapsed_seconds(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Finished questions per second."""
+        elapsed = self.elapsed_seconds
+        return (self.completed + self.failed) / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            "total": self.total,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "elapsed_seconds": round(self.elapsed_seconds, 2),
+            "questions_per_second": round(self.throughput, 2),
+            "latency_ms": {
+                "p50": rounded(percentile(self.latencies_ms, 50)),
+                "p95": rounded(percentile(self.latencies_ms, 95)),
+                "max": rounded(max(self.latencies_ms)) if self.latencies_ms else None
+            }
+        }
+
+
+def is_complete_response(response: Optional[Dict[str, Any]]) -> bool:
+    """Whether a pipeline response is a full answer, as opposed to a failure or a cut-off stream."""
+    return bool(response) and "response" in response and not response.get("partial") and "error" not in response
+
+
+class BatchRun:
+    """
+    An async iterator of BatchResults for a list of questions.
+
+    Iterate it with ``async for``; ``stats`` is updated as results come in.
+    Leaving the loop early cancels the remaining work.
+    """
+
+    def __init__(self, process: Callable[[str], Awaitable[Optional[Dict[str, Any]]]], questions: Sequence[str],
+                 concurrency: int = 4, ordered: bool = True, max_retries: int = 2, retry_backoff: float = 1.0,
+                 slots: Optional[asyncio.Semaphore] = None):
+        """
+        Args:
+            process: Coroutine function answering one question.
+            questions: The questions, in input order.
+            concurrency: Number of questions of this batch in flight at once.
+            ordered: Yield results in input order instead of as they complete.
+            max_retries: Retries per question after a failed or incomplete answer.
+            retry_backoff: Base delay in seconds of the exponential backoff between retries.
+            slots: Semaphore shared by all batches, bounding their combined in-flight requests.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.process = process
+        self.questions = list(questions)
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.slots = slots
+        self.stats = BatchStats(total=len(self.questions))
+
+    def __aiter__(self):
+        return self._run()
+
+    async def _run(self):
+        pending: asyncio.Queue = asyncio.Queue()
+        for index in range(len(self.questions)):
+            pending.put_nowait(index)
+        results: asyncio.Queue = asyncio.Queue()
+        workers = [
+            asyncio.ensure_future(self._worker(pending, results))
+            for _ in range(min(self.concurrency, len(self.questions)))
+        ]
+
+        buffered: Dict[int, BatchResult] = {}
+        next_index = 0
+        try:
+            for _ in range(len(self.questions)):
+                result = await results.get()
+                if not self.ordered:
+                    yield result
+                    continue
+                buffered[result.index] = result
+                while next_index in buffered:
+                    yield buffered.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            self.stats.finished_at = time.monotonic()
+            logger.info(f"Batch finished: {self.stats.to_dict()}")
+
+    async def _worker(self, pending: asyncio.Queue, results: asyncio.Queue):
+        while not pending.empty():
+            index = pending.get_nowait()
+            results.put_nowait(await self._answer(index))
+
+    async def _answer(self, index: int) -> BatchResult:
+        question = self.questions[index]
+        result = BatchResult(index=index, question=question)
+        started = time.perf_counter()
+
+        if not isinstance(question, str) or not question.strip():
+            result.error = "Invalid question"
+        else:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self.stats.retries += 1
+                    # Full jitter so retries of many items don't hit the backend together
+                    await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** (attempt - 1)))
+                result.attempts = attempt + 1
+                try:
+                    if self.slots is not None:
+                        async with self.slots:
+                            response = await self.process(question)
+                    else:
+                        response = await self.process(question)
+                except Exception as e:
+                    response = None
+                    result.error = f"{type(e).__name__}: {e}"
+                else:
+                    if is_complete_response(response):
+                        result.error = None
+                    elif response and "error" in response:
+                        result.error = f"Backend error: {response['error']}"
+                    else:
+                        result.error = "Incomplete response from backend"
+                # Keep the best answer so far; a partial one beats none
+                if response:
+                    result.response = response
+                if result.ok:
+                    break
+                logger.warning(f"Batch item {index} attempt {attempt + 1} failed: {result.error}")
+
+        result.elapsed_ms = (time.perf_counter() - started) * 1000
+        if result.ok:
+            self.stats.completed += 1
+            self.stats.latencies_ms.append(result.elapsed_ms)
+        else:
+            self.stats.failed += 1
+        return result
@@ -0,0 +1,231 @@
+"""
+Circuit breaker for the NLP backend.
+
+When API Gateway or Bedrock is degraded, every request would otherwise wait
+for its own timeout before the fallback answer is used. The breaker watches
+the outcome and latency of recent backend calls. Once too many of them fail
+or are too slow it opens, and requests are rejected immediately with
+CircuitOpenError so callers can answer from the FallbackService at once.
+After a cool-down it lets a few trial requests through (half-open) and closes
+again when they succeed.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """Configuration for the backend circuit breaker, loaded from config.yaml."""
+    enabled: bool = True
+    window: int = 20
+    min_calls: int = 10
+    failure_rate_threshold: float = 0.5
+    slow_call_seconds: float = 10.0
+    slow_call_rate_threshold: float = 0.8
+    open_seconds: float = 30.0
+    half_open_max_calls: int = 2
+    half_open_successes: int = 2
+
+    @classmethod
+    def from_yaml(cls, config_path: str = "config/config.yaml") -> "CircuitBreakerConfig":
+        """Loads configuration from a YAML file."""
+        try:
+            with open(config_path, "r") as f:
+                config = yaml.safe_load(f)
+        except FileNotFoundError:
+            logger.warning(f"Config file not found at {config_path}, using defaults")
+            return cls()
+        return cls.from_dict(config.get("api_gateway", {}).get("circuit_breaker", {}))
+
+    @classmethod
+    def from_dict(cls, breaker_config: Dict[str, Any]) -> "CircuitBreakerConfig":
+        """Builds the configuration from the api_gateway.circuit_breaker section."""
+        return cls(
+            enabled=breaker_config.get("enabled", True),
+            window=breaker_config.get("window", 20),
+            min_calls=breaker_config.get("min_calls", 10),
+            failure_rate_threshold=breaker_config.get("failure_rate_threshold", 0.5),
+            slow_call_seconds=breaker_config.get("slow_call_seconds", 10.0),
+            slow_call_rate_threshold=breaker_config.get("slow_call_rate_threshold", 0.8),
+            open_seconds=breaker_config.get("open_seconds", 30.0),
+            half_open_max_calls=breaker_config.get("half_open_max_calls", 2),
+            half_open_successes=breaker_config.get("half_open_successes", 2)
+        )
+
+
+class CircuitBreaker:
+    """
+    A closed/open/half-open circuit breaker over a sliding window of calls.
+
+    Usage::
+
+        trial = breaker.acquire()  # raises CircuitOpenError while open
+        try:
+            ...
+        finally:
+            breaker.release(trial, success, elapsed)
+
+    The circuit opens when at least ``min_calls`` of the last ``window`` calls
+    are recorded and either the failure rate or the share of calls slower than
+    ``slow_call_seconds`` reaches its threshold. After ``open_seconds`` up to
+    ``half_open_max_calls`` trial calls are admitted at a time;
+    ``half_open_successes`` successful trials close the circuit, and any failed
+    trial opens it again.
+    """
+
+    def __init__(self, config: Optional[CircuitBreakerConfig] = None, name: str = "nlp_backend"):
+        self.config = config or CircuitBreakerConfig()
+        self.name = name
+        self._lock = threading.Lock()
+        # (failed, slow) per recorded call
+        self._calls: deque = deque(maxlen=max(self.config.window, 1))
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._trials_in_flight = 0
+        self._trial_successes = 0
+        # Metrics
+        self.rejected = 0
+        self.times_opened = 0
+        self.last_opened: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.config.open_seconds:
+            self._state = STATE_HALF_OPEN
+            self._trials_in_flight = 0
+            self._trial_successes = 0
+            logger.info(f"Circuit '{self.name}' half-open, probing the backend")
+        return self._state
+
+    def acquire(self) -> bool:
+        """
+        Admits a call or rejects it.
+
+        Returns:
+            True if the call is a half-open trial, False for a normal call.
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with all trial slots taken.
+        """
+        if not self.config.enabled:
+            return False
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return False
+            if state == STATE_HALF_OPEN and self._trials_in_flight < self.config.half_open_max_calls:
+                self._trials_in_flight += 1
+                return True
+            self.rejected += 1
+            retry_after = max(self.config.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+        raise CircuitOpenError(self.name, retry_after)
+
+    def release(self, trial: bool, success: Optional[bool], elapsed: float = 0.0):
+        """
+        Records the outcome of an admitted call.
+
+        Args:
+            trial: The value acquire() returned for this call.
+            success: Whether the call succeeded; None if it was abandoned (e.g. the
+                caller stopped reading), which releases its slot without counting it.
+            elapsed: Duration of the call in seconds.
+        """
+        if not self.config.enabled:
+            return
+        with self._lock:
+            if trial:
+                self._trials_in_flight = max(self._trials_in_flight - 1, 0)
+            if success is None:
+                return
+            slow = elapsed >= self.config.slow_call_seconds
+            state = self._current_state()
+
+            if state == STATE_HALF_OPEN:
+                if not trial:
+                    # Admitted before the circuit opened; its outcome is stale
+                    return
+                if not success or slow:
+                    self._open("trial call failed" if not success else f"trial call took {elapsed:.1f}s")
+                    return
+                self._trial_successes += 1
+                if self._trial_successes >= self.config.half_open_successes:
+                    self._state = STATE_CLOSED
+                    self._calls.clear()
+                    logger.info(f"Circuit '{self.name}' closed, backend recovered")
+                return
+
+            if state == STATE_OPEN:
+                return
+            self._calls.append((not success, slow))
+            if len(self._calls) < self.config.min_calls:
+                return
+            failure_rate = sum(failed for failed, _ in self._calls) / len(self._calls)
+            slow_rate = sum(slow for _, slow in self._calls) / len(self._calls)
+            if failure_rate >= self.config.failure_rate_threshold:
+                self._open(f"failure rate {failure_rate:.0%} over the last {len(self._calls)} calls")
+            elif slow_rate >= self.config.slow_call_rate_threshold:
+                self._open(f"{slow_rate:.0%} of the last {len(self._calls)} calls slower than "
+                           f"{self.config.slow_call_seconds}s")
+
+    def _open(self, reason: str):
+        self._state = STATE_OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.times_opened += 1
+        self.last_opened = time.time()
+        logger.warning(f"Circuit '{self.name}' opened: {reason}; failing fast for {self.config.open_seconds}s")
+
+    def reset(self):
+        """Closes the circuit and forgets all recorded calls."""
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._calls.clear()
+            self._trials_in_flight = 0
+            self._trial_successes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the breaker state and metrics."""
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._calls)
+            failures = sum(failed for failed, _ in self._calls)
+            slow = sum(slow for _, slow in self._calls)
+            retry_after = (max(self.config.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+                           if state == STATE_OPEN else 0.0)
+        return {
+            "enabled": self.config.enabled,
+            "state": state if self.config.enabled else STATE_CLOSED,
+            "calls": calls,
+            "failure_rate": round(failures / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(slow / calls, 3) if calls else 0.0,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+            "last_opened": self.last_opened,
+            "retry_after_seconds": round(retry_after, 1)
+        }
@@ -0,0 +1,285 @@
+"""
+Connection pool of backend WebSocket connections.
+
+WebSocketConnectionPool leases connections to concurrent requests, reuses them
+across requests so they don't pay a TLS handshake each time, validates them on
+checkout and reaps the ones that sit idle. A connection is leased to as many
+requests at once as its ``capacity`` allows: one for backends that don't echo
+request ids, several once the backend has shown it supports multiplexing.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Callable, Deque, Dict, Any, Optional
+
+from modules.utils import percentile
+from modules.websocket_client import WebSocketClient
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection could be checked out within the acquire timeout."""
+
+
+class WebSocketConnectionPool:
+    """
+    An asyncio pool of WebSocketClient connections with min/max sizing.
+
+    The pool binds to the event loop it is first used on; all callers must use
+    that same loop (see modules/event_loop.py for sharing it across threads).
+    """
+
+    def __init__(self, client_factory: Callable[[], WebSocketClient], min_size: int = 1, max_size: int = 8,
+                 acquire_timeout: float = 10.0, max_idle_time: float = 300.0, reap_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.client_factory = client_factory
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_idle_time = max_idle_time
+        self.reap_interval = reap_interval
+
+        # Open connections with their number of active leases, and when each last became idle
+        self._leases: Dict[WebSocketClient, int] = {}
+        self._idle_since: Dict[WebSocketClient, float] = {}
+        self._opening = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._reaper_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        # Metrics
+        self._wait_ms: Deque[float] = deque(maxlen=500)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.reaped = 0
+        self.waiting = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._leases) + self._opening
+
+    async def start(self):
+        """Opens min_size connections and starts the idle reaper. Safe to call more than once."""
+        if self._condition is not None:
+            return
+        self._condition = asyncio.Condition()
+        self._closed = False
+        for _ in range(self.min_size):
+            self._opening += 1
+            await self._open_client(leases=0)
+        if self.reap_interval:
+            self._reaper_task = asyncio.ensure_future(self._reap_idle())
+        logger.info(f"WebSocket pool started with {len(self._leases)} connections (max {self.max_size})")
+
+    async def _open_client(self, leases: int) -> Optional[WebSocketClient]:
+        """
+        Opens a new connection and adds it to the pool with the given number of leases.
+
+        The caller must already have reserved a slot in _opening; it is released
+        under the lock together with adding the connection, so size never undercounts.
+        """
+        client = self.client_factory()
+        try:
+            connected = await client.ensure_connected()
+        except BaseException:
+            connected = False
+            raise
+        finally:
+            async with self._condition:
+                self._opening -= 1
+                if connected:
+                    self.created += 1
+                    self._leases[client] = leases
+                    self._idle_since[client] = time.monotonic()
+                else:
+                    self._condition.notify()
+        return client if connected else None
+
+    async def acquire(self, avoid: Optional[WebSocketClient] = None) -> WebSocketClient:
+        """
+        Checks out a healthy connection, opening a new one if the pool is below max_size.
+
+        Args:
+            avoid: A connection not to use unless there is no other option, e.g. the
+                one carrying the request that a hedged request duplicates.
+
+        Raises:
+            PoolTimeoutError: If no connection became available within acquire_timeout.
+            ConnectionError: If a new connection could not be opened.
+        """
+        await self.start()
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.acquire_timeout
+
+        while True:
+            client = None
+            async with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    client = self._pick_connection(avoid)
+                    if client is None and avoid is not None and self.size >= self.max_size:
+                        client = self._pick_connection()
+                    if client is not None:
+                        self._leases[client] += 1
+                        break
+                    if self.size < self.max_size:
+                        self._opening += 1
+                        break
+
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeoutError(f"No backend connection available within {self.acquire_timeout}s")
+                    self.waiting += 1
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    finally:
+                        self.waiting -= 1
+
+            # Handshakes and health checks happen outside the lock so other checkouts aren't blocked
+            if client is None:
+                client = await self._open_client(leases=1)
+                if client is None:
+                    raise ConnectionError("Could not open a backend WebSocket connection")
+                return self._checkout(client, started)
+
+            if client.is_healthy or await client.ensure_connected():
+                return self._checkout(client, started)
+            await self.release(client, discard=True)
+
+    def _pick_connection(self, avoid: Optional[WebSocketClient] = None) -> Optional[WebSocketClient]:
+        """Picks the least loaded connection with spare capacity, preferring the most recently used."""
+        best = None
+        for client, leases in self._leases.items():
+            if leases >= client.capacity or client is avoid:
+                continue
+            # Busy connections are only shared if they are known to be healthy
+            if leases and not client.is_healthy:
+                continue
+            key = (leases, -self._idle_since.get(client, 0.0))
+            if best is None or key < best[0]:
+                best = (key, client)
+        return best[1] if best else None
+
+    def _checkout(self, client: WebSocketClient, started: float) -> WebSocketClient:
+        self.checkouts += 1
+        self._wait_ms.append((time.perf_counter() - started) * 1000)
+        return client
+
+    async def release(self, client: WebSocketClient, discard: bool = False):
+        """Returns a lease. Unhealthy or discarded connections are removed from the pool and closed."""
+        async with self._condition:
+            if client in self._leases:
+                self._leases[client] -= 1
+                if discard or self._closed or not client.is_open:
+                    del self._leases[client]
+                    self._idle_since.pop(client, None)
+                    await self._discard(client)
+                elif self._leases[client] == 0:
+                    self._idle_since[client] = time.monotonic()
+            # Wake as many waiters as the connection has room for; this is more than
+            # one once the backend has turned out to support multiplexing
+            spare = client.capacity - self._leases.get(client, client.capacity)
+            self._condition.notify(max(1, spare))
+
+    @asynccontextmanager
+    async def connection(self, avoid: Optional[WebSocketClient] = None):
+        """Context manager that leases a connection and always returns the lease."""
+        client = await self.acquire(avoid)
+        try:
+            yield client
+        finally:
+            # A request that was cut off unregisters itself from the client, and the
+            # client drops its late frames, so the connection stays reusable
+            await self.release(client)
+
+    async def _discard(self, client: WebSocketClient):
+        self.discarded += 1
+        try:
+            await client.close()
+        except Exception as e:
+            logger.debug(f"Error closing discarded connection: {e}")
+
+    async def _reap_idle(self):
+        """Closes connections idle for longer than max_idle_time, keeping at least min_size."""
+        try:
+            while not self._closed:
+                await asyncio.sleep(self.reap_interval)
+                now = time.monotonic()
+                expired = []
+                async with self._condition:
+                    # Oldest first, so the most recently used connections are the ones kept
+                    idle = sorted(
+                        (since, client) for client, since in self._idle_since.items()
+                        if self._leases.get(client) == 0
+                    )
+                    for since, client in idle:
+                        if now - since <= self.max_idle_time or len(self._leases) <= self.min_size:
+                            break
+                        del self._leases[client]
+                        del self._idle_since[client]
+                        expired.append(client)
+                for client in expired:
+                    self.reaped += 1
+                    try:
+                        await client.close()
+                    except Exception:
+                        pass
+                if expired:
+                    logger.info(f"Reaped {len(expired)} idle WebSocket connections")
+        except asyncio.CancelledError:
+            pass
+
+    async def close(self):
+        """Closes all connections; requests still holding a lease see their connection close."""
+        self._closed = True
+        if self._reaper_task:
+            self._reaper_task.cancel()
+            self._reaper_task = None
+        if self._condition is None:
+            return
+        async with self._condition:
+            clients = list(self._leases)
+            self._leases.clear()
+            self._idle_since.clear()
+            self._condition.notify_all()
+        for client in clients:
+            await client.close()
+        logger.info("WebSocket pool closed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns pool occupancy and checkout wait-time metrics."""
+        def rounded(value):
+            return round(value, 2) if value is not None else None
+
+        leases = list(self._leases.values())
+        return {
+            "size": self.size,
+            "idle": leases.count(0),
+            "in_use": len(leases) - leases.count(0),
+            "in_flight": sum(leases),
+            "multiplexed": sum(1 for client in self._leases if client.multiplexing),
+            "waiting": self.waiting,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "created": self.created,
+            "discarded": self.discarded,
+            "reaped": self.reaped,
+            "wait_ms": {
+                "p50": rounded(percentile(self._wait_ms, 50)),
+                "p95": rounded(percentile(self._wait_ms, 95)),
+                "max": rounded(max(self._wait_ms)) if self._wait_ms else None
+            }
+        }
@@ -0,0 +1,216 @@
+"""
+Token-budgeted conversation context for the NLP backend.
+
+Sending whole transcripts to the backend makes Bedrock latency and cost grow
+with every turn. ConversationContext keeps the last few turns verbatim and
+folds everything older into a rolling extractive summary. The summary is
+extended incrementally as turns age out of the window and is cached per
+session, so each request only summarizes the turns that are new since the last.
+"""
+
+import re
+import time
+import math
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("user", "assistant")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of model tokens in a text (about 4 characters per token)."""
+    return math.ceil(len(text) / 4) if text else 0
+
+
+def _fingerprint(message: Dict[str, str]) -> int:
+    return hash((message["role"], message["content"]))
+
+
+def _first_sentence(text: str, max_chars: int) -> str:
+    sentence = SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    if len(sentence) > max_chars:
+        sentence = sentence[:max_chars].rsplit(" ", 1)[0] + "..."
+    return sentence
+
+
+@dataclass
+class SummaryState:
+    """Rolling summary of the turns of one session that are no longer sent verbatim."""
+    lines: List[str] = field(default_factory=list)
+    omitted: int = 0  # Summary lines dropped to stay within the summary budget
+    last_fingerprint: Optional[int] = None  # Last message folded into the summary
+    next_fingerprint: Optional[int] = None  # First message that was still sent verbatim
+    updated_at: float = 0.0
+
+    def text(self) -> str:
+        if not self.lines:
+            return ""
+        header = [f"({self.omitted} earlier messages omitted)"] if self.omitted else []
+        return "\n".join(header + self.lines)
+
+
+class ConversationContext:
+    """
+    Builds the history and summary sent with each request, within a token budget.
+    """
+
+    def __init__(self, max_tokens: int = 1200, recent_turns: int = 3, summary_max_tokens: int = 300,
+                 max_sessions: int = 1000, session_ttl: float = 3600.0, line_max_chars: int = 160):
+        """
+        Args:
+            max_tokens: Budget for the question, the verbatim history and the summary together.
+            recent_turns: Number of most recent user/assistant exchanges sent verbatim.
+            summary_max_tokens: Budget for the rolling summary; its oldest lines are dropped beyond it.
+            max_sessions: Number of session summaries cached (least recently used are evicted).
+            session_ttl: Seconds after which an unused session summary is discarded.
+            line_max_chars: Maximum length of the summary line of one message.
+        """
+        self.max_tokens = max_tokens
+        self.recent_turns = recent_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.line_max_chars = line_max_chars
+        self._sessions: "OrderedDict[str, SummaryState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(history: Optional[List[Dict[str, str]]]) -> List[Dict[str, str]]:
+        """Keeps only well-formed user/assistant messages with non-empty content."""
+        messages = []
+        for message in history or []:
+            if not isinstance(message, dict):
+                continue
+            role = message.get("role")
+            content = message.get("content")
+            if role in ROLES and isinstance(content, str) and content.strip():
+                messages.append({"role": role, "content": content.strip()})
+        return messages
+
+    def build(self, text: str, history: Optional[List[Dict[str, str]]] = None,
+              session_id: Optional[str] = None) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Selects the context to send with a question.
+
+        Args:
+            text: The current question. If the history already ends with it, it is not repeated.
+            history: The conversation so far, oldest first, as role/content dicts. It may
+                be the full transcript or one already compacted with compact().
+            session_id: Key under which the rolling summary is cached; without it the
+                summary is computed from scratch.
+
+        Returns:
+            A (recent_messages, summary) tuple; the summary is "" if nothing was folded.
+        """
+        messages = self.normalize(history)
+        if messages and messages[-1]["role"] == "user" and messages[-1]["content"] == (text or "").strip():
+            messages = messages[:-1]
+        if not messages:
+            return [], ""
+
+        state = self._get_state(session_id)
+        start = self._unsummarized_start(state, messages)
+        if start is None:
+            # A different or edited conversation under the same session; start over
+            state = SummaryState()
+            start = 0
+
+        split = max(start, len(messages) - self.recent_turns * 2)
+        for message in messages[start:split]:
+            self._fold(state, message)
+        recent = messages[split:]
+
+        # Fold the oldest verbatim messages until everything fits the budget
+        budget = max(self.max_tokens - estimate_tokens(text or ""), 0)
+        while recent and estimate_tokens(state.text()) + sum(estimate_tokens(m["content"]) for m in recent) > budget:
+            self._fold(state, recent.pop(0))
+
+        summary = state.text()
+        if estimate_tokens(summary) > budget:
+            summary = summary[-budget * 4:] if budget else ""
+
+        if recent:
+            state.next_fingerprint = _fingerprint(recent[0])
+        state.updated_at = time.monotonic()
+        self._put_state(session_id, state)
+        return recent, summary
+
+    def compact(self, session_id: str, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Drops the messages of a session that are already folded into its cached summary.
+
+        Callers that keep their own transcript (e.g. the CLI demo) can use this to
+        keep it bounded; the compacted history remains valid input for build().
+        """
+        state = self._get_state(session_id)
+        if state.last_fingerprint is None:
+            return history
+        messages = self.normalize(history)
+        for index in range(len(messages) - 1, -1, -1):
+            if _fingerprint(messages[index]) == state.last_fingerprint:
+                return messages[index + 1:]
+        return history
+
+    def _unsummarized_start(self, state: SummaryState, messages: List[Dict[str, str]]) -> Optional[int]:
+        """Index of the first message not yet in the summary, or None if the history doesn't match it."""
+        if state.last_fingerprint is None:
+            return 0
+        for index in range(len(messages) - 1, -1, -1):
+            if _fingerprint(messages[index]) == state.last_fingerprint:
+                return index + 1
+        # A compacted history starts right after the summarized messages
+        if _fingerprint(messages[0]) == state.next_fingerprint:
+            return 0
+        return None
+
+    def _fold(self, state: SummaryState, message: Dict[str, str]):
+        """Adds one message to the rolling summary, dropping the oldest lines beyond its budget."""
+        prefix = "User asked" if message["role"] == "user" else "Assistant answered"
+        state.lines.append(f"{prefix}: {_first_sentence(message['content'], self.line_max_chars)}")
+        state.last_fingerprint = _fingerprint(message)
+        while len(state.lines) > 1 and estimate_tokens(state.text()) > self.summary_max_tokens:
+            state.lines.pop(0)
+            state.omitted += 1
+
+    def _get_state(self, session_id: Optional[str]) -> SummaryState:
+        if session_id is None:
+            return SummaryState()
+        with self._lock:
+            state = self._sessions.get(session_id)
+            if state is None:
+                return SummaryState()
+            if time.monotonic() - state.updated_at > self.session_ttl:
+                del self._sessions[session_id]
+                return SummaryState()
+            self._sessions.move_to_end(session_id)
+            # Work on a copy so concurrent requests of one session don't interleave lines
+            return SummaryState(list(state.lines), state.omitted, state.last_fingerprint,
+                                state.next_fingerprint, state.updated_at)
+
+    def _put_state(self, session_id: Optional[str], state: SummaryState):
+        if session_id is None:
+            return
+        with self._lock:
+            if not state.lines:
+                # Nothing summarized (yet, or any more after a reset)
+                self._sessions.pop(session_id, None)
+                return
+            self._sessions[session_id] = state
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def forget(self, session_id: str):
+        """Drops the cached summary of a session."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    @property
+    def cached_sessions(self) -> int:
+        return len(self._sessions)
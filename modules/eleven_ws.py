@@ -1,18 +1,36 @@
+import os
 import asyncio
 import websockets
-import json
 import logging
-import asyncio
 import base64
 from typing import AsyncGenerator, Optional, Callable
 
 from dotenv import load_dotenv
 
+from modules import json_codec
+
 # Load environment variables
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+ELEVENLABS_API_URL = "https://api.elevenlabs.io"
+
+
+def elevenlabs_api_url() -> str:
+    """Base URL of the ElevenLabs REST API; ELEVENLABS_API_URL points it elsewhere, e.g. at a local stub."""
+    return os.getenv("ELEVENLABS_API_URL", ELEVENLABS_API_URL).rstrip("/")
+
+
+def elevenlabs_ws_url() -> str:
+    """Base URL of the ElevenLabs websocket API; ELEVENLABS_WS_URL overrides it, else it follows the REST URL."""
+    url = os.getenv("ELEVENLABS_WS_URL")
+    if url:
+        return url.rstrip("/")
+    api_url = elevenlabs_api_url()
+    return "ws" + api_url[len("http"):] if api_url.startswith("http") else api_url
+
+
 class ElevenLabsWebSocketClient:
     """
     A WebSocket client for ElevenLabs Text-to-Speech (TTS) and Speech-to-Text (STT) streaming.
@@ -23,7 +41,7 @@ class ElevenLabsWebSocketClient:
         self.model_id = model_id
         self.websocket = None
         # For TTS WebSocket
-        self.uri = f"wss://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}/stream-input?model_id={self.model_id}&output_format=pcm_16000"
+        self.uri = f"{elevenlabs_ws_url()}/v1/text-to-speech/{self.voice_id}/stream-input?model_id={self.model_id}&output_format=pcm_16000"
         # Add language codes to limit languages to Hindi and English
         self.supported_languages = ["en", "hi"]
         self.is_connected = False
@@ -35,7 +53,7 @@ class ElevenLabsWebSocketClient:
             logger.info("Connected to ElevenLabs WebSocket.")
 
             # Send the initial message with API key and other parameters
-            await self.websocket.send(json.dumps({
+            await self.websocket.send(json_codec.dumps({
                 "text": " ", # Initial handshake message
                 "voice_settings": {"stability": 0.5, "similarity_boost": 0.8},
                 "xi_api_key": self.api_key,
@@ -64,12 +82,12 @@ class ElevenLabsWebSocketClient:
         try:
             async for text_chunk in text_stream:
                 if text_chunk:
-                    await self.websocket.send(json.dumps({"text": text_chunk, "try_trigger_generation": True}))
+                    await self.websocket.send(json_codec.dumps({"text": text_chunk, "try_trigger_generation": True}))
 
-            await self.websocket.send(json.dumps({"text": ""})) # End of stream marker
+            await self.websocket.send(json_codec.dumps({"text": ""})) # End of stream marker
 
             async for message in self.websocket:
-                data = json.loads(message)
+                data = json_codec.loads(message)
                 if "audio" in data and data["audio"]:
                     yield base64.b64decode(data["audio"])
                 elif "is_final" in data and data["is_final"]:
@@ -89,12 +107,12 @@ class ElevenLabsWebSocketClient:
         # The proper URL for ElevenLabs Speech-to-Text WebSocket API
         # Note: As of the latest information, ElevenLabs may not support WebSocket STT
         # So this might still fail
-        stt_uri = f"wss://api.elevenlabs.io/v1/speech-to-text/streaming?model_id={self.model_id}"
+        stt_uri = f"{elevenlabs_ws_url()}/v1/speech-to-text/streaming?model_id={self.model_id}"
         
         try:
             async with websockets.connect(stt_uri) as ws:
                 # Send initiation message with API key in the headers
-                await ws.send(json.dumps({
+                await ws.send(json_codec.dumps({
                     "xi_api_key": self.api_key,  # Use xi_api_key instead of api_key
                     "sample_rate": 16000, # ElevenLabs STT expects 16kHz
                     "language": "auto", # Auto-detect between supported languages
@@ -106,7 +124,7 @@ class ElevenLabsWebSocketClient:
                     try:
                         async for chunk in audio_stream:
                             await ws.send(chunk)
-                        await ws.send(json.dumps({"eof": True})) # End of audio stream
+                        await ws.send(json_codec.dumps({"eof": True})) # End of audio stream
                     except Exception as e:
                         logger.error(f"Error sending audio for STT: {e}")
 
@@ -114,7 +132,7 @@ class ElevenLabsWebSocketClient:
                 async def receive_transcriptions():
                     try:
                         async for message in ws:
-                            data = json.loads(message)
+                            data = json_codec.loads(message)
                             if "transcript" in data:
                                 on_transcription(data["transcript"])
                             elif "error" in data:
@@ -0,0 +1,108 @@
+"""
+Background asyncio event loop for synchronous callers.
+
+Async resources such as the backend connection pool are bound to the event
+loop that created them. Flask handles requests on many threads, and calling
+asyncio.run() per request creates a fresh loop each time, which makes pooled
+connections unusable. BackgroundEventLoop runs one long-lived loop in a daemon
+thread and lets any thread run coroutines on it.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterable, Awaitable, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundEventLoop:
+    """An asyncio event loop running forever in a daemon thread."""
+
+    def __init__(self, name: str = "async-loop"):
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def start(self) -> "BackgroundEventLoop":
+        """Starts the loop thread if it isn't running yet."""
+        if self._thread and self._thread.is_alive():
+            return self
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        logger.info(f"Background event loop '{self.name}' started")
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coro: Awaitable) -> Future:
+        """Schedules a coroutine on the loop and returns a concurrent.futures.Future."""
+        if self.loop is None:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """
+        Runs a coroutine on the loop and blocks the calling thread until it finishes.
+
+        Must not be called from the loop thread itself.
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def iterate(self, async_iterable: AsyncIterable, timeout: Optional[float] = None) -> Iterator[Any]:
+        """
+        Iterates an async iterator on the loop from a synchronous thread.
+
+        Each item is fetched on the loop and handed back as soon as it arrives, so
+        a Flask response generator can stream it. If the caller stops iterating
+        early (e.g. the client disconnected), the async iterator is closed on the loop.
+
+        Args:
+            async_iterable: The async iterable to consume.
+            timeout: Maximum seconds to wait for any single item.
+        """
+        iterator = async_iterable.__aiter__()
+
+        async def next_item():
+            try:
+                return False, await iterator.__anext__()
+            except StopAsyncIteration:
+                return True, None
+
+        finished = False
+        try:
+            while True:
+                finished, item = self.run(next_item(), timeout)
+                if finished:
+                    return
+                yield item
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if not finished and aclose is not None:
+                try:
+                    self.run(aclose(), timeout=5)
+                except Exception as e:
+                    logger.debug(f"Error closing async iterator: {e}")
+
+    def stop(self):
+        """Stops the loop and waits for its thread to exit."""
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
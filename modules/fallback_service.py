@@ -9,7 +9,9 @@ when the NLP pipeline or backend services are unavailable.
 import logging
 import json
 import random
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
+
+from modules.nlp_result import NLPResult
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -96,29 +98,18 @@ class FallbackService:
                     return topic
         return None
     
-    def should_use_fallback(self, nlp_data: Optional[Dict[str, Any]]) -> bool:
+    def should_use_fallback(self, nlp_data: Union[NLPResult, Dict[str, Any], None]) -> bool:
         """
-        Determine if fallback should be used based on NLP data.
+        Determine if fallback should be used based on the NLP result.
         
         Args:
-            nlp_data: The NLP data returned from the pipeline
+            nlp_data: The NLPResult from the pipeline, or the raw backend reply (parsed here)
             
         Returns:
             True if fallback should be used, False otherwise
         """
-        # If NLP data is None or empty, use fallback
-        if not nlp_data:
-            return True
-            
-        # If there's an error status code, use fallback
-        if "statusCode" in nlp_data and nlp_data["statusCode"] != 200:
-            return True
-            
-        # If the response is empty, use fallback
-        if "response" not in nlp_data and ("body" not in nlp_data or not nlp_data["body"]):
-            return True
-            
-        return False
+        # No reply, an error status or no answer text (a partial answer is still used)
+        return not NLPResult.parse(nlp_data).has_answer
 
 # Example usage
 if __name__ == "__main__":
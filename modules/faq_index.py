@@ -0,0 +1,209 @@
+"""
+FAQ Index for the P2P Lending Voice AI Assistant.
+
+This module loads the prebuilt FAQ answer index (see build_faq_index.py) and
+answers high-confidence matches locally, so the most common questions never
+have to wait on the NLP backend.
+"""
+
+import os
+import re
+import json
+import logging
+import unicodedata
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, Any, Optional, List, Set
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout of the index changes.
+INDEX_FORMAT_VERSION = 1
+
+# Words that carry no meaning for FAQ matching.
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "do", "does", "did", "i", "me", "my",
+    "you", "your", "can", "could", "would", "will", "to", "of", "in", "on",
+    "for", "and", "or", "it", "this", "that", "please", "tell", "about",
+    "what", "whats", "how", "hi", "hey", "hello", "there", "be",
+}
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normalizes a question for exact index lookups.
+
+    Lowercases, folds typographic quotes, drops punctuation and collapses
+    whitespace, so "What's LenDenClub?" and "whats lendenclub" compare equal.
+    """
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    text = text.replace("’", "").replace("'", "")
+    text = re.sub(r"[^a-z0-9\s]", " ", text)
+    return " ".join(text.split())
+
+
+def question_tokens(normalized: str) -> Set[str]:
+    """Returns the content words of a normalized question."""
+    return {token for token in normalized.split() if token not in STOPWORDS}
+
+
+@dataclass
+class FAQConfig:
+    """Configuration for the FAQ fast path, loaded from config.yaml."""
+    enabled: bool = True
+    index_path: str = "data/faq_index.json"
+    min_score: float = 0.88
+
+    @classmethod
+    def from_yaml(cls, config_path: str = "config/config.yaml") -> "FAQConfig":
+        """Loads configuration from a YAML file."""
+        try:
+            with open(config_path, "r") as f:
+                config = yaml.safe_load(f)
+        except FileNotFoundError:
+            logger.warning(f"Config file not found at {config_path}, using defaults")
+            return cls()
+
+        faq_config = config.get("faq", {})
+        return cls(
+            enabled=faq_config.get("enabled", True),
+            index_path=faq_config.get("index_path", "data/faq_index.json"),
+            min_score=faq_config.get("min_score", 0.88)
+        )
+
+
+@dataclass
+class FAQMatch:
+    """A single FAQ lookup result."""
+    question: str
+    answer: str
+    audio_url: Optional[str]
+    score: float
+    match_type: str  # "exact", "normalized" or "fuzzy"
+
+
+class FAQIndex:
+    """
+    In-memory lookup index over canonical FAQ question/answer pairs.
+
+    Lookups try, in order, an exact match on the raw question, a match on the
+    normalized question, and finally a fuzzy match restricted to entries that
+    share at least one content word with the query.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], version: str = "", min_score: float = 0.88):
+        self.entries = entries
+        self.version = version
+        self.min_score = min_score
+        self._exact: Dict[str, int] = {}
+        self._normalized: Dict[str, int] = {}
+        self._tokens: List[Set[str]] = []
+        self._postings: Dict[str, List[int]] = {}
+
+        for position, entry in enumerate(entries):
+            normalized = entry.get("normalized") or normalize_question(entry["question"])
+            tokens = question_tokens(normalized)
+            self._exact.setdefault(entry["question"].strip(), position)
+            self._normalized.setdefault(normalized, position)
+            self._tokens.append(tokens)
+            for token in tokens:
+                self._postings.setdefault(token, []).append(position)
+
+        logger.info(f"FAQ index loaded with {len(entries)} entries (version {version or 'unversioned'})")
+
+    @classmethod
+    def load(cls, index_path: str, min_score: float = 0.88) -> "FAQIndex":
+        """
+        Loads a prebuilt index artifact from disk.
+
+        Raises:
+            FileNotFoundError: If the artifact does not exist.
+            ValueError: If the artifact was built with an incompatible format.
+        """
+        with open(index_path, "r", encoding="utf-8") as f:
+            artifact = json.load(f)
+
+        if artifact.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"FAQ index at {index_path} has format version {artifact.get('format_version')}, "
+                f"expected {INDEX_FORMAT_VERSION}. Rebuild it with build_faq_index.py."
+            )
+        return cls(artifact.get("entries", []), version=artifact.get("version", ""), min_score=min_score)
+
+    @classmethod
+    def from_config(cls, config: FAQConfig) -> Optional["FAQIndex"]:
+        """Loads the index described by the config, or returns None if it is disabled or missing."""
+        if not config.enabled:
+            return None
+        if not os.path.exists(config.index_path):
+            logger.warning(f"FAQ index not found at {config.index_path}; FAQ fast path disabled")
+            return None
+        try:
+            return cls.load(config.index_path, min_score=config.min_score)
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            logger.error(f"Failed to load FAQ index: {e}")
+            return None
+
+    def _match(self, position: int, score: float, match_type: str) -> FAQMatch:
+        entry = self.entries[position]
+        return FAQMatch(
+            question=entry["question"],
+            answer=entry["answer"],
+            audio_url=entry.get("audio_url"),
+            score=score,
+            match_type=match_type
+        )
+
+    def lookup(self, text: str) -> Optional[FAQMatch]:
+        """
+        Finds the best FAQ entry for a user query.
+
+        Args:
+            text: The user's question.
+
+        Returns:
+            An FAQMatch if the best candidate scores at least min_score, otherwise None.
+        """
+        if not text or not self.entries:
+            return None
+
+        position = self._exact.get(text.strip())
+        if position is not None:
+            return self._match(position, 1.0, "exact")
+
+        normalized = normalize_question(text)
+        position = self._normalized.get(normalized)
+        if position is not None:
+            return self._match(position, 1.0, "normalized")
+
+        tokens = question_tokens(normalized)
+        candidates = {candidate for token in tokens for candidate in self._postings.get(token, ())}
+        best_position, best_score = None, 0.0
+        for candidate in candidates:
+            entry_tokens = self._tokens[candidate]
+            overlap = len(tokens & entry_tokens) / len(tokens | entry_tokens)
+            # Cheap upper bound: skip the character-level comparison when token
+            # overlap alone cannot reach the threshold.
+            if (overlap + 1.0) / 2 < self.min_score:
+                continue
+            entry_normalized = self.entries[candidate].get("normalized") or normalize_question(self.entries[candidate]["question"])
+            ratio = SequenceMatcher(None, normalized, entry_normalized).ratio()
+            score = (overlap + ratio) / 2
+            if score > best_score:
+                best_position, best_score = candidate, score
+
+        if best_position is not None and best_score >= self.min_score:
+            return self._match(best_position, round(best_score, 3), "fuzzy")
+        return None
+
+# Example usage
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    faq_index = FAQIndex.from_config(FAQConfig.from_yaml())
+    if faq_index:
+        for query in ["What is LenDenClub?", "is lendenclub registered with the RBI", "How do I make pasta?"]:
+            match = faq_index.lookup(query)
+            print(f"{query!r} -> {match.match_type if match else 'miss'} ({match.score if match else 0})")
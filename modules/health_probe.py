@@ -0,0 +1,298 @@
+"""
+Dependency health probing for the P2P Lending Voice AI Assistant.
+
+HealthProber runs in a background thread and periodically measures connect
+time and a tiny round-trip for every external dependency (the API Gateway
+websocket, ElevenLabs TTS and ElevenLabs STT). Results are cached, so readers
+such as /api/health/deep and the load balancer never trigger probes themselves.
+"""
+
+import ssl
+import time
+import socket
+import asyncio
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import urlparse
+
+import yaml
+
+from modules.utils import percentile
+from modules.eleven_ws import elevenlabs_api_url
+
+logger = logging.getLogger(__name__)
+
+# Dependency statuses
+STATUS_UNKNOWN = "unknown"
+STATUS_UP = "up"
+STATUS_DEGRADED = "degraded"
+STATUS_DOWN = "down"
+
+@dataclass
+class HealthConfig:
+    """Configuration for dependency probing, loaded from config.yaml."""
+    enabled: bool = True
+    interval_seconds: float = 30.0
+    timeout_seconds: float = 5.0
+    window: int = 50
+    degraded_ms: float = 1500.0
+    down_after_failures: int = 2
+    probe_tts: bool = False
+    tts_interval_seconds: float = 600.0
+
+    @classmethod
+    def from_yaml(cls, config_path: str = "config/config.yaml") -> "HealthConfig":
+        """Loads configuration from a YAML file."""
+        try:
+            with open(config_path, "r") as f:
+                config = yaml.safe_load(f)
+        except FileNotFoundError:
+            logger.warning(f"Config file not found at {config_path}, using defaults")
+            return cls()
+
+        health_config = config.get("health", {})
+        return cls(
+            enabled=health_config.get("enabled", True),
+            interval_seconds=health_config.get("interval_seconds", 30.0),
+            timeout_seconds=health_config.get("timeout_seconds", 5.0),
+            window=health_config.get("window", 50),
+            degraded_ms=health_config.get("degraded_ms", 1500.0),
+            down_after_failures=health_config.get("down_after_failures", 2),
+            probe_tts=health_config.get("probe_tts", False),
+            tts_interval_seconds=health_config.get("tts_interval_seconds", 600.0)
+        )
+
+
+class DependencyProbe(ABC):
+    """Base class for a single dependency probe."""
+
+    name = "dependency"
+    # Seconds between probes; None uses the prober's interval
+    interval_seconds: Optional[float] = None
+
+    @abstractmethod
+    def probe(self, timeout: float) -> Tuple[float, float]:
+        """
+        Measures the dependency once.
+
+        Returns:
+            A (connect_ms, round_trip_ms) tuple.
+
+        Raises:
+            Exception: If the dependency could not be reached.
+        """
+
+
+class WebSocketProbe(DependencyProbe):
+    """Connects to a websocket endpoint and measures a ping/pong round-trip."""
+
+    def __init__(self, name: str, url: str, interval_seconds: Optional[float] = None):
+        self.name = name
+        self.url = url
+        self.interval_seconds = interval_seconds
+
+    def probe(self, timeout: float) -> Tuple[float, float]:
+        return asyncio.run(self._probe(timeout))
+
+    async def _probe(self, timeout: float) -> Tuple[float, float]:
+        import websockets
+
+        started = time.perf_counter()
+        async with websockets.connect(self.url, open_timeout=timeout, close_timeout=1) as connection:
+            connected = time.perf_counter()
+            pong_waiter = await connection.ping()
+            await asyncio.wait_for(pong_waiter, timeout)
+            finished = time.perf_counter()
+        return (connected - started) * 1000, (finished - connected) * 1000
+
+
+class HTTPSProbe(DependencyProbe):
+    """Measures the connect time to a host (with the TLS handshake for https) and a tiny authenticated GET."""
+
+    def __init__(self, name: str, url: str, headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.url = url
+        self.headers = headers or {}
+
+    def probe(self, timeout: float) -> Tuple[float, float]:
+        import requests
+
+        parsed = urlparse(self.url)
+        host = parsed.hostname
+        secure = parsed.scheme == "https"
+        started = time.perf_counter()
+        with socket.create_connection((host, parsed.port or (443 if secure else 80)), timeout=timeout) as raw_socket:
+            if secure:
+                with ssl.create_default_context().wrap_socket(raw_socket, server_hostname=host):
+                    pass
+            connected = time.perf_counter()
+
+        request_started = time.perf_counter()
+        response = requests.get(self.url, headers=self.headers, timeout=timeout)
+        finished = time.perf_counter()
+        if response.status_code >= 500:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return (connected - started) * 1000, (finished - request_started) * 1000
+
+
+class DependencyHealth:
+    """Rolling health record of one dependency."""
+
+    def __init__(self, name: str, window: int):
+        self.name = name
+        self.status = STATUS_UNKNOWN
+        self.connect_ms: deque = deque(maxlen=window)
+        self.round_trip_ms: deque = deque(maxlen=window)
+        self.last_checked: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self.checks = 0
+        self.failures = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        def rounded(value):
+            return round(value, 1) if value is not None else None
+
+        return {
+            "status": self.status,
+            "last_checked": self.last_checked,
+            "last_success": self.last_success,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "checks": self.checks,
+            "failures": self.failures,
+            "connect_ms": {
+                "last": rounded(self.connect_ms[-1]) if self.connect_ms else None,
+                "p50": rounded(percentile(self.connect_ms, 50)),
+                "p95": rounded(percentile(self.connect_ms, 95))
+            },
+            "round_trip_ms": {
+                "last": rounded(self.round_trip_ms[-1]) if self.round_trip_ms else None,
+                "p50": rounded(percentile(self.round_trip_ms, 50)),
+                "p95": rounded(percentile(self.round_trip_ms, 95)),
+                "p99": rounded(percentile(self.round_trip_ms, 99))
+            }
+        }
+
+
+class HealthProber:
+    """
+    Periodically probes dependencies in a daemon thread and caches the results.
+    """
+
+    def __init__(self, probes: List[DependencyProbe], config: HealthConfig):
+        self.probes = probes
+        self.config = config
+        self._lock = threading.Lock()
+        self._health = {probe.name: DependencyHealth(probe.name, config.window) for probe in probes}
+        self._snapshot: Dict[str, Dict[str, Any]] = {name: health.to_dict() for name, health in self._health.items()}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Starts the background probing thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="health-prober", daemon=True)
+        self._thread.start()
+        logger.info(f"Health prober started for {', '.join(self._health)} every {self.config.interval_seconds}s")
+
+    def stop(self):
+        """Stops the background probing thread."""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.probe_all(due_only=True)
+            self._stop.wait(self.config.interval_seconds)
+
+    def _is_due(self, probe: DependencyProbe) -> bool:
+        last_checked = self._health[probe.name].last_checked
+        interval = probe.interval_seconds or self.config.interval_seconds
+        # A little slack so a probe on the prober's own interval isn't skipped for a few ms
+        return last_checked is None or time.time() - last_checked >= interval - 1.0
+
+    def probe_all(self, due_only: bool = False):
+        """
+        Probes the dependencies and refreshes the cached snapshot.
+
+        Args:
+            due_only: Skip probes whose own interval hasn't elapsed since their last check.
+        """
+        for probe in self.probes:
+            if due_only and not self._is_due(probe):
+                continue
+            health = self._health[probe.name]
+            try:
+                connect_ms, round_trip_ms = probe.probe(self.config.timeout_seconds)
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+
+            with self._lock:
+                health.checks += 1
+                health.last_checked = time.time()
+                if error is None:
+                    health.connect_ms.append(connect_ms)
+                    health.round_trip_ms.append(round_trip_ms)
+                    health.last_success = health.last_checked
+                    health.last_error = None
+                    health.consecutive_failures = 0
+                    slow = connect_ms + round_trip_ms > self.config.degraded_ms
+                    health.status = STATUS_DEGRADED if slow else STATUS_UP
+                else:
+                    health.failures += 1
+                    health.consecutive_failures += 1
+                    health.last_error = error
+                    down = health.consecutive_failures >= self.config.down_after_failures
+                    health.status = STATUS_DOWN if down else STATUS_DEGRADED
+                    logger.warning(f"Health probe for {probe.name} failed: {error}")
+                self._snapshot[probe.name] = health.to_dict()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the cached per-dependency health. Never triggers a probe."""
+        with self._lock:
+            return dict(self._snapshot)
+
+    def status(self, name: str) -> str:
+        """Returns the cached status of one dependency."""
+        with self._lock:
+            return self._snapshot.get(name, {}).get("status", STATUS_UNKNOWN)
+
+    def overall_status(self) -> str:
+        """Returns the worst status across all probed dependencies."""
+        order = [STATUS_UP, STATUS_UNKNOWN, STATUS_DEGRADED, STATUS_DOWN]
+        statuses = [entry["status"] for entry in self.snapshot().values()]
+        return max(statuses, key=order.index) if statuses else STATUS_UNKNOWN
+
+
+def build_default_probes(api_gateway_url: Optional[str], tts_uri: Optional[str],
+                         elevenlabs_api_key: str = "",
+                         tts_interval_seconds: Optional[float] = None) -> List[DependencyProbe]:
+    """
+    Builds the probes for the standard dependencies of the server.
+
+    Args:
+        api_gateway_url: Websocket URL of the NLP backend, including any API key.
+        tts_uri: Websocket URI of the ElevenLabs TTS stream, or None to skip it. Each
+            probe opens a real TTS session, so callers only pass it when health.probe_tts is set.
+        elevenlabs_api_key: ElevenLabs API key for the STT round-trip.
+        tts_interval_seconds: Seconds between TTS probes.
+    """
+    probes: List[DependencyProbe] = []
+    if api_gateway_url:
+        probes.append(WebSocketProbe("api_gateway", api_gateway_url))
+    if tts_uri:
+        probes.append(WebSocketProbe("elevenlabs_tts", tts_uri, interval_seconds=tts_interval_seconds))
+    probes.append(HTTPSProbe(
+        "elevenlabs_stt",
+        f"{elevenlabs_api_url()}/v1/models",
+        headers={"xi-api-key": elevenlabs_api_key} if elevenlabs_api_key else None
+    ))
+    return probes
@@ -0,0 +1,258 @@
+"""
+Hedged backend requests.
+
+Most NLP requests answer quickly, but an occasional Lambda cold start or slow
+Bedrock invocation dominates the tail. With hedging, if the first frame of a
+request hasn't arrived after a delay taken from the recent first-frame latency
+distribution, the same request is sent again, preferably on another pooled
+connection. Whichever attempt produces a frame first wins and the other one is
+cancelled. A budget caps the share of requests that may be hedged, so the
+extra backend load stays bounded even when everything is slow.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict
+
+import yaml
+
+from modules.utils import percentile
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of an attempt's frames in its queue
+_END = object()
+
+
+@dataclass
+class HedgeConfig:
+    """Configuration for request hedging, loaded from config.yaml."""
+    enabled: bool = False
+    delay_percentile: float = 95.0
+    initial_delay: float = 1.0
+    min_delay: float = 0.05
+    max_delay: float = 3.0
+    min_samples: int = 20
+    budget: float = 0.05
+    window: int = 500
+
+    @classmethod
+    def from_yaml(cls, config_path: str = "config/config.yaml") -> "HedgeConfig":
+        """Loads configuration from a YAML file."""
+        try:
+            with open(config_path, "r") as f:
+                config = yaml.safe_load(f)
+        except FileNotFoundError:
+            logger.warning(f"Config file not found at {config_path}, using defaults")
+            return cls()
+        return cls.from_dict(config.get("api_gateway", {}).get("hedging", {}))
+
+    @classmethod
+    def from_dict(cls, hedge_config: Dict[str, Any]) -> "HedgeConfig":
+        """Builds the configuration from the api_gateway.hedging section."""
+        return cls(
+            enabled=hedge_config.get("enabled", False),
+            delay_percentile=hedge_config.get("delay_percentile", 95.0),
+            initial_delay=hedge_config.get("initial_delay", 1.0),
+            min_delay=hedge_config.get("min_delay", 0.05),
+            max_delay=hedge_config.get("max_delay", 3.0),
+            min_samples=hedge_config.get("min_samples", 20),
+            budget=hedge_config.get("budget", 0.05),
+            window=hedge_config.get("window", 500)
+        )
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge and keeps the hedging metrics.
+
+    The hedge delay is the configured percentile of recent first-frame latencies,
+    clamped to [min_delay, max_delay]; initial_delay is used until min_samples
+    latencies have been seen. A hedge is only sent while the hedged share of the
+    last ``window`` requests is below ``budget``.
+    """
+
+    def __init__(self, config: HedgeConfig):
+        self.config = config
+        self._latencies: deque = deque(maxlen=config.window)
+        self._hedged: deque = deque(maxlen=config.window)
+        # Hedges sent for requests that haven't finished; they count against the budget
+        # too, or a burst of slow requests would all hedge before any of them finished
+        self._hedges_in_flight = 0
+        self._delay = config.initial_delay
+        self._samples_since_update = 0
+        # Metrics
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.primary_wins = 0
+        self.budget_denied = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    @property
+    def delay(self) -> float:
+        """Seconds to wait for the first frame before hedging."""
+        return self._delay
+
+    def record_latency(self, seconds: float):
+        """Records the first-frame latency of a request, refreshing the delay every few samples."""
+        self._latencies.append(seconds)
+        self._samples_since_update += 1
+        if len(self._latencies) >= self.config.min_samples and self._samples_since_update >= 10:
+            self._samples_since_update = 0
+            delay = percentile(self._latencies, self.config.delay_percentile)
+            self._delay = min(max(delay, self.config.min_delay), self.config.max_delay)
+
+    def start_request(self):
+        self.requests += 1
+
+    def try_hedge(self) -> bool:
+        """Whether a hedge may be sent now; counts it against the budget if so."""
+        window = max(len(self._hedged), self.config.min_samples)
+        if sum(self._hedged) + self._hedges_in_flight + 1 > self.config.budget * window:
+            self.budget_denied += 1
+            return False
+        self.hedges += 1
+        self._hedges_in_flight += 1
+        return True
+
+    def finish_request(self, hedged: bool, hedge_won: bool = False, abandoned: bool = False):
+        """
+        Records a finished request.
+
+        Args:
+            hedged: Whether try_hedge() allowed a hedge for it.
+            hedge_won: Whether the hedge produced the answer.
+            abandoned: Whether the caller stopped before either attempt answered.
+        """
+        self._hedged.append(1 if hedged else 0)
+        if hedged:
+            self._hedges_in_flight = max(self._hedges_in_flight - 1, 0)
+            if abandoned:
+                return
+            if hedge_won:
+                self.hedge_wins += 1
+            else:
+                self.primary_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hedging metrics."""
+        return {
+            "enabled": self.enabled,
+            "delay_ms": round(self._delay * 1000, 1),
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedges_in_flight": self._hedges_in_flight,
+            "hedge_rate": round(self.hedges / self.requests, 4) if self.requests else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "primary_wins": self.primary_wins,
+            "budget_denied": self.budget_denied
+        }
+
+
+class _Attempt:
+    """One copy of a request, pumping its frames into a queue from a task."""
+
+    def __init__(self, pool, payload: Dict[str, Any], stream_kwargs: Dict[str, Any], avoid=None):
+        self.client = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._pump(pool, payload, stream_kwargs, avoid))
+
+    async def _pump(self, pool, payload, stream_kwargs, avoid):
+        try:
+            async with pool.connection(avoid=avoid) as ws_client:
+                self.client = ws_client
+                async for frame in ws_client.stream_message(payload, **stream_kwargs):
+                    self.queue.put_nowait(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.queue.put_nowait(e)
+        finally:
+            self.queue.put_nowait(_END)
+
+    async def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+
+
+def _is_answer(item) -> bool:
+    """Whether the first item of an attempt counts as an answer rather than a failure."""
+    return isinstance(item, dict) and "error" not in item
+
+
+async def hedged_stream(pool, payload: Dict[str, Any], policy: HedgePolicy,
+                        **stream_kwargs) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams a request's frames like WebSocketClient.stream_message, hedging it if it is slow.
+
+    Args:
+        pool: The WebSocketConnectionPool to lease connections from.
+        payload: The message payload.
+        policy: The hedge policy providing the delay and budget and keeping metrics.
+        **stream_kwargs: Passed on to WebSocketClient.stream_message.
+
+    Raises:
+        Whatever the winning attempt raised, if no attempt produced an answer.
+    """
+    policy.start_request()
+    started = time.monotonic()
+    primary = _Attempt(pool, payload, stream_kwargs)
+    attempts = [primary]
+    hedge = None
+    winner = None
+    first = None
+
+    getter = asyncio.ensure_future(primary.queue.get())
+    getters = {getter: primary}
+    finished = False
+
+    try:
+        # Wait for the first frame of the primary, hedging once if it takes too long
+        done, _ = await asyncio.wait({getter}, timeout=policy.delay)
+        if not done and policy.try_hedge():
+            logger.info(f"No first frame after {policy.delay * 1000:.0f}ms, sending a hedged request")
+            hedge = _Attempt(pool, payload, stream_kwargs, avoid=primary.client)
+            attempts.append(hedge)
+        if hedge is not None:
+            getters[asyncio.ensure_future(hedge.queue.get())] = hedge
+
+        # The first attempt to produce an answer wins; a failure only counts once all attempts failed
+        while getters:
+            done, _ = await asyncio.wait(set(getters), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = getters.pop(task)
+                item = task.result()
+                if _is_answer(item) or not getters:
+                    winner, first = attempt, item
+                    break
+            if winner is not None:
+                break
+        if _is_answer(first):
+            policy.record_latency(time.monotonic() - started)
+        policy.finish_request(hedge is not None, winner is hedge)
+        finished = True
+        for attempt in attempts:
+            if attempt is not winner:
+                await attempt.cancel()
+
+        item = first
+        while item is not _END:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+            item = await winner.queue.get()
+    finally:
+        if not finished:
+            policy.finish_request(hedge is not None, abandoned=True)
+        for pending_getter in getters:
+            pending_getter.cancel()
+        for attempt in attempts:
+            await attempt.cancel()
@@ -0,0 +1,119 @@
+"""
+JSON codec used on the hot paths.
+
+Every backend frame, every ElevenLabs audio frame (a large base64 string) and
+every server response goes through JSON. This module encodes and decodes with
+orjson or ujson when one of them is installed, and with the standard library
+otherwise, so callers don't need to care which is available.
+
+Set the JSON_CODEC environment variable to "json" to force the standard
+library (or to "orjson"/"ujson" to pick a specific library).
+"""
+
+import os
+import json
+import logging
+from typing import Any, Callable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ORJSON = "orjson"
+BACKEND_UJSON = "ujson"
+BACKEND_STDLIB = "json"
+
+# Raised by loads() for malformed input; all backends raise a ValueError subclass
+DecodeError = ValueError
+
+
+def _select_backend(preferred: Optional[str]):
+    candidates = [BACKEND_ORJSON, BACKEND_UJSON]
+    if preferred:
+        if preferred == BACKEND_STDLIB:
+            return BACKEND_STDLIB, None
+        if preferred in candidates:
+            candidates.remove(preferred)
+            candidates.insert(0, preferred)
+        else:
+            logger.warning(f"Unknown JSON_CODEC '{preferred}', choosing automatically")
+    for name in candidates:
+        try:
+            return name, __import__(name)
+        except ImportError:
+            continue
+    return BACKEND_STDLIB, None
+
+
+BACKEND, _lib = _select_backend(os.environ.get("JSON_CODEC", "").strip().lower() or None)
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """
+    Decodes a JSON document.
+
+    Args:
+        data: The document, as text or UTF-8 bytes.
+
+    Raises:
+        DecodeError: If the document is not valid JSON.
+    """
+    if BACKEND == BACKEND_ORJSON:
+        return _lib.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    if BACKEND == BACKEND_UJSON:
+        return _lib.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any, default: Optional[Callable[[Any], Any]] = None, sort_keys: bool = False) -> bytes:
+    """
+    Encodes obj as compact UTF-8 JSON bytes.
+
+    Args:
+        obj: The value to encode.
+        default: Called for objects the encoder can't serialize; returns a serializable value.
+        sort_keys: Whether to sort object keys.
+    """
+    if BACKEND == BACKEND_ORJSON:
+        try:
+            return _lib.dumps(obj, default=default,
+                              option=_lib.OPT_NON_STR_KEYS | (_lib.OPT_SORT_KEYS if sort_keys else 0))
+        except TypeError:
+            # e.g. integers wider than 64 bits; the standard library handles them
+            pass
+    return dumps(obj, default=default, sort_keys=sort_keys).encode("utf-8")
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None, sort_keys: bool = False) -> str:
+    """
+    Encodes obj as compact JSON text.
+
+    Non-ASCII characters are written as-is rather than escaped.
+
+    Args:
+        obj: The value to encode.
+        default: Called for objects the encoder can't serialize; returns a serializable value.
+        sort_keys: Whether to sort object keys.
+    """
+    if BACKEND == BACKEND_ORJSON:
+        try:
+            return _lib.dumps(obj, default=default,
+                              option=_lib.OPT_NON_STR_KEYS | (_lib.OPT_SORT_KEYS if sort_keys else 0)).decode("utf-8")
+        except TypeError:
+            pass
+    elif BACKEND == BACKEND_UJSON and default is None:
+        try:
+            return _lib.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, sort_keys=sort_keys)
+        except (TypeError, OverflowError):
+            pass
+    return json.dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=False, separators=(",", ":"))
+
+
+# Example usage
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    frame = {"response_chunk": "P2P lending connects lenders with borrowers. ", "seq": 3, "session_id": "abc"}
+    encoded = dumps(frame)
+    logger.info(f"Backend: {BACKEND}")
+    logger.info(f"Encoded: {encoded}")
+    logger.info(f"Round trip ok: {loads(encoded) == frame}")
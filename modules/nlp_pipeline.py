@@ -3,24 +3,68 @@
 import os
 import yaml
 import logging
-import json
+import time
 import asyncio
 import uuid
-from typing import Dict, Any, Optional, List, Callable
-from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, AsyncIterator
+from dataclasses import dataclass, field
 
-from modules.websocket_client import WebSocketClient
-from modules.tts_module import TTSModule, TTSConfig
+import requests
+import websockets.exceptions
+
+from modules.websocket_client import WebSocketClient, RESULT_TIMEOUT, RESULT_DISCONNECTED, RESULT_ERROR
+from modules.connection_pool import WebSocketConnectionPool
+from modules.payload_log import payload_recorder
+from modules.conversation_context import ConversationContext
+from modules.batch import BatchRun
+from modules.hedging import HedgeConfig, HedgePolicy, hedged_stream
+from modules.circuit_breaker import CircuitBreaker, CircuitBreakerConfig
+from modules.api_client import APIClient
+from modules.nlp_result import NLPResult
 
 # Initialize logging
 logger = logging.getLogger(__name__)
 
+# Backend transports selectable with api_gateway.transport
+TRANSPORT_WEBSOCKET = "websocket"
+TRANSPORT_HTTP = "http"
+TRANSPORT_AUTO = "auto"  # WebSocket, switching to HTTP for a while after it fails to connect
+
 @dataclass
 class NLPConfig:
     """Configuration for the NLP Pipeline, loaded from config.yaml."""
     api_base_url: str
     api_key: str
     api_nlp_endpoint: str
+    heartbeat_interval: float = 30.0
+    idle_timeout: float = 540.0
+    max_reconnect_attempts: int = 5
+    first_byte_timeout: Optional[float] = 15.0
+    total_timeout: Optional[float] = 60.0
+    frame_encoding: str = "msgpack"
+    compression: Optional[str] = "deflate"
+    pool_min_size: int = 1
+    pool_max_size: int = 8
+    pool_acquire_timeout: float = 10.0
+    pool_max_idle_time: float = 300.0
+    max_streams_per_connection: int = 4
+    history_max_tokens: int = 1200
+    history_recent_turns: int = 3
+    history_summary_max_tokens: int = 300
+    history_cache_sessions: int = 1000
+    history_cache_ttl: float = 3600.0
+    batch_max_in_flight: int = 4
+    batch_max_retries: int = 2
+    batch_retry_backoff: float = 1.0
+    hedging: HedgeConfig = field(default_factory=HedgeConfig)
+    circuit_breaker: CircuitBreakerConfig = field(default_factory=CircuitBreakerConfig)
+    transport: str = TRANSPORT_WEBSOCKET
+    http_base_url: Optional[str] = None
+    http_timeout: float = 30.0
+    http_pool_size: int = 8
+    http_max_retries: int = 2
+    http_retry_backoff: float = 0.5
+    websocket_retry_after: float = 60.0
 
     @classmethod
     def from_yaml(cls, config_path: str = "config/config.yaml") -> "NLPConfig":
@@ -39,28 +83,399 @@ class NLPConfig:
         if not api_base_url:
             raise ValueError("API_GATEWAY_URL is not set in environment or config.yaml.")
 
+        connection_config = config.get("api_gateway", {}).get("connection", {})
+        pool_config = config.get("api_gateway", {}).get("pool", {})
+        conversation_config = config.get("conversation", {})
+        batch_config = config.get("batch", {})
+        http_config = config.get("api_gateway", {}).get("http", {})
+
+        transport = str(config.get("api_gateway", {}).get("transport", TRANSPORT_WEBSOCKET)).lower()
+        if transport not in (TRANSPORT_WEBSOCKET, TRANSPORT_HTTP, TRANSPORT_AUTO):
+            raise ValueError(f"Unknown api_gateway.transport '{transport}'; use websocket, http or auto.")
+        http_base_url = os.getenv("API_GATEWAY_HTTP_URL", http_config.get("base_url")) or None
+        if transport == TRANSPORT_HTTP and not http_base_url:
+            raise ValueError("API_GATEWAY_HTTP_URL is not set in environment or config.yaml (needed for the http transport).")
+
         return cls(
             api_base_url=api_base_url,
             api_key=api_key,
-            api_nlp_endpoint=config.get("api_gateway", {}).get("endpoints", {}).get("nlp", "/nlp")
+            api_nlp_endpoint=config.get("api_gateway", {}).get("endpoints", {}).get("nlp", "/nlp"),
+            heartbeat_interval=connection_config.get("heartbeat_interval", 30.0),
+            idle_timeout=connection_config.get("idle_timeout", 540.0),
+            max_reconnect_attempts=connection_config.get("max_reconnect_attempts", 5),
+            first_byte_timeout=connection_config.get("first_byte_timeout", 15.0),
+            total_timeout=connection_config.get("total_timeout", 60.0),
+            frame_encoding=connection_config.get("frame_encoding", "msgpack"),
+            compression=None if str(connection_config.get("compression", "deflate")).lower() in ("none", "false") else "deflate",
+            pool_min_size=pool_config.get("min_size", 1),
+            pool_max_size=pool_config.get("max_size", 8),
+            pool_acquire_timeout=pool_config.get("acquire_timeout", 10.0),
+            pool_max_idle_time=pool_config.get("max_idle_time", 300.0),
+            max_streams_per_connection=pool_config.get("max_streams_per_connection", 4),
+            history_max_tokens=conversation_config.get("max_context_tokens", 1200),
+            history_recent_turns=conversation_config.get("recent_turns", 3),
+            history_summary_max_tokens=conversation_config.get("summary_max_tokens", 300),
+            history_cache_sessions=conversation_config.get("cache_sessions", 1000),
+            history_cache_ttl=conversation_config.get("cache_ttl", 3600.0),
+            batch_max_in_flight=batch_config.get("max_in_flight", 4),
+            batch_max_retries=batch_config.get("max_retries", 2),
+            batch_retry_backoff=batch_config.get("retry_backoff", 1.0),
+            hedging=HedgeConfig.from_dict(config.get("api_gateway", {}).get("hedging", {})),
+            circuit_breaker=CircuitBreakerConfig.from_dict(config.get("api_gateway", {}).get("circuit_breaker", {})),
+            transport=transport,
+            http_base_url=http_base_url,
+            http_timeout=http_config.get("timeout", 30.0),
+            http_pool_size=http_config.get("pool_size", 8),
+            http_max_retries=http_config.get("max_retries", 2),
+            http_retry_backoff=http_config.get("retry_backoff", 0.5),
+            websocket_retry_after=http_config.get("websocket_retry_after", 60.0)
         )
 
+@dataclass
+class StreamEvent:
+    """
+    One event of a streamed NLP response.
+
+    type is "chunk" for a partial response, "final" for the complete response
+    (text holds the whole answer, data the backend's final frame) or "error".
+    """
+    type: str
+    text: str = ""
+    session_id: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None
+
 class NLPPipeline:
     """
-    Orchestrates NLP processing by sending requests to the backend API via WebSocket.
+    Orchestrates NLP processing by sending requests to the backend API via WebSocket,
+    or via HTTP if so configured or while the websocket is unreachable.
     """
-    def __init__(self, config: NLPConfig):
+    def __init__(self, config: NLPConfig, tts_service=None):
+        """
+        Args:
+            config: The NLP configuration.
+            tts_service: Optional TTSModule. If given, non-streaming responses are also
+                synthesized to static/audio and returned with an audio_url. Text-only
+                callers such as batch inference leave it unset and never touch TTS.
+        """
         self.config = config
-        self.tts_config = TTSConfig.from_yaml() # Load TTS config
-        self.tts_service = TTSModule(config=self.tts_config) # Initialize TTS service
-        self.ws_client = WebSocketClient(
+        self.tts_service = tts_service
+        # Concurrent requests lease connections from the pool; a connection is shared
+        # by several requests once the backend has shown it echoes request ids.
+        # TTS service is handled directly by NLPPipeline, not passed to WebSocketClient
+        self.pool = WebSocketConnectionPool(
+            client_factory=self._create_ws_client,
+            min_size=self.config.pool_min_size,
+            max_size=self.config.pool_max_size,
+            acquire_timeout=self.config.pool_acquire_timeout,
+            max_idle_time=self.config.pool_max_idle_time
+        )
+        # Recent turns are sent verbatim and older ones as a rolling summary cached per session
+        self.context = ConversationContext(
+            max_tokens=self.config.history_max_tokens,
+            recent_turns=self.config.history_recent_turns,
+            summary_max_tokens=self.config.history_summary_max_tokens,
+            max_sessions=self.config.history_cache_sessions,
+            session_ttl=self.config.history_cache_ttl
+        )
+        # Slow requests are duplicated on another connection when hedging is enabled
+        self.hedge_policy = HedgePolicy(self.config.hedging)
+        # Fails requests fast while the backend is degraded
+        self.breaker = CircuitBreaker(self.config.circuit_breaker)
+        # Shared by all batches, so bulk jobs can't take every pooled connection
+        self._batch_slots: Optional[asyncio.Semaphore] = None
+        # Pooled keep-alive HTTP client for the http and auto transports
+        self.http_client: Optional[APIClient] = None
+        if self.config.transport != TRANSPORT_WEBSOCKET:
+            if self.config.http_base_url:
+                self.http_client = APIClient(
+                    base_url=self.config.http_base_url,
+                    api_key=self.config.api_key,
+                    timeout=self.config.http_timeout,
+                    pool_size=self.config.http_pool_size,
+                    max_retries=self.config.http_max_retries,
+                    retry_backoff=self.config.http_retry_backoff
+                )
+            else:
+                logger.warning("No HTTP base URL configured; the auto transport will only use the websocket.")
+        self._websocket_down_until = 0.0
+        self._transport_counts = {"websocket": 0, "http": 0, "http_fallbacks": 0}
+        logger.info(f"NLP Pipeline initialized successfully ({'with' if tts_service else 'without'} TTS).")
+
+    def _create_ws_client(self) -> WebSocketClient:
+        """Creates a backend WebSocket client; used by the connection pool."""
+        return WebSocketClient(
             base_url=self.config.api_base_url,
-            api_key=self.config.api_key
-        ) # TTS service is now handled directly by NLPPipeline, not passed to WebSocketClient
-        logger.info("NLP Pipeline initialized successfully.")
+            api_key=self.config.api_key,
+            heartbeat_interval=self.config.heartbeat_interval,
+            idle_timeout=self.config.idle_timeout,
+            max_reconnect_attempts=self.config.max_reconnect_attempts,
+            max_in_flight=self.config.max_streams_per_connection,
+            first_byte_timeout=self.config.first_byte_timeout,
+            total_timeout=self.config.total_timeout,
+            frame_encoding=self.config.frame_encoding,
+            compression=self.config.compression
+        )
+
+    @property
+    def backend_url(self) -> str:
+        """The backend WebSocket URL, including the API key if one is configured."""
+        return self._create_ws_client().connect_url
         
+    def _build_payload(self, text: str, session_id: Optional[str],
+                       history: Optional[List[Dict[str, str]]]) -> Dict[str, Any]:
+        """Builds the request payload with the conversation context that fits the token budget."""
+        payload: Dict[str, Any] = {
+            "text": text
+        }
+        recent, summary = self.context.build(text, history, session_id)
+        if recent:
+            payload["history"] = recent
+        if summary:
+            payload["summary"] = summary
+        return payload
+
+    def _use_http(self) -> bool:
+        """Whether the next request goes over HTTP."""
+        if self.config.transport == TRANSPORT_HTTP:
+            return True
+        return self.http_client is not None and time.monotonic() < self._websocket_down_until
+
+    @property
+    def active_transport(self) -> str:
+        return TRANSPORT_HTTP if self._use_http() else TRANSPORT_WEBSOCKET
+
+    def transport_stats(self) -> Dict[str, Any]:
+        """Returns the configured and current transport and the requests sent over each."""
+        return {
+            "mode": self.config.transport,
+            "active": self.active_transport,
+            "websocket_requests": self._transport_counts["websocket"],
+            "http_requests": self._transport_counts["http"],
+            "http_fallbacks": self._transport_counts["http_fallbacks"]
+        }
+
+    async def _http_frame(self, payload: Dict[str, Any], total_timeout: Optional[float]) -> Dict[str, Any]:
+        """Sends one request over HTTP and returns the backend's answer as a single frame."""
+        self._transport_counts["http"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            # requests is blocking, so it runs on the default executor
+            return await loop.run_in_executor(None, self.http_client.post_json, self.config.api_nlp_endpoint,
+                                              payload, total_timeout or self.config.http_timeout)
+        except requests.exceptions.HTTPError as e:
+            try:
+                body = e.response.json()
+            except ValueError:
+                body = None
+            # The backend reports its own failures as a JSON error, like on the websocket
+            if isinstance(body, dict) and "error" in body:
+                return body
+            raise ConnectionError(f"HTTP backend request failed: {e}") from e
+        except requests.exceptions.Timeout as e:
+            raise TimeoutError(f"HTTP backend request timed out: {e}") from e
+        except requests.exceptions.RequestException as e:
+            raise ConnectionError(f"HTTP backend request failed: {e}") from e
+
+    async def _frames(self, payload: Dict[str, Any], first_byte_timeout: Optional[float],
+                      total_timeout: Optional[float]) -> AsyncIterator[Dict[str, Any]]:
+        """Streams the backend frames of one request over the active transport."""
+        if self._use_http():
+            yield await self._http_frame(payload, total_timeout)
+            return
+
+        received = False
+        try:
+            async for frame in self._websocket_frames(payload, first_byte_timeout, total_timeout):
+                received = True
+                yield frame
+        except TimeoutError:
+            # First-byte, total and pool checkout timeouts mean a slow or busy backend, which
+            # already has the question; repeating it over HTTP would only run it twice
+            raise
+        except ConnectionError as e:
+            # Raised when no connection could be opened (connect or handshake failure); a
+            # connection closed mid-request is a ConnectionClosed and is not retried here
+            if self.http_client is None or received:
+                raise
+            # The question never reached the backend, so it can be sent over HTTP
+            self._websocket_down_until = time.monotonic() + self.config.websocket_retry_after
+            self._transport_counts["http_fallbacks"] += 1
+            logger.warning(f"WebSocket transport unavailable ({e}); using HTTP for the next "
+                           f"{self.config.websocket_retry_after:.0f}s")
+            yield await self._http_frame(payload, total_timeout)
+
+    async def _websocket_frames(self, payload: Dict[str, Any], first_byte_timeout: Optional[float],
+                                total_timeout: Optional[float]) -> AsyncIterator[Dict[str, Any]]:
+        """Streams the backend frames of one request over the websocket, hedged if enabled."""
+        self._transport_counts["websocket"] += 1
+        if self.hedge_policy.enabled:
+            async for frame in hedged_stream(self.pool, payload, self.hedge_policy,
+                                             first_byte_timeout=first_byte_timeout, total_timeout=total_timeout):
+                yield frame
+            return
+        # Check a connection out of the pool for the duration of this request
+        async with self.pool.connection() as ws_client:
+            async for frame in ws_client.stream_message(payload, first_byte_timeout, total_timeout):
+                yield frame
+
+    async def stream(self, text: str, session_id: Optional[str] = None,
+                     history: Optional[List[Dict[str, str]]] = None,
+                     first_byte_timeout: Optional[float] = None,
+                     total_timeout: Optional[float] = None) -> AsyncIterator[StreamEvent]:
+        """
+        Streams the backend's response to the user's input as it is generated.
+
+        Yields "chunk" events while the backend streams, then one "final" event,
+        or an "error" event if the request failed. The error event's data carries
+        the "status" (timeout, disconnected or error) and the "partial" text streamed
+        before the failure. Stopping iteration early (e.g. because the client
+        disconnected) cancels the request and returns the pooled connection.
+
+        Args:
+            text: The user's input text.
+            session_id: An optional session ID for maintaining context.
+            history: An optional list of previous conversation history.
+            first_byte_timeout: Seconds to wait for the first frame; defaults to the config's.
+            total_timeout: Seconds the whole response may take; defaults to the config's.
+
+        Raises:
+            CircuitOpenError: If the backend circuit breaker is open. Nothing is sent
+                to the backend then, so callers can fall back immediately.
+        """
+        if not text:
+            logger.warning("Input text is empty. Skipping processing.")
+            return
+
+        trial = self.breaker.acquire()
+        started = time.monotonic()
+        settled = False
+
+        def settle(success: Optional[bool]):
+            nonlocal settled
+            if not settled:
+                settled = True
+                self.breaker.release(trial, success, time.monotonic() - started)
+
+        payload = self._build_payload(text, session_id, history)
+        if payload_recorder.should_log(logger):
+            logger.info(f"Streaming text from NLP backend with payload: {payload}")
+
+        accumulated = []
+        try:
+            async for frame in self._frames(payload, first_byte_timeout, total_timeout):
+                frame_session_id = frame.get("session_id", session_id)
+                if "response_chunk" in frame:
+                    accumulated.append(frame["response_chunk"])
+                    yield StreamEvent("chunk", frame["response_chunk"], frame_session_id, frame)
+                elif "response" in frame:
+                    settle(True)
+                    # The final frame is authoritative: a chunk the backend failed to send leaves
+                    # a gap in the streamed text that the full response doesn't have
+                    final_text = frame["response"] or "".join(accumulated)
+                    yield StreamEvent("final", final_text, frame_session_id, frame)
+                elif "error" in frame:
+                    settle(False)
+                    yield StreamEvent("error", str(frame["error"]), frame_session_id,
+                                      {**frame, "status": RESULT_ERROR, "partial": "".join(accumulated)})
+        except Exception as e:
+            settle(False)
+            # Pool checkout and response timeouts are both TimeoutErrors
+            if isinstance(e, TimeoutError):
+                status = RESULT_TIMEOUT
+            elif isinstance(e, (ConnectionError, OSError, websockets.exceptions.ConnectionClosed)):
+                status = RESULT_DISCONNECTED
+            else:
+                status = RESULT_ERROR
+            logger.error(f"NLP backend stream ended with status '{status}' after {len(accumulated)} chunks: {e}")
+            yield StreamEvent("error", str(e), session_id,
+                              {"error": str(e), "status": status, "partial": "".join(accumulated),
+                               "exception": type(e).__name__})
+        finally:
+            # Abandoned by the consumer: free a half-open trial slot without counting it
+            settle(None)
+
+    async def stream_text(self, text: str, session_id: Optional[str] = None,
+                          history: Optional[List[Dict[str, str]]] = None) -> AsyncIterator[str]:
+        """
+        Streams only the response text, e.g. to feed TTSModule.stream_text_to_speech.
+
+        Yields the chunks as they arrive, or the whole response at once if the
+        backend did not stream it. Errors end the stream silently.
+        """
+        streamed = False
+        async for event in self.stream(text, session_id=session_id, history=history):
+            if event.type == "chunk":
+                streamed = True
+                yield event.text
+            elif event.type == "final" and not streamed:
+                yield event.text
+
+    async def _collect(self, text: str, session_id: Optional[str], history: Optional[List[Dict[str, str]]],
+                       first_byte_timeout: Optional[float], total_timeout: Optional[float]):
+        """
+        Collects the streamed events of one request into a single response.
+
+        Returns:
+            A (response, first_byte_ms, failure) tuple: the response dict as returned by
+            process_input (or None), the milliseconds until the first event, and the data
+            of the error event if the request failed in transport.
+        """
+        response = None
+        first_byte_ms = None
+        failure = None
+        started = time.perf_counter()
+        async for event in self.stream(text, session_id=session_id, history=history,
+                                       first_byte_timeout=first_byte_timeout, total_timeout=total_timeout):
+            if first_byte_ms is None and event.type != "error":
+                first_byte_ms = (time.perf_counter() - started) * 1000
+            if event.type == "final":
+                response = {**event.data, "response": event.text}
+                response.setdefault("session_id", event.session_id)
+            elif event.type == "error":
+                status = event.data.get("status", RESULT_ERROR)
+                if event.data.get("partial"):
+                    # Cut off mid-stream: return what was received so far
+                    response = {"response": event.data["partial"], "session_id": event.session_id,
+                                "partial": True, "status": status}
+                elif "exception" not in event.data:
+                    # An error frame from the backend is returned as-is
+                    response = {key: value for key, value in event.data.items() if key != "partial"}
+                else:
+                    failure = event.data
+        return response, first_byte_ms, failure
+
+    async def answer(self, text: str, session_id: Optional[str] = None,
+                     history: Optional[List[Dict[str, str]]] = None,
+                     first_byte_timeout: Optional[float] = None,
+                     total_timeout: Optional[float] = None) -> NLPResult:
+        """
+        Answers the user's input and returns the parsed result with its timing.
+
+        Unlike process_input this never synthesizes audio and never returns None:
+        transport failures come back as a result with the failure's status.
+
+        Raises:
+            CircuitOpenError: If the backend circuit breaker is open.
+        """
+        if not text:
+            logger.warning("Input text is empty. Skipping processing.")
+            return NLPResult.parse(None)
+
+        started = time.perf_counter()
+        response, first_byte_ms, failure = await self._collect(text, session_id, history,
+                                                               first_byte_timeout, total_timeout)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if response is None and failure is not None:
+            return NLPResult(failure.get("status", RESULT_ERROR), error=failure.get("error"), session_id=session_id,
+                             elapsed_ms=elapsed_ms, first_byte_ms=first_byte_ms)
+        if response is not None:
+            payload_recorder.record("response", response)
+        return NLPResult.parse(response, elapsed_ms=elapsed_ms, first_byte_ms=first_byte_ms)
+
     async def process_input(self, text: str, session_id: Optional[str] = None, history: Optional[List[Dict[str, str]]] = None, 
-                      stream_handler: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Dict[str, Any]]:
+                      stream_handler: Optional[Callable[[Dict[str, Any]], None]] = None,
+                      first_byte_timeout: Optional[float] = None,
+                      total_timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
         """
         Processes user input by calling the backend NLP service via WebSocket.
 
@@ -69,31 +484,46 @@ class NLPPipeline:
             session_id: An optional session ID for maintaining context.
             history: An optional list of previous conversation history.
             stream_handler: Optional callback function to handle streaming responses.
+            first_byte_timeout: Seconds to wait for the first frame; defaults to the config's.
+            total_timeout: Seconds the whole response may take; defaults to the config's.
 
         Returns:
             A dictionary with the structured NLP output from the backend,
-            or None if an error occurred.
+            or None if an error occurred. A response cut off by a timeout or
+            disconnect returns the text received so far, marked "partial".
+
+        Raises:
+            CircuitOpenError: If the backend circuit breaker is open.
         """
         if not text:
             logger.warning("Input text is empty. Skipping processing.")
             return None
 
-        # Payload for the WebSocket client, only containing the text.
-        payload = {
-            "text": text
-        }
+        if stream_handler:
+            # Callback-style streaming on top of the iterator API
+            latest_session_id = None
+            async for event in self.stream(text, session_id=session_id, history=history,
+                                           first_byte_timeout=first_byte_timeout, total_timeout=total_timeout):
+                latest_session_id = event.session_id or latest_session_id
+                if event.type == "chunk":
+                    stream_handler(event.data)
+                elif event.type == "final":
+                    stream_handler({**event.data, "response": event.text})
+                else:
+                    stream_handler(event.data or {"error": event.text})
+            # For streaming, the session_id is returned
+            return {"session_id": latest_session_id} if latest_session_id else None
 
-        logger.info(f"Sending text to NLP backend with payload: {json.dumps(payload, indent=2)}")
-        
-        # Await the async WebSocket call directly
-        response = await self.ws_client.send_message(payload, stream_handler=stream_handler)
-            
-        if response and not stream_handler:
-            logger.info(f"Raw response from backend: {json.dumps(response, indent=2)}")
-            logger.info("Successfully received NLP processing results from backend.")
+        response, _, _ = await self._collect(text, session_id, history, first_byte_timeout, total_timeout)
+
+        if response and "response" in response:
+            payload_recorder.record("response", response)
+            if payload_recorder.should_log(logger):
+                logger.info(f"Raw response from backend: {response}")
+            logger.debug("Successfully received NLP processing results from backend.")
             
-            # This part is for the web server, not run_inference
-            if "response" in response and self.tts_service and "audio_url" not in response:
+            # Only when a TTS service was injected; text-only callers skip synthesis
+            if "response" in response and self.tts_service and "audio_url" not in response and not response.get("partial"):
                 try:
                     # Use the new async text_to_speech_file method
                     audio_filename = f"{uuid.uuid4()}.wav" # ElevenLabs streams PCM, save as WAV
@@ -110,17 +540,51 @@ class NLPPipeline:
                     logger.error(f"Error generating audio for response: {e}")
             
             return response
-        elif stream_handler:
-            # For streaming, the ws_client returns the session_id
-            return {"session_id": response} if response else None
         else:
             logger.error("Failed to get a response from the NLP backend.")
-            return None
+            # A backend error frame is returned as the error; anything else is None
+            return response
     
+    def process_batch(self, questions: List[str], concurrency: int = 4, ordered: bool = True,
+                      max_retries: Optional[int] = None) -> BatchRun:
+        """
+        Answers many independent questions over the pooled connections.
+
+        Usage::
+
+            batch = pipeline.process_batch(questions, concurrency=8)
+            async for result in batch:
+                print(result.index, result.response)
+            print(batch.stats.to_dict())
+
+        Args:
+            questions: The questions, in input order.
+            concurrency: Questions of this batch in flight at once. All batches together
+                never exceed the batch max_in_flight limit from config.yaml.
+            ordered: Yield results in input order instead of as they complete.
+            max_retries: Retries per question; defaults to the configured value.
+
+        Returns:
+            A BatchRun yielding a BatchResult (with the original index) per question.
+        """
+        if self._batch_slots is None:
+            self._batch_slots = asyncio.Semaphore(self.config.batch_max_in_flight)
+        return BatchRun(
+            self.process_input,
+            questions,
+            concurrency=concurrency,
+            ordered=ordered,
+            max_retries=self.config.batch_max_retries if max_retries is None else max_retries,
+            retry_backoff=self.config.batch_retry_backoff,
+            slots=self._batch_slots
+        )
+
     async def close(self):
-        """Gracefully closes the WebSocket connection."""
+        """Gracefully closes the pooled WebSocket and HTTP connections."""
         try:
-            await self.ws_client.close()
+            await self.pool.close()
+            if self.http_client is not None:
+                self.http_client.close()
             logger.info("NLP Pipeline resources cleaned up successfully.")
         except Exception as e:
             logger.error(f"Error during NLP pipeline cleanup: {e}")
@@ -135,7 +599,7 @@ async def main():
     # with API_GATEWAY_URL and API_GATEWAY_KEY for this to work.
     try:
         nlp_config = NLPConfig.from_yaml()
-        pipeline = NLPPipeline(config=nlp_config) # TTS service is now initialized internally
+        pipeline = NLPPipeline(config=nlp_config) # Text-only; pass tts_service=TTSModule(...) for audio
         
         # Example of processing user input with streaming
         def handle_stream(chunk):
@@ -150,6 +614,11 @@ async def main():
         result = await pipeline.process_input(user_query, session_id="test-session-123", stream_handler=handle_stream)
         print(f"Result: {result}")
 
+        # The same request consumed as an async iterator
+        async for event in pipeline.stream(user_query, session_id="test-session-123"):
+            print(f"{event.type}: {event.text}")
+        await pipeline.close()
+
     except (FileNotFoundError, ValueError) as e:
         logger.error(f"Failed to initialize NLP pipeline: {e}")
 
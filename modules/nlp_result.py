@@ -0,0 +1,131 @@
+"""
+Typed result of one NLP backend request.
+
+The backend reply arrives as a dict that is either a websocket frame
+({"response": ...} or {"error": ...}) or a Lambda proxy response with a
+statusCode and a JSON string body. NLPResult.parse decodes it once, including
+the nested body, so the fallback decision, the answer text and logging all
+read the same small object instead of re-inspecting and re-decoding the dict.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+from modules import json_codec
+
+logger = logging.getLogger(__name__)
+
+# Result statuses; the transport failures match the websocket client's outcomes
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_DISCONNECTED = "disconnected"
+STATUS_ERROR = "error"
+STATUS_EMPTY = "empty"  # No reply at all
+STATUS_INVALID = "invalid"  # A reply without an answer or an error
+
+
+class NLPResult:
+    """
+    The parsed outcome of a backend request.
+
+    Attributes:
+        status: One of the STATUS_* values. A partial answer keeps the status of
+            the failure that cut it off.
+        text: The answer text, or None if there is none.
+        error: The backend's or transport's error message, if any.
+        error_description: User-presentable detail sent with a backend error, if any.
+        session_id: The backend session id.
+        partial: Whether text is only the part received before a failure.
+        elapsed_ms: Time the request took, if measured.
+        first_byte_ms: Time until the first frame arrived, if measured.
+        data: The original reply dict, for fields not parsed here (e.g. audio_url).
+    """
+
+    __slots__ = ("status", "text", "error", "error_description", "session_id", "partial",
+                 "elapsed_ms", "first_byte_ms", "data")
+
+    def __init__(self, status: str, text: Optional[str] = None, error: Optional[str] = None,
+                 error_description: Optional[str] = None, session_id: Optional[str] = None,
+                 partial: bool = False, elapsed_ms: Optional[float] = None,
+                 first_byte_ms: Optional[float] = None, data: Optional[Dict[str, Any]] = None):
+        self.status = status
+        self.text = text
+        self.error = error
+        self.error_description = error_description
+        self.session_id = session_id
+        self.partial = partial
+        self.elapsed_ms = elapsed_ms
+        self.first_byte_ms = first_byte_ms
+        self.data = data
+
+    def __repr__(self) -> str:
+        text = self.text if self.text is None or len(self.text) <= 40 else self.text[:40] + "..."
+        return (f"NLPResult(status={self.status!r}, text={text!r}, error={self.error!r}, "
+                f"partial={self.partial}, elapsed_ms={self.elapsed_ms})")
+
+    @property
+    def ok(self) -> bool:
+        """Whether the backend returned a complete answer."""
+        return self.status == STATUS_OK and self.text is not None
+
+    @property
+    def has_answer(self) -> bool:
+        """Whether there is answer text to show, complete or partial."""
+        return self.text is not None
+
+    @classmethod
+    def parse(cls, nlp_data: Optional[Dict[str, Any]], elapsed_ms: Optional[float] = None,
+              first_byte_ms: Optional[float] = None) -> "NLPResult":
+        """
+        Parses a backend reply, decoding a nested JSON body at most once.
+
+        Args:
+            nlp_data: The reply dict returned by NLPPipeline.process_input, or None.
+            elapsed_ms: Optional request duration to attach.
+            first_byte_ms: Optional time to first frame to attach.
+        """
+        if isinstance(nlp_data, NLPResult):
+            return nlp_data
+        if not nlp_data:
+            return cls(STATUS_EMPTY, elapsed_ms=elapsed_ms, first_byte_ms=first_byte_ms)
+
+        result = cls(STATUS_INVALID, session_id=nlp_data.get("session_id"), elapsed_ms=elapsed_ms,
+                     first_byte_ms=first_byte_ms, data=nlp_data)
+        body = nlp_data.get("body")
+        if isinstance(body, str) and body:
+            try:
+                body = json_codec.loads(body)
+            except json_codec.DecodeError:
+                logger.error("Failed to parse the 'body' string as JSON.")
+                body = None
+        if not isinstance(body, dict):
+            body = None
+
+        if "statusCode" in nlp_data and nlp_data["statusCode"] != 200:
+            result.status = STATUS_ERROR
+            result.error = f"HTTP {nlp_data['statusCode']}"
+            if body is not None and "error" in body:
+                result.error = str(body["error"])
+                result.error_description = body.get("error_description") or "Please try again later."
+            return result
+
+        if "response" in nlp_data:
+            result.text = nlp_data["response"]
+            result.partial = bool(nlp_data.get("partial"))
+            result.status = nlp_data.get("status", STATUS_OK) if result.partial else STATUS_OK
+        elif body is not None and "response" in body:
+            result.text = body["response"]
+            result.status = STATUS_OK
+            result.session_id = result.session_id or body.get("session_id")
+        elif body is not None and "error" in body:
+            result.status = STATUS_ERROR
+            result.error = str(body["error"])
+            result.error_description = body.get("error_description") or "Please try again later."
+        elif "error" in nlp_data:
+            result.status = nlp_data.get("status", STATUS_ERROR)
+            result.error = str(nlp_data["error"])
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the parsed fields, e.g. for logging or JSON responses."""
+        return {name: getattr(self, name) for name in self.__slots__ if name != "data"}
@@ -0,0 +1,143 @@
+"""
+Payload logging for the hot path.
+
+Logging every frame and response in full costs CPU for formatting and floods
+log storage. Instead, payloads are appended unformatted to an in-memory ring
+buffer of recent traffic, and only a small sample of them is written to the
+log. The buffer is formatted on demand: when a request fails, or through the
+/api/debug/payloads endpoint.
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PayloadLogConfig:
+    """Configuration for payload logging, loaded from config.yaml."""
+    capacity: int = 200
+    sample_rate: float = 0.01
+    max_payload_chars: int = 4000
+    dump_on_error: bool = True
+
+    @classmethod
+    def from_yaml(cls, config_path: str = "config/config.yaml") -> "PayloadLogConfig":
+        """Loads configuration from a YAML file."""
+        try:
+            with open(config_path, "r") as f:
+                config = yaml.safe_load(f)
+        except FileNotFoundError:
+            logger.warning(f"Config file not found at {config_path}, using defaults")
+            return cls()
+
+        payload_config = config.get("logging", {}).get("payloads", {})
+        return cls(
+            capacity=payload_config.get("capacity", 200),
+            sample_rate=payload_config.get("sample_rate", 0.01),
+            max_payload_chars=payload_config.get("max_payload_chars", 4000),
+            dump_on_error=payload_config.get("dump_on_error", True)
+        )
+
+
+class PayloadRecorder:
+    """
+    A bounded ring buffer of recent payloads plus a sampling gate for logging them.
+
+    record() only stores a reference (dicts are shallow-copied), so it is cheap
+    enough for every frame; all formatting is deferred until the buffer is read.
+    """
+
+    def __init__(self, config: Optional[PayloadLogConfig] = None):
+        self._lock = threading.Lock()
+        self.configure(config or PayloadLogConfig())
+
+    def configure(self, config: PayloadLogConfig):
+        """Applies a configuration, keeping the most recent entries that still fit."""
+        with self._lock:
+            previous = list(getattr(self, "_entries", ()))
+            self.config = config
+            self._entries: deque = deque(previous, maxlen=max(config.capacity, 1))
+
+    def record(self, kind: str, payload: Any, request_id: Optional[str] = None):
+        """
+        Appends a payload to the ring buffer.
+
+        Args:
+            kind: What the payload is, e.g. "sent", "received", "response", "transcription".
+            payload: The payload itself; it is not formatted here.
+            request_id: Optional id used to find the entries of one request later.
+        """
+        if isinstance(payload, dict):
+            payload = dict(payload)
+        entry = (time.time(), kind, request_id, payload)
+        with self._lock:
+            self._entries.append(entry)
+
+    def should_log(self, log: logging.Logger) -> bool:
+        """
+        Whether a payload should be written to the given logger now.
+
+        True for every call when the logger is at DEBUG, for a sample_rate fraction
+        of calls at INFO, and never otherwise. Guard payload formatting with it.
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            return True
+        return log.isEnabledFor(logging.INFO) and random.random() < self.config.sample_rate
+
+    def recent(self, limit: int = 50, request_id: Optional[str] = None,
+               kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the most recent entries, oldest first, formatted for display."""
+        with self._lock:
+            entries = list(self._entries)
+        if request_id is not None:
+            entries = [entry for entry in entries if entry[2] == request_id]
+        if kind is not None:
+            entries = [entry for entry in entries if entry[1] == kind]
+        return [self._format(entry) for entry in entries[-limit:]] if limit > 0 else []
+
+    def _format(self, entry) -> Dict[str, Any]:
+        timestamp, kind, request_id, payload = entry
+        if isinstance(payload, bytes):
+            payload = f"<{len(payload)} bytes>"
+        elif not isinstance(payload, str):
+            payload = repr(payload)
+        if len(payload) > self.config.max_payload_chars:
+            payload = payload[:self.config.max_payload_chars] + f"... ({len(payload)} chars)"
+        return {"time": timestamp, "kind": kind, "request_id": request_id, "payload": payload}
+
+    def dump_to_log(self, log: logging.Logger, reason: str, request_id: Optional[str] = None, limit: int = 20):
+        """Writes the recent entries (of one request, if given) to the log at WARNING."""
+        if not self.config.dump_on_error or not log.isEnabledFor(logging.WARNING):
+            return
+        entries = self.recent(limit, request_id=request_id)
+        lines = [f"{entry['kind']} [{entry['request_id']}] {entry['payload']}" for entry in entries]
+        log.warning(f"{reason}; last {len(entries)} payloads:\n" + "\n".join(lines))
+
+    def clear(self):
+        """Drops all buffered entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns buffer occupancy and settings."""
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "size": size,
+            "capacity": self._entries.maxlen,
+            "sample_rate": self.config.sample_rate
+        }
+
+
+# Process-wide recorder shared by the websocket client, NLP pipeline and ASR;
+# the server configures it from config.yaml at startup
+payload_recorder = PayloadRecorder()
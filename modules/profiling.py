@@ -0,0 +1,229 @@
+"""
+On-demand profiling for the web server.
+
+RequestProfiler wraps the Flask WSGI app only while a profiling session is
+armed, so there is no per-request cost when profiling is off. An armed session
+records a deterministic cProfile of each request (downloadable as pstats) and a
+sampled stack profile of the request threads (downloadable as collapsed stacks
+for flamegraph tools). AllocationTracker exposes tracemalloc snapshot diffs.
+"""
+
+import io
+import sys
+import time
+import cProfile
+import logging
+import pstats
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RequestProfiler:
+    """
+    Profiles the next N requests or all requests within a time window.
+    """
+
+    def __init__(self, app=None):
+        self.app = app
+        self._lock = threading.Lock()
+        self._original_wsgi_app = None
+        self._stats: Optional[pstats.Stats] = None
+        self._collapsed: Counter = Counter()
+        self._active_threads = set()
+        self._sampler: Optional[threading.Thread] = None
+        self._remaining_requests: Optional[int] = None
+        self._deadline: Optional[float] = None
+        self._sample_interval = 0.005
+        self.profiled_requests = 0
+        self.skipped_requests = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+    def init_app(self, app):
+        """Binds the profiler to a Flask app."""
+        self.app = app
+
+    @property
+    def active(self) -> bool:
+        return self._original_wsgi_app is not None
+
+    def start(self, max_requests: Optional[int] = None, seconds: Optional[float] = None,
+              sample_interval_ms: float = 5.0):
+        """
+        Arms a profiling session, discarding the results of the previous one.
+
+        Args:
+            max_requests: Stop after this many requests have been profiled.
+            seconds: Stop after this many seconds.
+            sample_interval_ms: Interval of the stack sampler in milliseconds.
+        """
+        if not max_requests and not seconds:
+            raise ValueError("Either max_requests or seconds must be set")
+
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profiling session is already running")
+            self._stats = None
+            self._collapsed = Counter()
+            self._remaining_requests = max_requests
+            self._deadline = time.monotonic() + seconds if seconds else None
+            self._sample_interval = max(sample_interval_ms, 1.0) / 1000
+            self.profiled_requests = 0
+            self.skipped_requests = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+
+            self._original_wsgi_app = self.app.wsgi_app
+            self.app.wsgi_app = self._profiled_wsgi_app
+            self._sampler = threading.Thread(target=self._sample_stacks, name="profiler-sampler", daemon=True)
+            self._sampler.start()
+        logger.warning(f"Profiling armed (requests={max_requests}, seconds={seconds})")
+
+    def stop(self):
+        """Disarms the current session and restores the unwrapped WSGI app."""
+        with self._lock:
+            if not self.active:
+                return
+            self.app.wsgi_app = self._original_wsgi_app
+            self._original_wsgi_app = None
+            self.stopped_at = time.time()
+        logger.warning(f"Profiling stopped after {self.profiled_requests} requests")
+
+    def _expired(self) -> bool:
+        if self._remaining_requests is not None and self._remaining_requests <= 0:
+            return True
+        return self._deadline is not None and time.monotonic() >= self._deadline
+
+    def _profiled_wsgi_app(self, environ, start_response):
+        original_wsgi_app = self._original_wsgi_app
+        if original_wsgi_app is None:
+            # Disarmed between dispatch and this call
+            return self.app.wsgi_app(environ, start_response)
+
+        with self._lock:
+            if self._remaining_requests is not None:
+                self._remaining_requests -= 1
+
+        profile = cProfile.Profile()
+        thread_id = threading.get_ident()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this interpreter
+            self.skipped_requests += 1
+            return original_wsgi_app(environ, start_response)
+
+        self._active_threads.add(thread_id)
+        try:
+            return original_wsgi_app(environ, start_response)
+        finally:
+            profile.disable()
+            self._active_threads.discard(thread_id)
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+                self.profiled_requests += 1
+            if self._expired():
+                self.stop()
+
+    def _sample_stacks(self):
+        """Samples the stacks of threads currently serving profiled requests."""
+        while self.active:
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                self.stop()
+                break
+            frames = sys._current_frames()
+            for thread_id in list(self._active_threads):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._collapsed[";".join(reversed(stack))] += 1
+            time.sleep(self._sample_interval)
+
+    def status(self) -> Dict[str, Any]:
+        """Returns a summary of the current or last session."""
+        return {
+            "active": self.active,
+            "profiled_requests": self.profiled_requests,
+            "skipped_requests": self.skipped_requests,
+            "remaining_requests": self._remaining_requests,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "samples": sum(self._collapsed.values())
+        }
+
+    def dump_pstats(self, path: str) -> bool:
+        """Writes the aggregated cProfile stats in pstats format. Returns False if there are none."""
+        with self._lock:
+            if self._stats is None:
+                return False
+            self._stats.dump_stats(path)
+        return True
+
+    def collapsed_stacks(self) -> str:
+        """Returns the sampled stacks in collapsed format ("frame;frame;frame count")."""
+        return "".join(f"{stack} {count}\n" for stack, count in self._collapsed.most_common())
+
+    def summary(self, limit: int = 30) -> str:
+        """Returns a human-readable cumulative-time summary of the cProfile stats."""
+        with self._lock:
+            if self._stats is None:
+                return ""
+            output = io.StringIO()
+            self._stats.stream = output
+            self._stats.sort_stats("cumulative").print_stats(limit)
+        return output.getvalue()
+
+
+class AllocationTracker:
+    """
+    Thin wrapper around tracemalloc for allocation diffs between two points in time.
+    """
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10):
+        """Starts tracing allocations and takes the baseline snapshot."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+        logger.warning(f"tracemalloc started with {frames} frames")
+
+    def snapshot(self):
+        """Replaces the baseline with a fresh snapshot."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running")
+        self._baseline = tracemalloc.take_snapshot()
+
+    def diff(self, limit: int = 25, key_type: str = "lineno") -> str:
+        """Returns the top allocation differences between the baseline and now."""
+        if not tracemalloc.is_tracing() or self._baseline is None:
+            raise RuntimeError("tracemalloc is not running")
+        current = tracemalloc.take_snapshot()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        stats = current.filter_traces(filters).compare_to(self._baseline.filter_traces(filters), key_type)
+        traced, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced={traced} peak={peak}"]
+        lines.extend(str(stat) for stat in stats[:limit])
+        return "\n".join(lines) + "\n"
+
+    def stop(self):
+        """Stops tracing and drops the baseline."""
+        tracemalloc.stop()
+        self._baseline = None
+        logger.warning("tracemalloc stopped")
@@ -1,63 +1,47 @@
 # Logic for generating or retrieving responses. 
 
 import logging
-from typing import Dict, Any, Optional
-import json
+from typing import Dict, Any, Union
+
+from modules.nlp_result import NLPResult, STATUS_EMPTY, STATUS_ERROR
 
 logger = logging.getLogger(__name__)
 
 class ResponseGenerator:
     """
-    Extracts the final user-facing response from the backend's JSON output.
+    Extracts the final user-facing response from the backend's output.
     """
     def __init__(self):
         """Initializes the ResponseGenerator."""
         logger.info("ResponseGenerator initialized.")
 
-    def get_final_answer(self, nlp_data: Optional[Dict[str, Any]]) -> str:
+    def get_final_answer(self, nlp_data: Union[NLPResult, Dict[str, Any], None]) -> str:
         """
-        Parses the NLP data to find the final response text.
+        Finds the final response text in the NLP result.
 
         Args:
-            nlp_data: The full JSON response from the backend.
+            nlp_data: The parsed NLPResult, or the raw backend reply (parsed here).
 
         Returns:
             A user-facing string response, or a fallback message.
         """
-        if not nlp_data:
+        result = NLPResult.parse(nlp_data)
+
+        if result.status == STATUS_EMPTY:
             logger.warning("NLP data is empty. Returning a fallback response.")
             return "I'm sorry, I'm having trouble understanding. Could you please rephrase?"
 
+        # The answer, or the part of it received before the stream was cut off
+        if result.has_answer:
+            return result.text
+
         # Check for error responses from the API
-        if "statusCode" in nlp_data and nlp_data["statusCode"] != 200:
-            if "body" in nlp_data and isinstance(nlp_data["body"], str):
-                try:
-                    body_data = json.loads(nlp_data["body"])
-                    if "error" in body_data:
-                        logger.error(f"Backend API error: {body_data['error']}")
-                        return f"I'm sorry, I'm experiencing a technical issue. {body_data.get('error_description', 'Please try again later.')}"
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse error body: {nlp_data['body']}")
-            
+        if result.status == STATUS_ERROR:
+            logger.error(f"Backend API error: {result.error}")
+            if result.error_description:
+                return f"I'm sorry, I'm experiencing a technical issue. {result.error_description}"
             return "I'm sorry, I'm experiencing a technical issue right now. Please try again later."
 
-        # The backend response might have the final answer in a 'response' key
-        # or it could be nested inside a JSON string in the 'body'.
-        
-        if "response" in nlp_data:
-            return nlp_data["response"]
-            
-        if "body" in nlp_data and isinstance(nlp_data["body"], str):
-            try:
-                body_data = json.loads(nlp_data["body"])
-                if "response" in body_data:
-                    return body_data["response"]
-                elif "error" in body_data:
-                    logger.error(f"Error in body: {body_data['error']}")
-                    return f"I'm sorry, I'm experiencing a technical issue. {body_data.get('error_description', 'Please try again later.')}"
-            except json.JSONDecodeError:
-                logger.error("Failed to parse the 'body' string as JSON.")
-                
         logger.warning("Could not find a 'response' key in the backend output.")
         return "I found some information, but I'm having trouble formulating a response. Please try asking in a different way."
 
@@ -61,6 +61,16 @@ class TTSModule:
         # Set supported languages
         self.elevenlabs_client.supported_languages = self.config.languages
         logger.info(f"TTS Module initialized successfully with ElevenLabs. Languages: {', '.join(self.config.languages)}")
+
+    def _session_client(self) -> ElevenLabsWebSocketClient:
+        """A client for one TTS session; a client holds a single websocket, so concurrent syntheses can't share one."""
+        client = ElevenLabsWebSocketClient(
+            api_key=self.config.elevenlabs_api_key,
+            voice_id=self.config.voice_id,
+            model_id=self.config.model_id
+        )
+        client.supported_languages = self.config.languages
+        return client
         
     async def stream_text_to_speech(self, text_stream: AsyncGenerator[str, None]) -> AsyncGenerator[bytes, None]:
         """
@@ -73,7 +83,7 @@ class TTSModule:
             An async generator yielding audio chunks (bytes).
         """
         logger.info("Starting ElevenLabs TTS streaming.")
-        async for audio_chunk in self.elevenlabs_client.stream_tts(text_stream):
+        async for audio_chunk in self._session_client().stream_tts(text_stream):
             yield audio_chunk
 
     async def text_to_speech_file(self, text: str, output_filepath: Optional[str] = None) -> Optional[str]:
@@ -104,7 +114,7 @@ class TTSModule:
                 yield text
 
             audio_data_buffer = b''
-            async for chunk in self.elevenlabs_client.stream_tts(single_text_generator()):
+            async for chunk in self._session_client().stream_tts(single_text_generator()):
                 audio_data_buffer += chunk
 
             # Save as .wav since ElevenLabs streaming returns raw PCM
@@ -131,4 +131,23 @@ def format_time_ms(milliseconds):
     
     minutes = seconds / 60
     seconds_remainder = seconds % 60
-    return f"{int(minutes)}m {seconds_remainder:.2f}s"
\ No newline at end of file
+    return f"{int(minutes)}m {seconds_remainder:.2f}s"
+
+def percentile(values, pct):
+    """Compute a percentile of a sequence using linear interpolation.
+    
+    Args:
+        values (Iterable[float]): Sample values
+        pct (float): Percentile to compute, between 0 and 100
+        
+    Returns:
+        float: The percentile, or None if there are no values
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
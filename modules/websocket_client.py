@@ -3,50 +3,364 @@ WebSocket Client for connecting to AWS API Gateway WebSocket API.
 This module provides a client to interact with the P2P Lending Voice AI Assistant backend via WebSockets.
 """
 
-import json
 import logging
 import os
 import asyncio
 import websockets
+import websockets.exceptions
+import random
 import re
+import time
 import uuid
-from typing import Dict, Any, Optional, List, Callable, Union
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, Union, AsyncIterator
+
+from modules import json_codec
+from modules.payload_log import payload_recorder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Frame encodings the client can ask the backend to reply in. Requests always go
+# upstream as JSON text, because API Gateway selects the route from the JSON body.
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# Short keys used by the backend in msgpack frames, and the keys they stand for
+FRAME_KEYS = {
+    "r": "response",
+    "c": "response_chunk",
+    "e": "error",
+    "s": "session_id",
+    "i": "request_id",
+    "q": "seq",
+}
+
+# Outcomes of a request
+RESULT_OK = "ok"
+RESULT_TIMEOUT = "timeout"
+RESULT_DISCONNECTED = "disconnected"
+RESULT_ERROR = "error"
+RESULT_CANCELLED = "cancelled"
+
+
+class ResponseTimeoutError(TimeoutError):
+    """Raised when the backend doesn't respond within the first-byte or total timeout."""
+
+    def __init__(self, message: str, first_byte: bool = False):
+        super().__init__(message)
+        self.first_byte = first_byte
+
+
+class RequestCancelledError(Exception):
+    """Raised when a request is cancelled through its cancel_event."""
+
+
+@dataclass
+class MessageResult:
+    """
+    Outcome of one backend request.
+
+    status is one of the RESULT_* constants. text holds the complete response
+    when status is RESULT_OK, and whatever had been streamed so far otherwise
+    (partial is then True if any text arrived).
+    """
+    status: str
+    text: str = ""
+    session_id: Optional[str] = None
+    data: Optional[Dict[str, Any]] = None  # The backend's final frame, if one arrived
+    error: Optional[str] = None
+    partial: bool = False
+    chunks: int = 0
+    first_byte_ms: Optional[float] = None
+    elapsed_ms: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status == RESULT_OK
+
+    def to_response(self) -> Optional[Dict[str, Any]]:
+        """
+        Converts the result into the response dict returned by send_message.
+
+        A failed request that had streamed some text is returned as that text,
+        marked with "partial" and the "status"; a backend error frame is returned
+        as-is; anything else that failed is None.
+        """
+        if self.ok:
+            response = dict(self.data or {})
+            response["response"] = self.text
+            if self.session_id and "session_id" not in response:
+                response["session_id"] = self.session_id
+            return response
+        if self.text:
+            return {"response": self.text, "session_id": self.session_id, "partial": True, "status": self.status}
+        if self.status == RESULT_ERROR and self.data:
+            return self.data
+        return None
+
+
 class WebSocketClient:
-    """A client for making WebSocket connections to the API Gateway."""
+    """
+    A client for making WebSocket connections to the API Gateway.
+
+    Every request carries a request_id that the backend echoes in each frame it
+    sends back. A reader task routes incoming frames to the queue of the request
+    they belong to, so one connection can carry several requests at once. Until
+    the backend has shown that it echoes request ids, the connection is treated
+    as single-request (see ``capacity``).
+    """
 
-    def __init__(self, base_url: str, api_key: str = None, tts_service=None):
+    def __init__(self, base_url: str, api_key: str = None, tts_service=None,
+                 heartbeat_interval: float = 30.0, heartbeat_timeout: float = 10.0,
+                 idle_timeout: float = 540.0, max_reconnect_attempts: int = 5,
+                 reconnect_backoff: float = 0.5, reconnect_backoff_max: float = 10.0,
+                 max_in_flight: int = 4, max_buffered_frames: int = 1000,
+                 first_byte_timeout: Optional[float] = 15.0, total_timeout: Optional[float] = 60.0,
+                 frame_encoding: str = ENCODING_MSGPACK, compression: Optional[str] = "deflate"):
         if not base_url:
             raise ValueError("API base_url cannot be empty.")
         self.base_url = base_url
         self.api_key = api_key
         self.connection = None
         self.tts_service = tts_service  # TTS service for generating audio
+        # Connection health tracking
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.idle_timeout = idle_timeout  # API Gateway drops connections idle for 10 minutes
+        self.max_reconnect_attempts = max_reconnect_attempts
+        self.reconnect_backoff = reconnect_backoff
+        self.reconnect_backoff_max = reconnect_backoff_max
+        self.last_activity = 0.0
+        self.last_heartbeat_latency_ms: Optional[float] = None
+        self.reconnects = 0
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+        # Request multiplexing
+        self.max_in_flight = max_in_flight
+        self.max_buffered_frames = max_buffered_frames
+        self.multiplexing: Optional[bool] = None  # Unknown until the first response arrives
+        self._pending: Dict[str, asyncio.Queue] = {}
+        self._reader_task: Optional[asyncio.Task] = None
+        # Wire format: binary frames are only requested if msgpack is installed, and
+        # permessage-deflate is only used if the server accepts it in the handshake
+        if frame_encoding == ENCODING_MSGPACK and msgpack is None:
+            logger.warning("msgpack is not installed, falling back to JSON frames")
+            frame_encoding = ENCODING_JSON
+        self.frame_encoding = frame_encoding
+        self.compression = compression
+        self.binary_frames = 0
+        self.text_frames = 0
+        # Default per-request timeouts; None waits without limit
+        self.first_byte_timeout = first_byte_timeout
+        self.total_timeout = total_timeout
         logger.info(f"WebSocketClient initialized for base URL: {self.base_url}")
 
+    @property
+    def connect_url(self) -> str:
+        """The URL to connect to, including the API key if one is configured."""
+        # The websockets library doesn't support extra_headers in connect
+        # Instead, we'll add the API key as a query parameter if needed
+        connect_url = self.base_url
+        if self.api_key:
+            if "?" in connect_url:
+                connect_url += f"&api-key={self.api_key}"
+            else:
+                connect_url += f"?api-key={self.api_key}"
+        return connect_url
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the underlying socket is open."""
+        if self.connection is None:
+            return False
+        is_open = getattr(self.connection, "open", None)
+        if is_open is not None:
+            return is_open
+        # websockets >= 14 exposes the protocol state instead of .open
+        from websockets.protocol import State
+        return self.connection.state is State.OPEN
+
+    @property
+    def is_idle(self) -> bool:
+        """Whether the connection has been idle long enough that API Gateway may have dropped it."""
+        return time.monotonic() - self.last_activity >= self.idle_timeout
+
+    @property
+    def is_healthy(self) -> bool:
+        """Whether the connection can be used without reconnecting first."""
+        return self.is_open and not self.is_idle
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests currently waiting for frames on this connection."""
+        return len(self._pending)
+
+    @property
+    def capacity(self) -> int:
+        """How many requests may share this connection at once."""
+        return self.max_in_flight if self.multiplexing else 1
+
     async def connect(self):
         """Establishes a WebSocket connection to the API Gateway."""
         try:
-            # The websockets library doesn't support extra_headers in connect
-            # Instead, we'll add the API key as a query parameter if needed
-            connect_url = self.base_url
-            if self.api_key:
-                if "?" in connect_url:
-                    connect_url += f"&api-key={self.api_key}"
-                else:
-                    connect_url += f"?api-key={self.api_key}"
-            
-            self.connection = await websockets.connect(connect_url)
+            # Keepalive is handled by our own heartbeat so that its health is tracked
+            self.connection = await websockets.connect(self.connect_url, ping_interval=None,
+                                                       compression=self.compression)
+            self.last_activity = time.monotonic()
+            self._reader_task = asyncio.ensure_future(self._read_frames(self.connection))
+            self._start_heartbeat()
             logger.info("WebSocket connection established")
             return True
         except Exception as e:
             logger.error(f"Failed to establish WebSocket connection: {e}")
             return False
 
+    async def ensure_connected(self) -> bool:
+        """
+        Makes sure there is a healthy connection, reconnecting with exponential
+        backoff and jitter if the current one is closed or has gone idle.
+
+        Returns:
+            True if a healthy connection is available.
+        """
+        if self.is_healthy:
+            return True
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.is_healthy:
+                return True
+            if self.connection is not None:
+                reason = "idle" if self.is_open else "closed"
+                logger.info(f"WebSocket connection is {reason}, reconnecting")
+                await self._drop_connection()
+                self.reconnects += 1
+
+            for attempt in range(self.max_reconnect_attempts):
+                if await self.connect():
+                    return True
+                if attempt < self.max_reconnect_attempts - 1:
+                    # Full jitter keeps many clients from reconnecting in lockstep
+                    delay = random.uniform(0, min(self.reconnect_backoff_max, self.reconnect_backoff * 2 ** attempt))
+                    logger.warning(f"Reconnect attempt {attempt + 1}/{self.max_reconnect_attempts} failed, retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+            logger.error(f"Could not reconnect after {self.max_reconnect_attempts} attempts")
+            return False
+
+    def _start_heartbeat(self):
+        if self.heartbeat_interval and (self._heartbeat_task is None or self._heartbeat_task.done()):
+            self._heartbeat_task = asyncio.ensure_future(self._heartbeat())
+
+    async def _heartbeat(self):
+        """Periodically pings the backend and drops the connection if it stops answering."""
+        try:
+            while self.is_open:
+                await asyncio.sleep(self.heartbeat_interval)
+                if not self.is_open:
+                    break
+                started = time.perf_counter()
+                try:
+                    pong_waiter = await self.connection.ping()
+                    await asyncio.wait_for(pong_waiter, self.heartbeat_timeout)
+                    self.last_heartbeat_latency_ms = (time.perf_counter() - started) * 1000
+                except Exception as e:
+                    logger.warning(f"WebSocket heartbeat failed ({e}), dropping connection")
+                    await self._drop_connection()
+                    break
+        except asyncio.CancelledError:
+            pass
+
+    async def _read_frames(self, connection):
+        """Routes every frame received on the connection to the request it belongs to."""
+        try:
+            while True:
+                response_data = await connection.recv()
+                self.last_activity = time.monotonic()
+                try:
+                    response = self._decode_frame(response_data)
+                except Exception:
+                    logger.warning("Dropping undecodable frame from backend")
+                    continue
+                self._route_frame(response)
+        except websockets.exceptions.ConnectionClosed as e:
+            self._fail_pending(e)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"WebSocket reader failed: {e}")
+            self._fail_pending(e)
+
+    def _decode_frame(self, response_data: Union[str, bytes]) -> Dict[str, Any]:
+        """Decodes a backend frame: binary frames are msgpack with short keys, text frames are JSON."""
+        if isinstance(response_data, bytes) and not response_data.startswith(b"{"):
+            if msgpack is None:
+                raise ValueError("Received a binary frame but msgpack is not installed")
+            self.binary_frames += 1
+            unpacked = msgpack.unpackb(response_data, raw=False)
+            response = {FRAME_KEYS.get(key, key): value for key, value in unpacked.items()}
+        else:
+            # Text frames, and JSON that arrived as a binary frame
+            self.text_frames += 1
+            response = json_codec.loads(response_data)
+        payload_recorder.record("received", response, response.get("request_id"))
+        if payload_recorder.should_log(logger):
+            logger.info(f"Received frame from WebSocket: {response}")
+        return response
+
+    def _route_frame(self, response: Dict[str, Any]):
+        request_id = response.pop("request_id", None)
+        if request_id is not None:
+            self.multiplexing = True
+            queue = self._pending.get(request_id)
+            if queue is None:
+                # The request was cancelled or timed out; its late frames are dropped
+                logger.debug(f"Dropping frame for finished request {request_id}")
+                return
+            if queue.qsize() >= self.max_buffered_frames:
+                # Never block the shared reader on one slow consumer; end its stream instead
+                logger.warning(f"Consumer of request {request_id} fell behind, ending its stream")
+                del self._pending[request_id]
+                queue.put_nowait({"error": "Stream consumer fell too far behind"})
+                return
+            queue.put_nowait(response)
+        elif len(self._pending) == 1:
+            # A backend that doesn't echo request ids; only safe with one request in flight
+            if self.multiplexing is None:
+                logger.info("Backend does not echo request ids; using one request per connection")
+            self.multiplexing = False
+            next(iter(self._pending.values())).put_nowait(response)
+        else:
+            logger.warning(f"Dropping frame without request_id with {len(self._pending)} requests in flight")
+
+    def _fail_pending(self, error: BaseException):
+        """Wakes every waiting request with the error that ended the connection."""
+        for queue in self._pending.values():
+            queue.put_nowait(error)
+
+    async def _drop_connection(self):
+        """Closes the current connection, ignoring errors from an already dead socket."""
+        heartbeat_task, self._heartbeat_task = self._heartbeat_task, None
+        if heartbeat_task and heartbeat_task is not asyncio.current_task():
+            heartbeat_task.cancel()
+        reader_task, self._reader_task = self._reader_task, None
+        if reader_task and not reader_task.done():
+            reader_task.cancel()
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                await connection.close()
+            except Exception:
+                pass
+        self._fail_pending(websockets.exceptions.ConnectionClosedError(None, None))
+
     def _chunk_text(self, text: str, chunk_size: int = 10) -> List[str]:
         """
         Break down a large text into smaller chunks for smoother streaming.
@@ -81,108 +395,262 @@ class WebSocketClient:
         
         return chunks
 
-    async def send_message(self, message: Dict[str, Any], stream_handler: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Union[Dict[str, Any], str]]:
+    async def _next_frame(self, queue: asyncio.Queue, deadline: Optional[float],
+                          cancel_event: Optional[asyncio.Event], first_byte: bool):
+        """
+        Waits for the next frame of a request.
+
+        Raises:
+            ResponseTimeoutError: If the deadline passes first.
+            RequestCancelledError: If cancel_event is set first.
+        """
+        if cancel_event is not None and cancel_event.is_set():
+            raise RequestCancelledError("Request cancelled")
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        phase = "first response frame" if first_byte else "response"
+
+        if cancel_event is None:
+            try:
+                return await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                raise ResponseTimeoutError(f"Timed out waiting for {phase}", first_byte) from None
+
+        getter = asyncio.ensure_future(queue.get())
+        canceller = asyncio.ensure_future(cancel_event.wait())
+        try:
+            done, _ = await asyncio.wait({getter, canceller}, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            # An unfinished get leaves its frame in the queue when cancelled
+            for waiter in (getter, canceller):
+                if not waiter.done():
+                    waiter.cancel()
+        if getter in done:
+            return getter.result()
+        if canceller in done:
+            raise RequestCancelledError("Request cancelled")
+        raise ResponseTimeoutError(f"Timed out waiting for {phase}", first_byte)
+
+    async def stream_message(self, message: Dict[str, Any], first_byte_timeout: Optional[float] = None,
+                             total_timeout: Optional[float] = None,
+                             cancel_event: Optional[asyncio.Event] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Sends a message and yields the backend's frames for it as they arrive.
+
+        Iteration ends after the frame carrying 'response' or 'error'. Frames are
+        buffered per request only up to max_buffered_frames, so a consumer that stops
+        pulling gets an error frame instead of growing memory without bound. Closing
+        the iterator early cancels the request; late frames for it are dropped.
+
+        If the socket turns out to be stale before any frame arrived, the client
+        reconnects and re-sends the message once.
+
+        Args:
+            message: The message payload to send.
+            first_byte_timeout: Seconds to wait for the first frame; defaults to the client's.
+            total_timeout: Seconds the whole response may take; defaults to the client's.
+            cancel_event: Optional event that cancels the request when set.
+
+        Raises:
+            ConnectionError: If no connection to the backend could be established.
+            websockets.exceptions.ConnectionClosed: If the connection was lost mid-response.
+            ResponseTimeoutError: If the backend didn't respond in time.
+            RequestCancelledError: If cancel_event was set.
+        """
+        # Only include 'action' and 'text' fields as per backend expectation, plus the
+        # conversation context if there is any; the request_id used for multiplexing
+        # is added per attempt
+        formatted_message = {
+            "action": "sendMessage",
+            "text": message.get("text", "")
+        }
+        if message.get("history"):
+            formatted_message["history"] = message["history"]
+        if message.get("summary"):
+            formatted_message["summary"] = message["summary"]
+        if self.frame_encoding != ENCODING_JSON:
+            # Backends that don't know this field ignore it and keep replying in JSON
+            formatted_message["accept_encoding"] = self.frame_encoding
+
+        first_byte_timeout = self.first_byte_timeout if first_byte_timeout is None else first_byte_timeout
+        total_timeout = self.total_timeout if total_timeout is None else total_timeout
+        started = time.monotonic()
+        # The total deadline spans a reconnect and re-send; the first-byte one restarts with it
+        deadline = started + total_timeout if total_timeout else None
+
+        for attempt in range(2):
+            if not await self.ensure_connected():
+                raise ConnectionError("Could not connect to the backend WebSocket")
+
+            request_id = uuid.uuid4().hex
+            queue: asyncio.Queue = asyncio.Queue()
+            self._pending[request_id] = queue
+            received = 0
+            try:
+                outgoing = json_codec.dumps({**formatted_message, "request_id": request_id})
+                payload_recorder.record("sent", outgoing, request_id)
+                if payload_recorder.should_log(logger):
+                    logger.info(f"Sending formatted message to WebSocket: {outgoing}")
+                await self.connection.send(outgoing)
+                self.last_activity = time.monotonic()
+                logger.debug("Message sent. Now waiting for response from backend...")
+                first_byte_deadline = time.monotonic() + first_byte_timeout if first_byte_timeout else None
+
+                while True:
+                    frame_deadline = deadline
+                    if received == 0 and first_byte_deadline is not None:
+                        frame_deadline = first_byte_deadline if deadline is None else min(deadline, first_byte_deadline)
+                    response = await self._next_frame(queue, frame_deadline, cancel_event, received == 0)
+                    if isinstance(response, BaseException):
+                        raise response
+                    received += 1
+                    if "error" in response:
+                        payload_recorder.dump_to_log(logger, f"Backend returned an error for request {request_id}", request_id)
+                    yield response
+                    if "response" in response or "error" in response:
+                        return
+            except websockets.exceptions.ConnectionClosed as e:
+                await self._drop_connection()
+                if attempt == 0 and received == 0:
+                    logger.warning(f"WebSocket connection was stale ({e}), reconnecting and re-sending once")
+                    self.reconnects += 1
+                    continue
+                payload_recorder.dump_to_log(logger, f"Connection lost during request {request_id}", request_id)
+                raise
+            except ResponseTimeoutError as e:
+                payload_recorder.dump_to_log(logger, f"Request {request_id} failed: {e}", request_id)
+                raise
+            finally:
+                self._pending.pop(request_id, None)
+
+    async def request(self, message: Dict[str, Any], first_byte_timeout: Optional[float] = None,
+                      total_timeout: Optional[float] = None, cancel_event: Optional[asyncio.Event] = None,
+                      on_chunk: Optional[Callable[[Dict[str, Any]], None]] = None) -> MessageResult:
+        """
+        Sends a message and collects the complete response into a MessageResult.
+
+        Never raises for transport problems: timeouts, disconnects, backend errors and
+        cancellation are reported through the result's status, together with any text
+        streamed before the request was cut off. Cancelling the calling task still
+        raises asyncio.CancelledError as usual.
+
+        Args:
+            message: The message payload to send.
+            first_byte_timeout: Seconds to wait for the first frame; defaults to the client's.
+            total_timeout: Seconds the whole response may take; defaults to the client's.
+            cancel_event: Optional event that cancels the request when set.
+            on_chunk: Optional callback invoked with every response_chunk frame.
+        """
+        started = time.perf_counter()
+        chunks: List[str] = []
+        session_id = None
+        first_byte_ms = None
+        final = None
+        status = RESULT_OK
+        error = None
+
+        try:
+            async for frame in self.stream_message(message, first_byte_timeout, total_timeout, cancel_event):
+                if first_byte_ms is None:
+                    first_byte_ms = (time.perf_counter() - started) * 1000
+                session_id = session_id or frame.get("session_id")
+                if "response_chunk" in frame:
+                    chunks.append(frame["response_chunk"])
+                    if on_chunk:
+                        on_chunk(frame)
+                elif "error" in frame:
+                    final = frame
+                    status = RESULT_ERROR
+                    error = str(frame["error"])
+                elif "response" in frame:
+                    final = frame
+        except ResponseTimeoutError as e:
+            status, error = RESULT_TIMEOUT, str(e)
+        except RequestCancelledError as e:
+            status, error = RESULT_CANCELLED, str(e)
+        except (websockets.exceptions.ConnectionClosed, ConnectionError, OSError) as e:
+            status, error = RESULT_DISCONNECTED, f"{type(e).__name__}: {e}"
+        except Exception as e:
+            status, error = RESULT_ERROR, f"{type(e).__name__}: {e}"
+
+        if status == RESULT_OK and final is None:
+            status, error = RESULT_ERROR, "Backend ended the response without a final frame"
+
+        # The final frame is authoritative; the joined chunks miss any chunk the backend
+        # failed to send, so they are only used when the request was cut off
+        text = "".join(chunks)
+        if status == RESULT_OK and final.get("response"):
+            text = final["response"]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if status != RESULT_OK:
+            logger.warning(f"Backend request ended with status '{status}' after {elapsed_ms:.0f}ms "
+                           f"({len(chunks)} chunks received): {error}")
+        return MessageResult(
+            status=status,
+            text=text,
+            session_id=session_id,
+            data=final,
+            error=error,
+            partial=status != RESULT_OK and bool(text),
+            chunks=len(chunks),
+            first_byte_ms=first_byte_ms,
+            elapsed_ms=elapsed_ms
+        )
+
+    async def send_message(self, message: Dict[str, Any], stream_handler: Optional[Callable[[Dict[str, Any]], None]] = None,
+                           first_byte_timeout: Optional[float] = None,
+                           total_timeout: Optional[float] = None) -> Optional[Union[Dict[str, Any], str]]:
         """
         Sends a message over the WebSocket connection.
 
         Args:
             message: The message payload to send.
             stream_handler: Optional callback function to handle streaming responses.
+            first_byte_timeout: Seconds to wait for the first frame; defaults to the client's.
+            total_timeout: Seconds the whole response may take; defaults to the client's.
 
         Returns:
-            The response from the server, or None if an error occurs.
+            The response from the server, or None if an error occurs. If the response
+            was cut off after some text had streamed, that text is returned with
+            "partial": True and the "status" of the failure.
             If stream_handler is provided, returns the session_id instead.
         """
-        if not self.connection:
-            connected = await self.connect()
-            if not connected:
-                return None
-        
-        try:
-            # Only include 'action' and 'text' fields as per backend expectation
-            formatted_message = {
-                "action": "sendMessage",
-                "text": message.get("text", "")
-            }
-            logger.info(f"Sending formatted message to WebSocket: {json.dumps(formatted_message)}")
-            await self.connection.send(json.dumps(formatted_message))
-            logger.info("Message sent. Now waiting for response from backend...")
-            
-            # If stream_handler is provided, handle streaming responses
-            if stream_handler:
-                session_id = None
-                accumulated_response = ""
-                last_chunk = False
+        result = await self.request(message, first_byte_timeout, total_timeout, on_chunk=stream_handler)
+        response = result.to_response()
+
+        if not stream_handler:
+            return response
+
+        if response is None:
+            stream_handler({"error": result.error, "status": result.status})
+            return result.session_id
+
+        # If we have TTS service available, generate audio for the complete response
+        if result.ok and self.tts_service:
+            try:
+                # Generate a unique filename
+                audio_filename = f"{uuid.uuid4()}.mp3"
+                audio_path = f"static/audio/{audio_filename}"
                 
-                # Keep receiving messages until we get a complete response or error
-                while True:
-                    logger.info("Waiting to receive a message from the WebSocket...")
-                    response_data = await self.connection.recv()
-                    logger.info(f"Received raw data from WebSocket: {response_data}")
-                    response = json.loads(response_data)
-                    
-                    # Save session ID if available
-                    if "session_id" in response and not session_id:
-                        session_id = response["session_id"]
-                    
-                    # If this is a response chunk, pass it directly to the stream handler
-                    if "response_chunk" in response:
-                        chunk_text = response["response_chunk"]
-                        accumulated_response += chunk_text
-                        
-                        # Pass the chunk directly to the stream handler immediately
-                        stream_handler(response)
-                    else:
-                        # For complete responses or errors, pass them through as is
-                        
-                        # If this is a complete response, use the accumulated response if we have it
-                        if "response" in response:
-                            # If we've been accumulating streaming chunks and this is the final response,
-                            # use the accumulated text as the complete response
-                            if accumulated_response and not last_chunk:
-                                response["response"] = accumulated_response
-                                last_chunk = True
-                            
-                            # If we have TTS service available, generate audio for the complete response
-                            if self.tts_service:
-                                try:
-                                    # Generate a unique filename
-                                    audio_filename = f"{uuid.uuid4()}.mp3"
-                                    audio_path = f"static/audio/{audio_filename}"
-                                    
-                                    # Convert response to speech
-                                    audio_file = self.tts_service.text_to_speech(response["response"], audio_path)
-                                    
-                                    # Add audio URL to the response
-                                    if audio_file:
-                                        response["audio_url"] = f"/static/audio/{audio_filename}"
-                                        logger.info(f"Generated audio for WebSocket response: {response['audio_url']}")
-                                except Exception as e:
-                                    logger.error(f"Error generating audio for WebSocket response: {e}")
-                        
-                        # Pass the response to the stream handler
-                        stream_handler(response)
-                    
-                    # If this is a complete response or error, break the loop
-                    if "response" in response or "error" in response:
-                        break
+                # Convert response to speech
+                audio_file = self.tts_service.text_to_speech(response["response"], audio_path)
                 
-                # Return the session ID
-                return session_id
-            else:
-                # Non-streaming mode: wait for a single response with 'response' field
-                response_data = await self.connection.recv()
-                logger.info(f"Received raw data from WebSocket: {response_data}")
-                response = json.loads(response_data)
-                return response
-        except Exception as e:
-            logger.error(f"Error sending message over WebSocket: {e}")
-            return None
+                # Add audio URL to the response
+                if audio_file:
+                    response["audio_url"] = f"/static/audio/{audio_filename}"
+                    logger.info(f"Generated audio for WebSocket response: {response['audio_url']}")
+            except Exception as e:
+                logger.error(f"Error generating audio for WebSocket response: {e}")
+
+        # Pass the complete response or error to the stream handler
+        stream_handler(response)
+        return result.session_id
 
     async def close(self):
         """Closes the WebSocket connection."""
         if self.connection:
-            await self.connection.close()
+            await self._drop_connection()
             logger.info("WebSocket connection closed")
 
 # Example usage
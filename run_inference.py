@@ -146,30 +146,19 @@ except ImportError as e:
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-async def process_question_concurrently(index, question, config, semaphore, queue):
-    async with semaphore:
-        try:
-            nlp_pipeline = NLPPipeline(config=config)
-            response_generator = ResponseGenerator()
-            nlp_data = await nlp_pipeline.process_input(question)
-            final_response = response_generator.get_final_answer(nlp_data)
-            await nlp_pipeline.close()
-            await queue.put((index, final_response))
-        except Exception as e:
-            logging.error(f"Error processing question at index {index}: {e}")
-            await queue.put((index, "Error processing this question."))
-
-async def writer_task(queue, input_df, output_path, total):
-    processed = 0
-    with tqdm(total=total, desc="Generating Responses") as pbar:
-        while processed < total:
-            index, response = await queue.get()
-            input_df.loc[index, 'Responses'] = response
+async def writer_task(results, input_df, output_path, response_generator):
+    with tqdm(total=len(input_df), desc="Generating Responses") as pbar:
+        async for result in results:
+            if result.response:
+                final_response = response_generator.get_final_answer(result.response)
+            else:
+                logging.error(f"Error processing question at index {result.index}: {result.error}")
+                final_response = "Error processing this question."
+            input_df.loc[input_df.index[result.index], 'Responses'] = final_response
             input_df.to_csv(output_path, index=False, quoting=csv.QUOTE_ALL)
             pbar.update(1)
-            processed += 1
 
-async def main(input_path, output_path, concurrency_limit=1):
+async def main(input_path, output_path, concurrency_limit=1, transport=None):
     logger = logging.getLogger(__name__)
     logger.info("Starting real-time inference process...")
 
@@ -179,6 +168,11 @@ async def main(input_path, output_path, concurrency_limit=1):
     except (FileNotFoundError, ValueError) as e:
         logger.error(f"Failed to initialize config: {e}")
         return
+    if transport:
+        if transport != "websocket" and not config.http_base_url:
+            logger.error("The http transport needs API_GATEWAY_HTTP_URL or api_gateway.http.base_url.")
+            return
+        config.transport = transport
 
     try:
         logger.info(f"Reading input questions from {input_path}")
@@ -192,15 +186,21 @@ async def main(input_path, output_path, concurrency_limit=1):
         logger.error(f"Input file not found at {input_path}")
         return
 
-    semaphore = asyncio.Semaphore(concurrency_limit)
-    queue = asyncio.Queue()
-    tasks = [
-        asyncio.create_task(process_question_concurrently(index, row["Questions"], config, semaphore, queue))
-        for index, row in input_df.iterrows()
-    ]
-    writer = asyncio.create_task(writer_task(queue, input_df, output_path, len(tasks)))
-    await asyncio.gather(*tasks)
-    await writer
+    # One pipeline shared by all questions; its connection pool gives every
+    # concurrent question its own backend connection and reuses them. No TTS
+    # service is injected, so batch runs only ever produce text
+    if concurrency_limit > config.batch_max_in_flight:
+        logger.warning(f"Concurrency {concurrency_limit} is capped by batch.max_in_flight={config.batch_max_in_flight}")
+    config.pool_max_size = max(config.pool_max_size, concurrency_limit)
+    config.http_pool_size = max(config.http_pool_size, concurrency_limit)
+    nlp_pipeline = NLPPipeline(config=config)
+    response_generator = ResponseGenerator()
+
+    # Results stream back as they complete and are written to the CSV right away
+    batch = nlp_pipeline.process_batch(input_df["Questions"].tolist(), concurrency=concurrency_limit, ordered=False)
+    await writer_task(batch, input_df, output_path, response_generator)
+    await nlp_pipeline.close()
+    logger.info(f"Inference finished: {batch.stats.to_dict()}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run inference to generate responses for a list of questions.")
@@ -222,6 +222,12 @@ if __name__ == "__main__":
         default=1,
         help="Number of API requests to run in parallel. Default is 1 to avoid rate limiting."
     )
+    parser.add_argument(
+        "--transport",
+        choices=["websocket", "http", "auto"],
+        default=None,
+        help="Backend transport, overriding api_gateway.transport. Short runs can skip the websocket with 'http'."
+    )
 
     args = parser.parse_args()
-    asyncio.run(main(args.input, args.output, args.concurrency))
\ No newline at end of file
+    asyncio.run(main(args.input, args.output, args.concurrency, args.transport))
\ No newline at end of file
@@ -10,7 +10,6 @@ This script provides a Flask web server that:
 
 import os
 import sys
-import json
 import logging
 import tempfile
 import uuid
@@ -18,12 +17,21 @@ import random
 import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, request, jsonify, send_from_directory, send_file, Response, stream_with_context
 import threading
+import hmac
+from functools import wraps
 
 # Add the project root to the Python path
 sys.path.append('.')
 
+from modules.audio_decoder import AudioDecoder, DecoderBusyError
+from modules.profiling import RequestProfiler, AllocationTracker
+from modules.event_loop import BackgroundEventLoop
+from modules.payload_log import payload_recorder, PayloadLogConfig
+from modules.circuit_breaker import CircuitOpenError
+from modules import json_codec
+
 # Load environment variables
 load_dotenv()
 
@@ -34,9 +42,46 @@ logger = logging.getLogger(__name__)
 # Global initialization status
 MODULES_INITIALIZED = False
 
+# Background dependency prober, started once the modules are initialized
+health_prober = None
+
+# Shared event loop for the NLP pipeline; its pooled backend connections are
+# bound to this loop, so request threads must not use asyncio.run() for them
+event_loop = BackgroundEventLoop(name="nlp-loop").start()
+
 # Initialize Flask app
 app = Flask(__name__, static_folder='static')
 
+try:
+    from flask.json.provider import DefaultJSONProvider
+
+    class CodecJSONProvider(DefaultJSONProvider):
+        """Serializes responses and parses request bodies through json_codec."""
+
+        def dumps(self, obj, **kwargs):
+            # Pretty-printing (debug mode) keeps the standard encoder
+            if "indent" in kwargs or "separators" in kwargs:
+                return super().dumps(obj, **kwargs)
+            return json_codec.dumps(obj, default=kwargs.get("default", self.default),
+                                    sort_keys=kwargs.get("sort_keys", self.sort_keys))
+
+        def loads(self, s, **kwargs):
+            return json_codec.loads(s) if not kwargs else super().loads(s, **kwargs)
+
+    app.json = CodecJSONProvider(app)
+except ImportError:
+    # Flask < 2.2 has no JSON provider interface; responses use the standard encoder
+    pass
+logger.info(f"JSON codec: {json_codec.BACKEND}")
+
+# On-demand profiling; wraps the app only while a session is armed
+DEBUG_API_TOKEN = os.environ.get('DEBUG_API_TOKEN', '')
+request_profiler = RequestProfiler(app)
+allocation_tracker = AllocationTracker()
+
+# Recent backend payloads are kept in memory and only a sample is logged
+payload_recorder.configure(PayloadLogConfig.from_yaml())
+
 # Import modules
 try:
     from modules.asr_module import ASRModule, ASRConfig
@@ -52,11 +97,31 @@ try:
     
     logger.info("Initializing modules...")
     asr_module = ASRModule(config=asr_config)
+    audio_decoder = AudioDecoder(
+        mode=asr_config.upload_mode,
+        max_workers=asr_config.decode_workers,
+        max_queued=asr_config.decode_queue
+    )
     tts_module = TTSModule(config=tts_config)
+    # Text-only pipeline: the routes synthesize audio themselves in background threads
     nlp_pipeline = NLPPipeline(config=nlp_config)
     response_generator = ResponseGenerator()
     fallback_service = FallbackService()
     
+    from modules.health_probe import HealthProber, HealthConfig, build_default_probes
+    health_config = HealthConfig.from_yaml()
+    if health_config.enabled:
+        health_prober = HealthProber(
+            build_default_probes(
+                nlp_pipeline.backend_url,
+                tts_module.elevenlabs_client.uri if health_config.probe_tts else None,
+                tts_config.elevenlabs_api_key,
+                tts_interval_seconds=health_config.tts_interval_seconds
+            ),
+            health_config
+        )
+        health_prober.start()
+    
     logger.info("All modules initialized successfully")
     MODULES_INITIALIZED = True
     
@@ -71,6 +136,15 @@ except Exception as e:
         logger.error(f"Failed to load fallback service: {e}")
     logger.error("Server will have limited functionality")
 
+# Load the prebuilt FAQ index for the fast path. This is independent of the
+# backend modules so FAQ answers keep working in limited mode.
+faq_index = None
+try:
+    from modules.faq_index import FAQIndex, FAQConfig
+    faq_index = FAQIndex.from_config(FAQConfig.from_yaml())
+except Exception as e:
+    logger.error(f"Error loading FAQ index: {e}")
+
 # Create audio storage directory
 AUDIO_DIR = Path("static/audio")
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
@@ -88,6 +162,60 @@ DEMO_RESPONSES = {
     "default": "That's a great question about P2P lending! In a peer-to-peer lending model, investors can earn returns by lending directly to borrowers through an online platform that matches lenders with borrowers. The platform handles the loan origination, credit checks, and payment processing, while providing transparency and portfolio diversification options for lenders."
 }
 
+def lookup_faq(user_text):
+    """
+    Answer the query from the prebuilt FAQ index if it is a high-confidence match.
+
+    Returns:
+        A response payload dict for the client, or None if there is no match.
+    """
+    if faq_index is None:
+        return None
+    match = faq_index.lookup(user_text)
+    if not match:
+        return None
+    logger.info(f"FAQ fast path hit ({match.match_type}, score={match.score}) for: '{match.question}'")
+    audio_ready = bool(match.audio_url) and os.path.exists(match.audio_url.lstrip('/'))
+    return {
+        "response": match.answer,
+        "audio_url": match.audio_url if audio_ready else None,
+        "audio_status": "ready" if audio_ready else "unavailable",
+        "source": "faq"
+    }
+
+def require_debug_token(view):
+    """Restrict a debug endpoint to callers presenting DEBUG_API_TOKEN in the X-Debug-Token header"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not DEBUG_API_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        token = request.headers.get('X-Debug-Token', '')
+        if not hmac.compare_digest(token, DEBUG_API_TOKEN):
+            return jsonify({"error": "Unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def limit_arg(default):
+    """The 'limit' query parameter as a non-negative int, or default if it is missing or not a number"""
+    return max(request.args.get('limit', default, type=int), 0)
+
+def save_audio_upload(audio_file):
+    """Save an uploaded audio file to a temporary path and return the path"""
+    if MODULES_INITIALIZED:
+        return audio_decoder.save_upload(audio_file)
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
+        audio_file.save(temp_file.name)
+        return temp_file.name
+
+def transcribe_upload(temp_path):
+    """Transcribe an uploaded audio file, decoding it first if the upload mode requires it"""
+    stt_path = audio_decoder.prepare_for_stt(temp_path)
+    try:
+        return asr_module.transcribe_file(stt_path)
+    finally:
+        if stt_path != temp_path and os.path.exists(stt_path):
+            os.remove(stt_path)
+
 # Routes
 @app.route('/')
 def index():
@@ -108,7 +236,124 @@ def speech_to_speech_demo():
 def health_check():
     """Health check endpoint"""
     status = "ok" if MODULES_INITIALIZED else "limited"
-    return jsonify({"status": status, "modules_initialized": MODULES_INITIALIZED}), 200
+    # An open breaker means NLP answers currently come from the fallback service
+    circuit = nlp_pipeline.breaker.state if MODULES_INITIALIZED else None
+    if circuit and circuit != "closed":
+        status = "degraded"
+    return jsonify({"status": status, "modules_initialized": MODULES_INITIALIZED, "circuit_breaker": circuit}), 200
+
+@app.route('/api/health/deep')
+def deep_health_check():
+    """Deep health check backed by cached dependency probes (never probes inline)"""
+    if health_prober is None:
+        return jsonify({
+            "status": "ok" if MODULES_INITIALIZED else "limited",
+            "modules_initialized": MODULES_INITIALIZED,
+            "dependencies": {},
+            "circuit_breaker": nlp_pipeline.breaker.stats() if MODULES_INITIALIZED else None
+        }), 200
+    
+    overall = health_prober.overall_status()
+    if not MODULES_INITIALIZED:
+        overall = "limited"
+    return jsonify({
+        "status": overall,
+        "modules_initialized": MODULES_INITIALIZED,
+        "dependencies": health_prober.snapshot(),
+        "backend_pool": nlp_pipeline.pool.stats() if MODULES_INITIALIZED else None,
+        "hedging": nlp_pipeline.hedge_policy.stats() if MODULES_INITIALIZED else None,
+        "circuit_breaker": nlp_pipeline.breaker.stats() if MODULES_INITIALIZED else None,
+        "transport": nlp_pipeline.transport_stats() if MODULES_INITIALIZED else None
+    }), 503 if overall == "down" else 200
+
+@app.route('/api/debug/profile', methods=['GET', 'POST', 'DELETE'])
+@require_debug_token
+def debug_profile():
+    """Arm (POST), inspect (GET) or stop (DELETE) a request profiling session"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            request_profiler.start(
+                max_requests=data.get('requests'),
+                seconds=data.get('seconds'),
+                sample_interval_ms=data.get('sample_interval_ms', 5.0)
+            )
+        except (ValueError, RuntimeError) as e:
+            return jsonify({"error": str(e)}), 400
+    elif request.method == 'DELETE':
+        request_profiler.stop()
+    return jsonify(request_profiler.status())
+
+@app.route('/api/debug/profile/download')
+@require_debug_token
+def debug_profile_download():
+    """Download the last profile as pstats, collapsed stacks or a text summary"""
+    output_format = request.args.get('format', 'pstats')
+    if output_format == 'collapsed':
+        return request_profiler.collapsed_stacks(), 200, {
+            'Content-Type': 'text/plain; charset=utf-8',
+            'Content-Disposition': 'attachment; filename=profile.collapsed'
+        }
+    if output_format == 'summary':
+        return request_profiler.summary(limit_arg(30)), 200, {'Content-Type': 'text/plain; charset=utf-8'}
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.pstats') as temp_file:
+        stats_path = temp_file.name
+    if not request_profiler.dump_pstats(stats_path):
+        os.remove(stats_path)
+        return jsonify({"error": "No profile data recorded"}), 404
+    with open(stats_path, 'rb') as f:
+        stats_data = f.read()
+    os.remove(stats_path)
+    return stats_data, 200, {
+        'Content-Type': 'application/octet-stream',
+        'Content-Disposition': 'attachment; filename=profile.pstats'
+    }
+
+@app.route('/api/debug/tracemalloc', methods=['GET', 'POST', 'DELETE'])
+@require_debug_token
+def debug_tracemalloc():
+    """Start tracing or re-baseline (POST), diff against the baseline (GET) or stop (DELETE)"""
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            if allocation_tracker.active:
+                allocation_tracker.snapshot()
+            else:
+                try:
+                    frames = int(data.get('frames', 10))
+                except (TypeError, ValueError):
+                    return jsonify({"error": "'frames' must be an integer"}), 400
+                if not 1 <= frames <= 65535:
+                    return jsonify({"error": "'frames' must be between 1 and 65535"}), 400
+                allocation_tracker.start(frames=frames)
+            return jsonify({"active": True})
+        if request.method == 'DELETE':
+            allocation_tracker.stop()
+            return jsonify({"active": False})
+        diff = allocation_tracker.diff(
+            limit=limit_arg(25),
+            key_type=request.args.get('key', 'lineno')
+        )
+        return diff, 200, {'Content-Type': 'text/plain; charset=utf-8'}
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 400
+
+@app.route('/api/debug/payloads', methods=['GET', 'DELETE'])
+@require_debug_token
+def debug_payloads():
+    """List the most recent buffered payloads (GET) or clear the buffer (DELETE)"""
+    if request.method == 'DELETE':
+        payload_recorder.clear()
+        return jsonify(payload_recorder.stats())
+    return jsonify({
+        **payload_recorder.stats(),
+        "entries": payload_recorder.recent(
+            limit=limit_arg(50),
+            request_id=request.args.get('request_id'),
+            kind=request.args.get('kind')
+        )
+    })
 
 @app.route('/api/text', methods=['POST'])
 def process_text():
@@ -126,12 +371,16 @@ def process_text():
         
         logger.info(f"Processing text input: '{user_text}'")
         
+        faq_response = lookup_faq(user_text)
+        if faq_response:
+            return jsonify(faq_response)
+        
         final_response = ""
         
         if MODULES_INITIALIZED:
             try:
                 # Process the text through the NLP pipeline
-                nlp_data = asyncio.run(nlp_pipeline.process_input(
+                nlp_data = event_loop.run(nlp_pipeline.answer(
                     user_text, 
                     session_id=session_id,
                     history=history
@@ -139,11 +388,15 @@ def process_text():
                 
                 # Check if we should use fallback
                 if fallback_service.should_use_fallback(nlp_data):
-                    logger.warning("NLP pipeline returned invalid data, using fallback")
+                    logger.warning(f"NLP pipeline returned no answer ({nlp_data.status}), using fallback")
                     final_response = fallback_service.get_fallback_response(user_text, history)
                 else:
                     # Generate the final response
                     final_response = response_generator.get_final_answer(nlp_data)
+            except CircuitOpenError as e:
+                # Backend known to be degraded: answer from the fallback without waiting on it
+                logger.warning(f"{e}, using fallback")
+                final_response = fallback_service.get_fallback_response(user_text, history)
             except Exception as e:
                 logger.error(f"Error in NLP processing: {e}", exc_info=True)
                 final_response = fallback_service.get_fallback_response(user_text, history)
@@ -214,8 +467,8 @@ def process_text_stream():
                     logger.debug(f"Received chunk: {chunk}")
                 
                 # Process the text through the NLP pipeline with streaming
-                # This is an async function, we need to run it with asyncio.run
-                result = asyncio.run(nlp_pipeline.process_input(
+                # This is an async function, run it on the shared pipeline loop
+                result = event_loop.run(nlp_pipeline.process_input(
                     user_text, 
                     session_id=session_id,
                     history=history,
@@ -226,6 +479,13 @@ def process_text_stream():
                     return jsonify({"status": "streaming", "session_id": result["session_id"]}), 200
                 else:
                     return jsonify({"error": "Failed to start streaming"}), 500
+            except CircuitOpenError as e:
+                logger.warning(f"{e}, streaming unavailable")
+                return jsonify({
+                    "error": "Backend temporarily unavailable",
+                    "response": fallback_service.get_fallback_response(user_text, history),
+                    "retry_after": round(e.retry_after, 1)
+                }), 503
             except Exception as e:
                 logger.error(f"Error in streaming NLP processing: {e}", exc_info=True)
                 return jsonify({"error": "Error processing streaming request"}), 500
@@ -241,6 +501,55 @@ def process_text_stream():
         error_response = "I'm sorry, I'm experiencing technical difficulties. Please try again later."
         return jsonify({"error": "Failed to process your request", "response": error_response}), 500
 
+def sse_event(event_type, payload):
+    """Format one server-sent event"""
+    return f"event: {event_type}\ndata: {json_codec.dumps(payload)}\n\n"
+
+@app.route('/api/text_sse', methods=['POST'])
+def process_text_sse():
+    """Stream the response to a text query as server-sent events while it is generated"""
+    data = request.json or {}
+    user_text = data.get('text')
+    history = data.get('history', [])
+    session_id = data.get('session_id') or str(uuid.uuid4())
+
+    if not user_text:
+        return jsonify({"error": "No text provided"}), 400
+    if not MODULES_INITIALIZED:
+        return jsonify({
+            "error": "Streaming not available in limited mode",
+            "response": "I'm sorry, streaming responses are not available right now."
+        }), 503
+
+    logger.info(f"Processing SSE text input: '{user_text}' with session ID: {session_id}")
+
+    def generate():
+        faq_response = lookup_faq(user_text)
+        if faq_response:
+            yield sse_event("final", {**faq_response, "session_id": session_id})
+            return
+        # Closing this generator (client disconnect) closes the pipeline stream,
+        # which cancels the backend request and returns its pooled connection
+        try:
+            for event in event_loop.iterate(nlp_pipeline.stream(user_text, session_id=session_id, history=history)):
+                if event.type == "chunk":
+                    yield sse_event("chunk", {"text": event.text})
+                elif event.type == "final":
+                    yield sse_event("final", {"response": event.text, "session_id": event.session_id or session_id})
+                else:
+                    logger.error(f"Error in SSE NLP stream: {event.text}")
+                    yield sse_event("error", {"error": "Error processing streaming request"})
+        except CircuitOpenError as e:
+            logger.warning(f"{e}, using fallback")
+            yield sse_event("final", {
+                "response": fallback_service.get_fallback_response(user_text, history),
+                "session_id": session_id,
+                "fallback": True
+            })
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/speech', methods=['POST'])
 def process_speech():
     """Process speech input from the user"""
@@ -253,17 +562,15 @@ def process_speech():
         history_json = request.form.get('history', '[]')
         
         try:
-            history = json.loads(history_json)
-        except json.JSONDecodeError:
+            history = json_codec.loads(history_json)
+        except json_codec.DecodeError:
             history = []
             
         # Create a unique session ID for this conversation
         session_id = str(uuid.uuid4())
         
-        # Save the audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            audio_file.save(temp_file.name)
-            temp_path = temp_file.name
+        # Save the audio file temporarily, keeping its real container format
+        temp_path = save_audio_upload(audio_file)
         
         transcription = ""
         final_response = ""
@@ -272,7 +579,7 @@ def process_speech():
         # Transcribe the audio
         try:
             if MODULES_INITIALIZED:
-                transcription = asr_module.transcribe_file(temp_path)
+                transcription = transcribe_upload(temp_path)
             else:
                 # Fallback for demonstration
                 transcription = "This is a demo transcription as the ASR module is not available."
@@ -284,13 +591,17 @@ def process_speech():
             if not transcription:
                 return jsonify({"error": "Could not transcribe audio"}), 400
                 
-            logger.info(f"Transcribed speech: '{transcription}'")
+            logger.info(f"Transcribed speech ({len(transcription)} chars)")
+            
+            faq_response = lookup_faq(transcription)
+            if faq_response:
+                return jsonify({"text": transcription, **faq_response})
             
             if MODULES_INITIALIZED:
                 try:
                     # Process the transcription through the NLP pipeline
                     # This is an async function, we need to await it
-                    nlp_data = asyncio.run(nlp_pipeline.process_input(
+                    nlp_data = event_loop.run(nlp_pipeline.answer(
                         transcription, 
                         session_id=session_id,
                         history=history
@@ -298,11 +609,15 @@ def process_speech():
                     
                     # Check if we should use fallback
                     if fallback_service.should_use_fallback(nlp_data):
-                        logger.warning("NLP pipeline returned invalid data, using fallback")
+                        logger.warning(f"NLP pipeline returned no answer ({nlp_data.status}), using fallback")
                         final_response = fallback_service.get_fallback_response(transcription, history)
                     else:
                         # Generate the final response
                         final_response = response_generator.get_final_answer(nlp_data)
+                except CircuitOpenError as e:
+                    # Backend known to be degraded: answer from the fallback without waiting on it
+                    logger.warning(f"{e}, using fallback")
+                    final_response = fallback_service.get_fallback_response(transcription, history)
                 except Exception as e:
                     logger.error(f"Error in NLP processing: {e}", exc_info=True)
                     final_response = fallback_service.get_fallback_response(transcription, history)
@@ -344,6 +659,11 @@ def process_speech():
                 "audio_status": "generating"  # Indicate that audio is being generated
             })
             
+        except DecoderBusyError:
+            logger.warning("Audio decode pool saturated, rejecting upload")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return jsonify({"error": "Server is busy decoding audio, please retry"}), 503
         except Exception as e:
             logger.error(f"Error transcribing audio: {e}")
             # Clean up temp file
@@ -367,10 +687,8 @@ async def process_speech_to_speech():
         audio_file = request.files['audio']
         voice_id = request.form.get('voice_id', None)
         
-        # Save the audio file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.wav') as temp_file:
-            audio_file.save(temp_file.name)
-            temp_path = temp_file.name
+        # Save the audio file temporarily, keeping its real container format
+        temp_path = save_audio_upload(audio_file)
         
         transcription = ""
         final_response = ""
@@ -379,7 +697,7 @@ async def process_speech_to_speech():
         # Transcribe the audio
         try:
             if MODULES_INITIALIZED:
-                transcription = asr_module.transcribe_file(temp_path)
+                transcription = transcribe_upload(temp_path)
             else:
                 # Fallback for demonstration
                 transcription = "This is a demo transcription as the ASR module is not available."
@@ -391,7 +709,13 @@ async def process_speech_to_speech():
             if not transcription:
                 return jsonify({"error": "Could not transcribe audio"}), 400
                 
-            logger.info(f"Transcribed speech: '{transcription}'")
+            logger.info(f"Transcribed speech ({len(transcription)} chars)")
+            
+            # Prerendered FAQ audio uses the default voice, so only take the
+            # fast path when no specific voice was requested
+            faq_response = None if voice_id else lookup_faq(transcription)
+            if faq_response:
+                return jsonify({"text": transcription, **faq_response})
             
             # Generate a unique ID for the audio file that will be generated
             audio_filename = f"{uuid.uuid4()}.wav"
@@ -404,19 +728,23 @@ async def process_speech_to_speech():
                     session_id = str(uuid.uuid4())
                     
                     # Process the transcription through the NLP pipeline
-                    nlp_data = await nlp_pipeline.process_input(
+                    nlp_data = await asyncio.wrap_future(event_loop.submit(nlp_pipeline.answer(
                         transcription, 
                         session_id=session_id,
                         history=[]
-                    )
+                    )))
                     
                     # Check if we should use fallback
                     if fallback_service.should_use_fallback(nlp_data):
-                        logger.warning("NLP pipeline returned invalid data, using fallback")
+                        logger.warning(f"NLP pipeline returned no answer ({nlp_data.status}), using fallback")
                         final_response = fallback_service.get_fallback_response(transcription, [])
                     else:
                         # Generate the final response
                         final_response = response_generator.get_final_answer(nlp_data)
+                except CircuitOpenError as e:
+                    # Backend known to be degraded: answer from the fallback without waiting on it
+                    logger.warning(f"{e}, using fallback")
+                    final_response = fallback_service.get_fallback_response(transcription, [])
                 except Exception as e:
                     logger.error(f"Error in NLP processing: {e}", exc_info=True)
                     final_response = fallback_service.get_fallback_response(transcription, [])
@@ -462,6 +790,11 @@ async def process_speech_to_speech():
                 "audio_status": "generating"  # Indicate that audio is being generated
             })
             
+        except DecoderBusyError:
+            logger.warning("Audio decode pool saturated, rejecting upload")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return jsonify({"error": "Server is busy decoding audio, please retry"}), 503
         except Exception as e:
             logger.error(f"Error transcribing audio: {e}")
             # Clean up temp file
@@ -520,8 +853,8 @@ def demo_endpoint(mode):
         history_json = request.form.get('history', '[]')
         
         try:
-            history = json.loads(history_json)
-        except json.JSONDecodeError:
+            history = json_codec.loads(history_json)
+        except json_codec.DecodeError:
             history = []
             
         # Extract the last user message from history if available
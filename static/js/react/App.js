@@ -374,7 +374,8 @@ const App = () => {
     
     // Create a FormData object to send the audio file
     const formData = new FormData();
-    formData.append('audio', audioBlob);
+    const extension = audioBlob.type.includes('ogg') ? 'ogg' : audioBlob.type.includes('webm') ? 'webm' : 'wav';
+    formData.append('audio', audioBlob, `recording.${extension}`);
     
     // Add conversation history
     const historyToSend = messages.filter(msg => msg.role === 'user' || msg.role === 'assistant')
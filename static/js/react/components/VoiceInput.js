@@ -72,8 +72,10 @@ const VoiceInput = ({ onSendVoice, isRecording, setIsRecording, botStatus }) =>
       // Reset audio chunks
       audioChunksRef.current = [];
       
-      // Create media recorder - use WAV format (audio/wav) for better compatibility
-      const options = { mimeType: 'audio/webm' };
+      // Record compressed Opus; the server accepts WebM/OGG uploads directly
+      const preferredType = ['audio/webm;codecs=opus', 'audio/ogg;codecs=opus', 'audio/webm']
+        .find(type => MediaRecorder.isTypeSupported(type));
+      const options = preferredType ? { mimeType: preferredType } : {};
       const mediaRecorder = new MediaRecorder(stream, options);
       mediaRecorderRef.current = mediaRecorder;
       
@@ -87,7 +89,7 @@ const VoiceInput = ({ onSendVoice, isRecording, setIsRecording, botStatus }) =>
       // Handle recording stop event
       mediaRecorder.onstop = () => {
         // Create blob from audio chunks
-        const audioBlob = new Blob(audioChunksRef.current, { type: 'audio/wav' });
+        const audioBlob = new Blob(audioChunksRef.current, { type: mediaRecorder.mimeType || 'audio/webm' });
         setAudioBlob(audioBlob);
         
         // Send the audio blob
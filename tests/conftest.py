@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Make the project root importable, as the scripts do with sys.path.append('.')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest_plugins = ["mock_backend"]
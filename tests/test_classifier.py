@@ -0,0 +1,50 @@
+"""
+Release gate for the Lambda's short-circuit classifier: runs the labelled corpus
+through classify_query and checks the templates the short-circuits answer with.
+"""
+
+import os
+import sys
+
+import pytest
+
+# The Lambda creates its AWS clients at import; that needs boto3 but no credentials
+pytest.importorskip("boto3")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambda"))
+
+import lambda_code  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def report():
+    return lambda_code.evaluate_classifier()
+
+
+def test_corpus_has_no_false_short_circuits(report):
+    assert report["false_short_circuits"] == []
+
+
+def test_corpus_precision_and_recall(report):
+    assert report["precision"] >= lambda_code.CLASSIFIER_MIN_PRECISION
+    assert report["recall"] >= lambda_code.CLASSIFIER_MIN_RECALL
+
+
+def test_every_short_circuit_label_has_templates():
+    with open(lambda_code.CLASSIFIER_CORPUS_PATH, encoding="utf-8") as f:
+        labels = {lambda_code.json_loads(line)["label"] for line in f if line.strip()}
+    for label in labels - {lambda_code.LABEL_ANSWER}:
+        assert lambda_code.TEMPLATE_ANSWERS[label]["en"]
+        assert lambda_code.TEMPLATE_ANSWERS[label]["hi"]
+
+
+@pytest.mark.parametrize("text, label, language", [
+    ("hi there", "greeting", "en"),
+    ("thanks a lot", "thanks", "en"),
+    ("नमस्ते", "greeting", "hi"),
+])
+def test_short_circuit_answers_from_the_template(text, label, language):
+    assert lambda_code.short_circuit_answer(text) == lambda_code.TEMPLATE_ANSWERS[label][language]
+
+
+def test_domain_questions_go_to_the_model():
+    assert lambda_code.short_circuit_answer("Is LenDenClub registered with RBI?") is None
@@ -0,0 +1,70 @@
+"""
+Tests of hedged_stream's bookkeeping with a scripted connection pool, for races
+the mock backend can't stage deterministically.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from modules.hedging import HedgeConfig, HedgePolicy, hedged_stream
+
+
+class ScriptedClient:
+    """Stands in for a WebSocketClient: waits `delay` seconds, then yields `frames`."""
+
+    def __init__(self, delay: float, frames):
+        self.delay = delay
+        self.frames = frames
+
+    async def stream_message(self, payload, **kwargs):
+        await asyncio.sleep(self.delay)
+        for frame in self.frames:
+            yield frame
+
+
+class ScriptedPool:
+    """Hands out the scripted clients in order, one per attempt."""
+
+    def __init__(self, *clients):
+        self.clients = list(clients)
+
+    @asynccontextmanager
+    async def connection(self, avoid=None):
+        yield self.clients.pop(0)
+
+
+def test_abandoning_a_hedged_race_releases_the_hedge():
+    # The primary fails first, so the stream keeps waiting on the slow hedge when it is abandoned
+    pool = ScriptedPool(ScriptedClient(0.1, [{"error": "throttled"}]), ScriptedClient(10.0, [{"response": "late"}]))
+    policy = HedgePolicy(HedgeConfig(enabled=True, initial_delay=0.05, budget=1.0))
+
+    async def scenario():
+        async def consume():
+            return [frame async for frame in hedged_stream(pool, {"text": "hi"}, policy)]
+
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.3)
+        in_race = policy.stats()["hedges_in_flight"]
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return in_race
+
+    assert asyncio.run(scenario()) == 1
+    stats = policy.stats()
+    assert stats["hedges"] == 1
+    assert stats["hedges_in_flight"] == 0
+    # An abandoned request is neither a hedge win nor a primary win
+    assert stats["hedge_wins"] == stats["primary_wins"] == 0
+
+
+def test_failed_primary_loses_to_the_hedge():
+    pool = ScriptedPool(ScriptedClient(0.1, [{"error": "throttled"}]), ScriptedClient(0.1, [{"response": "ok"}]))
+    policy = HedgePolicy(HedgeConfig(enabled=True, initial_delay=0.05, budget=1.0))
+
+    async def scenario():
+        return [frame async for frame in hedged_stream(pool, {"text": "hi"}, policy)]
+
+    assert asyncio.run(scenario()) == [{"response": "ok"}]
+    stats = policy.stats()
+    assert stats["hedge_wins"] == 1
+    assert stats["hedges_in_flight"] == 0
@@ -0,0 +1,203 @@
+"""
+Client-side tests against the mock NLP backend: streaming, request_id routing,
+injected errors and drops, the circuit breaker, hedging, and the auto transport.
+
+Each test gets a fresh backend from the mock_backend fixture; tests that need
+different behaviour parametrize mock_backend_config.
+"""
+
+import asyncio
+
+import pytest
+
+from mock_backend import MockBackendConfig
+from modules.circuit_breaker import CircuitBreakerConfig, CircuitOpenError
+from modules.hedging import HedgeConfig
+from modules.nlp_pipeline import NLPConfig, NLPPipeline
+from modules.nlp_result import STATUS_DISCONNECTED, STATUS_ERROR, STATUS_OK, STATUS_TIMEOUT
+from modules.websocket_client import WebSocketClient
+
+CANNED_QUESTION = "What is LenDenClub?"
+OTHER_QUESTION = "How do I withdraw my earnings?"
+
+
+def make_pipeline(backend, **overrides) -> NLPPipeline:
+    settings = {"pool_min_size": 0, "pool_max_size": 2, "first_byte_timeout": 5.0, "total_timeout": 10.0}
+    settings.update(overrides)
+    return NLPPipeline(NLPConfig(api_base_url=backend.url, api_key="", api_nlp_endpoint="/nlp", **settings))
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_streams_chunks_then_final(mock_backend):
+    async def scenario():
+        pipeline = make_pipeline(mock_backend)
+        try:
+            return [event async for event in pipeline.stream(CANNED_QUESTION)]
+        finally:
+            await pipeline.close()
+
+    events = run(scenario())
+    chunks = [event.text for event in events if event.type == "chunk"]
+    assert events[-1].type == "final"
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == events[-1].text.strip() == mock_backend.answer_for(CANNED_QUESTION)
+    assert mock_backend.stats.answered == 1
+
+
+@pytest.mark.parametrize("mock_backend_config", [
+    MockBackendConfig(first_token_delay=0.01, first_token_jitter=0.1, tokens_per_second=200, seed=3)
+])
+def test_routes_concurrent_answers_by_request_id(mock_backend):
+    questions = [CANNED_QUESTION, OTHER_QUESTION] * 3
+
+    async def ask(client, question):
+        frames = [frame async for frame in client.stream_message({"text": question})]
+        return frames[-1]["response"]
+
+    async def scenario():
+        client = WebSocketClient(mock_backend.url, max_in_flight=len(questions))
+        try:
+            return await asyncio.gather(*(ask(client, question) for question in questions)), client.multiplexing
+        finally:
+            await client.close()
+
+    answers, multiplexing = run(scenario())
+    assert answers == [mock_backend.answer_for(question) for question in questions]
+    assert multiplexing is True
+    # The jitter finishes them out of order, all on one connection
+    assert mock_backend.stats.connections == 1
+
+
+@pytest.mark.parametrize("mock_backend_config", [
+    MockBackendConfig(first_token_delay=0.01, tokens_per_second=0, chunk_loss_rate=0.2, seed=0)
+])
+def test_lost_chunk_does_not_truncate_the_answer(mock_backend):
+    async def scenario():
+        pipeline = make_pipeline(mock_backend)
+        client = WebSocketClient(mock_backend.url)
+        try:
+            events = [event async for event in pipeline.stream(CANNED_QUESTION)]
+            return events, await client.request({"text": CANNED_QUESTION})
+        finally:
+            await pipeline.close()
+            await client.close()
+
+    events, result = run(scenario())
+    full_answer = mock_backend.answer_for(CANNED_QUESTION)
+    streamed = "".join(event.text for event in events if event.type == "chunk")
+    assert mock_backend.stats.lost_chunks > 0
+    assert streamed.strip() != full_answer
+    assert events[-1].type == "final" and events[-1].text == full_answer
+    assert result.status == STATUS_OK and result.text == full_answer
+
+
+@pytest.mark.parametrize("mock_backend_config", [MockBackendConfig(first_token_delay=0.01, error_rate=1.0, seed=0)])
+def test_injected_error_frame_is_an_error_result(mock_backend):
+    async def scenario():
+        pipeline = make_pipeline(mock_backend)
+        try:
+            return await pipeline.answer(CANNED_QUESTION)
+        finally:
+            await pipeline.close()
+
+    result = run(scenario())
+    assert result.status == STATUS_ERROR
+    assert "injected error" in result.error
+    assert mock_backend.stats.errors == 1
+
+
+@pytest.mark.parametrize("mock_backend_config", [
+    MockBackendConfig(first_token_delay=0.01, tokens_per_second=0, drop_rate=1.0, seed=0)
+])
+def test_injected_drop_keeps_the_partial_answer(mock_backend):
+    async def scenario():
+        pipeline = make_pipeline(mock_backend)
+        try:
+            return await pipeline.answer(CANNED_QUESTION)
+        finally:
+            await pipeline.close()
+
+    result = run(scenario())
+    full_answer = mock_backend.answer_for(CANNED_QUESTION)
+    assert result.status == STATUS_DISCONNECTED
+    assert result.text and full_answer.startswith(result.text) and len(result.text) < len(full_answer)
+    assert mock_backend.stats.drops == 1
+
+
+@pytest.mark.parametrize("mock_backend_config", [MockBackendConfig(first_token_delay=0.01, error_rate=1.0, seed=0)])
+def test_breaker_opens_and_fails_fast(mock_backend):
+    breaker = CircuitBreakerConfig(window=4, min_calls=2, failure_rate_threshold=0.5, open_seconds=60)
+
+    async def scenario():
+        pipeline = make_pipeline(mock_backend, circuit_breaker=breaker)
+        try:
+            statuses = [(await pipeline.answer(CANNED_QUESTION)).status for _ in range(2)]
+            with pytest.raises(CircuitOpenError):
+                await pipeline.answer(CANNED_QUESTION)
+            return statuses, pipeline.breaker.state
+        finally:
+            await pipeline.close()
+
+    statuses, state = run(scenario())
+    assert statuses == [STATUS_ERROR, STATUS_ERROR]
+    assert state == "open"
+    # The rejected request never reached the backend
+    assert mock_backend.stats.requests == 2
+
+
+@pytest.mark.parametrize("mock_backend_config", [MockBackendConfig(first_token_delay=0.3, tokens_per_second=0, seed=0)])
+def test_slow_request_is_hedged(mock_backend):
+    hedging = HedgeConfig(enabled=True, initial_delay=0.05, budget=1.0)
+
+    async def scenario():
+        pipeline = make_pipeline(mock_backend, hedging=hedging)
+        try:
+            return await pipeline.answer(CANNED_QUESTION), pipeline.hedge_policy.stats()
+        finally:
+            await pipeline.close()
+
+    result, stats = run(scenario())
+    assert result.status == STATUS_OK
+    assert result.text == mock_backend.answer_for(CANNED_QUESTION)
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] + stats["primary_wins"] == 1
+    assert mock_backend.stats.requests == 2
+
+
+@pytest.mark.parametrize("mock_backend_config", [MockBackendConfig(first_token_delay=0.3, tokens_per_second=0, seed=0)])
+def test_hedge_budget_counts_in_flight_hedges(mock_backend):
+    # A budget of 10% over the 20-request minimum window allows two hedges at a time
+    hedging = HedgeConfig(enabled=True, initial_delay=0.05, budget=0.1, min_samples=20)
+
+    async def scenario():
+        pipeline = make_pipeline(mock_backend, hedging=hedging, pool_max_size=4, max_streams_per_connection=8)
+        try:
+            results = await asyncio.gather(*(pipeline.answer(CANNED_QUESTION) for _ in range(10)))
+            return results, pipeline.hedge_policy.stats()
+        finally:
+            await pipeline.close()
+
+    results, stats = run(scenario())
+    assert all(result.status == STATUS_OK for result in results)
+    assert stats["hedges"] == 2
+    assert stats["budget_denied"] == 8
+
+
+@pytest.mark.parametrize("mock_backend_config", [MockBackendConfig(first_token_delay=2.0, tokens_per_second=0, seed=0)])
+def test_auto_transport_does_not_fall_back_on_timeout(mock_backend):
+    async def scenario():
+        # Nothing listens on the HTTP URL; a fallback would fail with a connection error instead
+        pipeline = make_pipeline(mock_backend, transport="auto", http_base_url="http://127.0.0.1:9",
+                                 first_byte_timeout=0.3, http_max_retries=0)
+        try:
+            return await pipeline.answer(CANNED_QUESTION), pipeline.transport_stats()
+        finally:
+            await pipeline.close()
+
+    result, transport = run(scenario())
+    assert result.status == STATUS_TIMEOUT
+    assert transport["http_fallbacks"] == 0
+    assert mock_backend.stats.requests == 1